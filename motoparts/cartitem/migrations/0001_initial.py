@@ -9,7 +9,7 @@ class Migration(migrations.Migration):
     initial = True
 
     dependencies = [
-    # ('motopart', '0001_initial'),
+        ('motopart', '0001_initial'),
         ('carts', '0001_initial'),
     ]
 
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cartitem', '0001_initial'),
+        ('carts', '0002_query_indexes'),
+        ('motopart', '0005_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cartitem',
+            index=models.Index(fields=['cart', '-created_at'], name='cartitem_ca_cart_id_1348b3_idx'),
+        ),
+    ]
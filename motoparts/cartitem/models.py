@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.utils import timezone
 
 # Create your models here.
 class CartItem(models.Model):
@@ -12,6 +14,9 @@ class CartItem(models.Model):
     class Meta:
         unique_together = ('cart', 'motopart')  # Prevent duplicate items in same cart
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['cart', '-created_at']),
+        ]
         
     def __str__(self):
         return f"{self.motopart.name} x {self.quantity}"
@@ -26,6 +31,38 @@ class CartItem(models.Model):
         """Calculate total price for this cart item"""
         return self.unit_price * self.quantity
     
+    ADD_ATTEMPTS = 3
+
+    @classmethod
+    def add_quantity(cls, cart, motopart, quantity):
+        """
+        Add quantity of motopart to cart without a read-then-write race;
+        returns (item, created).
+
+        An existing row is bumped with one `quantity = quantity + n` UPDATE.
+        Otherwise the row is inserted, and if a concurrent request inserted
+        it first the unique (cart, motopart) constraint turns that into the
+        same UPDATE instead of an error. A row removed concurrently between
+        those steps is tried again, a few times at most: an insert that keeps
+        failing is not a race (the part may be gone) and its error is raised.
+        """
+        items = cls.objects.filter(cart=cart, motopart=motopart)
+        last = cls.ADD_ATTEMPTS - 1
+        for attempt in range(cls.ADD_ATTEMPTS):
+            if items.update(quantity=F('quantity') + quantity, updated_at=timezone.now()):
+                item = items.select_related('motopart__category').first()
+                if item is not None:
+                    return item, False
+                if attempt < last:
+                    continue
+            # The last attempt always ends in an insert or its error
+            try:
+                with transaction.atomic():
+                    return cls.objects.create(cart=cart, motopart=motopart, quantity=quantity), True
+            except IntegrityError:
+                if attempt == last:
+                    raise
+
     def save(self, *args, **kwargs):
         """Override save to ensure quantity is valid"""
         if self.quantity <= 0:
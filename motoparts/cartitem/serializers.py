@@ -17,6 +17,9 @@ class CartItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at', 'cart']
 
 class CartItemCreateSerializer(serializers.ModelSerializer):
+    # ModelSerializer maps the FK attname to a read-only field; it is the input here
+    motopart_id = serializers.IntegerField()
+
     class Meta:
         model = CartItem
         fields = ['motopart_id', 'quantity']
@@ -30,3 +33,19 @@ class CartItemCreateSerializer(serializers.ModelSerializer):
         if value <= 0:
             raise serializers.ValidationError("Quantity must be greater than 0")
         return value
+
+
+class CartBatchOperationSerializer(serializers.Serializer):
+    """One cart change: set `quantity`, add `delta` or `remove` the part"""
+    motopart_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=0, required=False)
+    delta = serializers.IntegerField(required=False)
+    remove = serializers.BooleanField(required=False)
+
+    def validate(self, attrs):
+        given = [name for name in ('quantity', 'delta', 'remove') if name in attrs]
+        if len(given) != 1:
+            raise serializers.ValidationError('Provide exactly one of quantity, delta or remove')
+        if given == ['remove'] and not attrs['remove']:
+            raise serializers.ValidationError('remove must be true when given')
+        return attrs
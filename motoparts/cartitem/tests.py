@@ -1,3 +1,165 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.db.models import QuerySet
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from carts.models import Cart
+from category.models import Category
+from motopart.models import Motopart
+from .models import CartItem
+
+
+class CartItemTestData:
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            email='buyer@example.com', username='buyer', password='x'
+        )
+        cls.cart = Cart.objects.create(user=cls.user, status='active')
+        category = Category.objects.create(name='Engine', slug='engine')
+        cls.parts = [
+            Motopart.objects.create(
+                name=f'Part {i}', slug=f'part-{i}', price=1000, stock=5,
+                category=category, manufacture_year=2024, supplier='Honda Official',
+            )
+            for i in range(4)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def quantities(self, cart=None):
+        return dict(CartItem.objects.filter(cart=cart or self.cart).values_list('motopart_id', 'quantity'))
+
+
+class CartBatchUpdateTests(CartItemTestData, TestCase):
+    def batch(self, *operations, cart=None):
+        return self.client.post(
+            reverse('batch-update-cart', args=[(cart or self.cart).pk]),
+            {'operations': list(operations)}, format='json',
+        )
+
+    def test_operations_apply_in_order(self):
+        CartItem.objects.create(cart=self.cart, motopart=self.parts[0], quantity=2)
+        CartItem.objects.create(cart=self.cart, motopart=self.parts[1], quantity=1)
+        CartItem.objects.create(cart=self.cart, motopart=self.parts[2], quantity=4)
+        response = self.batch(
+            {'motopart_id': self.parts[0].pk, 'delta': 3},
+            {'motopart_id': self.parts[1].pk, 'remove': True},
+            {'motopart_id': self.parts[2].pk, 'delta': -4},
+            {'motopart_id': self.parts[3].pk, 'quantity': 5},
+            {'motopart_id': self.parts[3].pk, 'delta': -1},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.quantities(), {self.parts[0].pk: 5, self.parts[3].pk: 4})
+        self.assertEqual(
+            {item['motopart']['id']: item['quantity'] for item in response.json()['cart']['items']},
+            self.quantities(),
+        )
+
+    def test_unknown_part_is_not_found_and_changes_nothing(self):
+        CartItem.objects.create(cart=self.cart, motopart=self.parts[0], quantity=2)
+        response = self.batch(
+            {'motopart_id': self.parts[0].pk, 'delta': 1},
+            {'motopart_id': 999999, 'quantity': 1},
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['motopart_ids'], [999999])
+        self.assertEqual(self.quantities(), {self.parts[0].pk: 2})
+
+    def test_checked_out_cart_is_rejected(self):
+        cart = Cart.objects.create(user=self.user, status='checked_out')
+        response = self.batch({'motopart_id': self.parts[0].pk, 'quantity': 1}, cart=cart)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], 'Cart is already checked out')
+        self.assertEqual(self.quantities(cart), {})
+
+    def test_invalid_operation_is_rejected(self):
+        response = self.batch({'motopart_id': self.parts[0].pk, 'quantity': 1, 'delta': 1})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('errors', response.json())
+
+    def concurrent_add(self, part, quantity):
+        """Insert `part` just before the batch writes, as a concurrent add-to-cart would"""
+        bulk_create = CartItem.objects.bulk_create
+
+        def add_then_write(*args, **kwargs):
+            CartItem.objects.create(cart=self.cart, motopart=part, quantity=quantity)
+            return bulk_create(*args, **kwargs)
+        return mock.patch.object(CartItem.objects, 'bulk_create', side_effect=add_then_write)
+
+    def test_set_quantity_overwrites_a_concurrently_added_row(self):
+        with self.concurrent_add(self.parts[0], 2):
+            response = self.batch({'motopart_id': self.parts[0].pk, 'quantity': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.quantities(), {self.parts[0].pk: 5})
+
+    def test_delta_adds_to_a_concurrently_added_row(self):
+        with self.concurrent_add(self.parts[0], 2):
+            response = self.batch({'motopart_id': self.parts[0].pk, 'delta': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.quantities(), {self.parts[0].pk: 5})
+
+
+class CartItemAddTests(CartItemTestData, TestCase):
+    def test_quantity_defaults_to_one(self):
+        url = reverse('cartitem-list-create', args=[self.cart.pk])
+        response = self.client.post(url, {'motopart_id': self.parts[0].pk}, format='json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post(url, {'motopart_id': self.parts[0].pk, 'quantity': 2}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.quantities(), {self.parts[0].pk: 3})
+
+    def test_add_to_cart_bumps_an_existing_item(self):
+        url = reverse('add-to-cart', args=[self.cart.pk])
+        self.assertEqual(self.client.post(url, {'motopart_id': self.parts[0].pk}, format='json').status_code, 201)
+        response = self.client.post(url, {'motopart_id': self.parts[0].pk, 'quantity': 4}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['item']['quantity'], 5)
+
+    def test_insert_race_becomes_an_update(self):
+        # A concurrent request inserts the row between our UPDATE and INSERT
+        CartItem.objects.create(cart=self.cart, motopart=self.parts[0], quantity=2)
+        update = QuerySet.update
+        calls = []
+
+        def miss_once(queryset, **kwargs):
+            if not calls:
+                calls.append(kwargs)
+                return 0
+            return update(queryset, **kwargs)
+        with mock.patch.object(QuerySet, 'update', autospec=True, side_effect=miss_once):
+            item, created = CartItem.add_quantity(self.cart, self.parts[0], 3)
+        self.assertFalse(created)
+        self.assertEqual(item.quantity, 5)
+
+    def test_row_removed_after_a_lost_insert_race_is_created(self):
+        # The concurrent insert is deleted again before our UPDATE retries
+        create = CartItem.objects.create
+        calls = []
+
+        def lose_once(**kwargs):
+            if not calls:
+                calls.append(kwargs)
+                raise IntegrityError('UNIQUE constraint failed')
+            return create(**kwargs)
+        with mock.patch.object(CartItem.objects, 'create', side_effect=lose_once):
+            item, created = CartItem.add_quantity(self.cart, self.parts[0], 3)
+        self.assertTrue(created)
+        self.assertEqual(self.quantities(), {self.parts[0].pk: 3})
+
+    def test_persistent_insert_error_is_raised(self):
+        with mock.patch.object(CartItem.objects, 'create', side_effect=IntegrityError('FOREIGN KEY constraint failed')):
+            with self.assertRaises(IntegrityError):
+                CartItem.add_quantity(self.cart, self.parts[0], 1)
 
-# Create your tests here.
+    def test_row_that_keeps_vanishing_is_inserted(self):
+        # Every UPDATE hits a row that is gone before it can be read back
+        with mock.patch.object(QuerySet, 'update', return_value=1):
+            item, created = CartItem.add_quantity(self.cart, self.parts[0], 3)
+        self.assertTrue(created)
+        self.assertEqual(self.quantities(), {self.parts[0].pk: 3})
@@ -9,4 +9,5 @@ urlpatterns = [
     path('cart/<int:cart_id>/items/<int:item_id>/update/', views.update_cart_item_quantity, name='update-cart-item'),
     path('cart/<int:cart_id>/items/<int:item_id>/remove/', views.remove_from_cart, name='remove-from-cart'),
     path('cart/<int:cart_id>/clear/', views.clear_cart, name='clear-cart'),
+    path('cart/<int:cart_id>/batch/', views.batch_update_cart, name='batch-update-cart'),
 ]
\ No newline at end of file
@@ -1,12 +1,17 @@
 from django.shortcuts import render, get_object_or_404
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import NotFound
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from django.db import transaction
+from django.utils import timezone
 from .models import CartItem
-from .serializers import CartItemSerializer, CartItemCreateSerializer
+from .serializers import CartItemSerializer, CartItemCreateSerializer, CartBatchOperationSerializer
 from carts.models import Cart
+from carts.serializers import CartSerializer
 from motopart.models import Motopart
+from motopart.object_cache import motopart_cache
 
 # Create your views here.
 
@@ -28,17 +33,11 @@ class CartItemListView(generics.ListCreateAPIView):
         cart_id = self.kwargs.get('cart_id')
         cart = get_object_or_404(Cart, id=cart_id, user=self.request.user)
         
-        # Check if item already exists in cart
-        motopart_id = serializer.validated_data['motopart_id']
-        existing_item = CartItem.objects.filter(cart=cart, motopart_id=motopart_id).first()
-        
-        if existing_item:
-            # Update quantity instead of creating new item
-            existing_item.quantity += serializer.validated_data['quantity']
-            existing_item.save()
-            return
-        
-        serializer.save(cart=cart)
+        motopart = motopart_cache.get(serializer.validated_data['motopart_id'])
+        if motopart is None:
+            raise NotFound({'message': 'Motopart not found'})
+
+        serializer.instance, _ = CartItem.add_quantity(cart, motopart, serializer.validated_data.get('quantity', 1))
 
 class CartItemDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Get, update, or delete a specific cart item"""
@@ -65,36 +64,32 @@ def add_to_cart(request, cart_id):
         return Response({
             'message': 'motopart_id is required'
         }, status=status.HTTP_400_BAD_REQUEST)
-    
     try:
-        motopart = Motopart.objects.get(id=motopart_id)
-    except Motopart.DoesNotExist:
+        quantity = int(quantity)
+    except (TypeError, ValueError):
+        quantity = 0
+    if quantity <= 0:
+        return Response({
+            'message': 'quantity must be a positive integer'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    motopart = motopart_cache.get(motopart_id)
+    if motopart is None:
         return Response({
             'message': 'Motopart not found'
         }, status=status.HTTP_404_NOT_FOUND)
     
-    # Check if item already exists in cart
-    existing_item = CartItem.objects.filter(cart=cart, motopart=motopart).first()
-    
-    if existing_item:
-        existing_item.quantity += quantity
-        existing_item.save()
-        serializer = CartItemSerializer(existing_item)
-        return Response({
-            'message': 'Item quantity updated in cart',
-            'item': serializer.data
-        }, status=status.HTTP_200_OK)
-    else:
-        cart_item = CartItem.objects.create(
-            cart=cart,
-            motopart=motopart,
-            quantity=quantity
-        )
-        serializer = CartItemSerializer(cart_item)
+    cart_item, created = CartItem.add_quantity(cart, motopart, quantity)
+    serializer = CartItemSerializer(cart_item)
+    if created:
         return Response({
             'message': 'Item added to cart',
             'item': serializer.data
         }, status=status.HTTP_201_CREATED)
+    return Response({
+        'message': 'Item quantity updated in cart',
+        'item': serializer.data
+    }, status=status.HTTP_200_OK)
 
 @api_view(['PUT'])
 @permission_classes([IsAuthenticated])
@@ -153,4 +148,106 @@ def clear_cart(request, cart_id):
     
     return Response({
         'message': 'Cart cleared successfully'
-    }, status=status.HTTP_200_OK)
\ No newline at end of file
+    }, status=status.HTTP_200_OK)
+
+MAX_BATCH_OPERATIONS = 100
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def batch_update_cart(request, cart_id):
+    """
+    Apply many cart changes at once and return the resulting cart.
+
+    Body: `{"operations": [{"motopart_id": 1, "quantity": 3},
+    {"motopart_id": 2, "delta": -1}, {"motopart_id": 5, "remove": true}]}`.
+    Operations run in order inside one transaction; an item whose quantity
+    ends at 0 or below is removed. Parts are looked up with one `id IN`
+    query and the changes written with one bulk_create, one bulk_update and
+    one DELETE.
+
+    Rows the batch saw are locked. A part that was not in the cart can
+    still be added by a concurrent add-to-cart: a set quantity overwrites
+    that row (bulk_create's ON CONFLICT update) and deltas are added to it
+    through CartItem.add_quantity, one part at a time.
+    """
+    operations = request.data.get('operations') if isinstance(request.data, dict) else request.data
+    if not isinstance(operations, list) or not operations:
+        return Response({
+            'message': 'operations must be a non-empty list'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return Response({
+            'message': f'At most {MAX_BATCH_OPERATIONS} operations per request'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    serializer = CartBatchOperationSerializer(data=operations, many=True)
+    if not serializer.is_valid():
+        return Response({
+            'message': 'Invalid operations',
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    with transaction.atomic():
+        cart = get_object_or_404(Cart.objects.select_for_update(), id=cart_id, user=request.user)
+        if cart.status == 'checked_out':
+            return Response({
+                'message': 'Cart is already checked out'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        motopart_ids = {operation['motopart_id'] for operation in serializer.validated_data}
+        items = {
+            item.motopart_id: item
+            for item in CartItem.objects.select_for_update().filter(cart=cart, motopart_id__in=motopart_ids)
+        }
+        quantities = {motopart_id: item.quantity for motopart_id, item in items.items()}
+        # New parts whose quantity was set rather than only changed by deltas
+        absolute = set()
+        for operation in serializer.validated_data:
+            motopart_id = operation['motopart_id']
+            if 'quantity' in operation:
+                quantities[motopart_id] = operation['quantity']
+                absolute.add(motopart_id)
+            elif 'delta' in operation:
+                quantities[motopart_id] = quantities.get(motopart_id, 0) + operation['delta']
+            else:
+                quantities[motopart_id] = 0
+                absolute.add(motopart_id)
+
+        new_ids = [pk for pk, quantity in quantities.items() if quantity > 0 and pk not in items]
+        motoparts = Motopart.objects.only('id').in_bulk(new_ids)
+        missing = sorted(set(new_ids) - set(motoparts))
+        if missing:
+            return Response({
+                'message': 'Motopart not found',
+                'motopart_ids': missing
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        now = timezone.now()
+        changed, removed = [], []
+        for motopart_id, item in items.items():
+            quantity = quantities[motopart_id]
+            if quantity <= 0:
+                removed.append(item.pk)
+            elif quantity != item.quantity:
+                item.quantity, item.updated_at = quantity, now
+                changed.append(item)
+        CartItem.objects.bulk_create(
+            [
+                CartItem(cart=cart, motopart_id=motopart_id, quantity=quantities[motopart_id])
+                for motopart_id in new_ids if motopart_id in absolute
+            ],
+            update_conflicts=True,
+            unique_fields=['cart', 'motopart'],
+            update_fields=['quantity', 'updated_at'],
+        )
+        for motopart_id in new_ids:
+            if motopart_id not in absolute:
+                CartItem.add_quantity(cart, motoparts[motopart_id], quantities[motopart_id])
+        CartItem.objects.bulk_update(changed, ['quantity', 'updated_at'])
+        if removed:
+            CartItem.objects.filter(pk__in=removed).delete()
+
+    cart = Cart.objects.with_items().get(pk=cart.pk)
+    return Response({
+        'message': 'Cart updated',
+        'cart': CartSerializer(cart).data
+    }, status=status.HTTP_200_OK)
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carts', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(fields=['user', 'status'], name='carts_cart_user_id_18332a_idx'),
+        ),
+    ]
@@ -1,6 +1,17 @@
 from django.db import models
 from django.conf import settings
-from django.db.models import Sum, F, Count
+from django.db.models import Sum, F, Count, Prefetch
+
+
+class CartQuerySet(models.QuerySet):
+    def with_items(self):
+        """Load items with their motopart and category in one extra query; subtotal and items_count reuse them"""
+        from cartitem.models import CartItem
+        return self.prefetch_related(Prefetch(
+            'items',
+            queryset=CartItem.objects.select_related('motopart__category').defer('motopart__search_document'),
+        ))
+
 
 # Create your models here.
 class Cart(models.Model):
@@ -13,16 +24,28 @@ class Cart(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CartQuerySet.as_manager()
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'status']),
+        ]
         
     def __str__(self):
         return f"Cart for {self.user.email}"
     
+    def _loaded_items(self):
+        """Items prefetched by with_items(), or None"""
+        return getattr(self, '_prefetched_objects_cache', {}).get('items')
+
     @property
     def subtotal(self):
         """Calculate total amount of all items in cart"""
+        items = self._loaded_items()
+        if items is not None:
+            return sum((item.quantity * item.motopart.price for item in items), 0)
         from cartitem.models import CartItem
         total = CartItem.objects.filter(cart=self).aggregate(
             total=Sum(F('quantity') * F('motopart__price'))
@@ -32,5 +55,8 @@ class Cart(models.Model):
     @property
     def items_count(self):
         """Count total number of items in cart"""
+        items = self._loaded_items()
+        if items is not None:
+            return sum(item.quantity for item in items)
         from cartitem.models import CartItem
         return CartItem.objects.filter(cart=self).aggregate(count=Sum('quantity'))['count'] or 0
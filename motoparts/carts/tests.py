@@ -1,3 +1,82 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from category.models import Category
+from cartitem.models import CartItem
+from motopart.models import Motopart
+from motoparts.testing import QueryPlanTestMixin
+from .models import Cart
 
-# Create your tests here.
+
+class CartQueryPlanTests(QueryPlanTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            email='buyer@example.com', username='buyer', password='x'
+        )
+        Cart.objects.create(user=cls.user, status='checked_out')
+        cls.cart = Cart.objects.create(user=cls.user, status='active')
+        category = Category.objects.create(name='Engine', slug='engine')
+        for i in range(3):
+            part = Motopart.objects.create(
+                name=f'Part {i}', slug=f'part-{i}', price=1000, stock=5,
+                category=category, manufacture_year=2024, supplier='Honda Official',
+            )
+            CartItem.objects.create(cart=cls.cart, motopart=part, quantity=1)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_active_cart_uses_indexes(self):
+        response = self.assertNoFullScans(self.client.get, reverse('get-active-cart'))
+        self.assertEqual(response.json()['id'], self.cart.pk)
+
+    def test_cart_list_uses_indexes(self):
+        response = self.assertNoFullScans(self.client.get, reverse('cart-list-create'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_cart_items_use_indexes(self):
+        url = reverse('cartitem-list-create', args=[self.cart.pk])
+        response = self.assertNoFullScans(self.client.get, url)
+        self.assertEqual(response.status_code, 200)
+
+
+class CartReadQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            email='reader@example.com', username='reader', password='x'
+        )
+        cls.cart = Cart.objects.create(user=cls.user, status='active')
+        categories = [
+            Category.objects.create(name=f'Category {i}', slug=f'category-{i}') for i in range(2)
+        ]
+        for i in range(10):
+            part = Motopart.objects.create(
+                name=f'Part {i}', slug=f'read-part-{i}', price=100 * (i + 1), discount=10, stock=5,
+                category=categories[i % 2], manufacture_year=2024, supplier='Honda Official',
+            )
+            CartItem.objects.create(cart=cls.cart, motopart=part, quantity=i % 3 + 1)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_active_cart_is_two_queries(self):
+        # The cart, then its items joined with motopart and category
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('get-active-cart'))
+        data = response.json()
+        self.assertEqual(len(data['items']), 10)
+        self.assertEqual(data['items_count'], Cart.objects.get(pk=self.cart.pk).items_count)
+        self.assertEqual(data['subtotal'], Cart.objects.get(pk=self.cart.pk).subtotal)
+        self.assertIn('motoparts_count', data['items'][0]['motopart']['category'])
+
+    def test_cart_detail_and_list_do_not_grow_with_items(self):
+        with self.assertNumQueries(2):
+            self.client.get(reverse('cart-detail', args=[self.cart.pk]))
+        # Paginated: COUNT, the page of carts, then all their items at once
+        with self.assertNumQueries(3):
+            self.client.get(reverse('cart-list-create'))
@@ -20,7 +20,7 @@ class CartListView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return Cart.objects.filter(user=self.request.user)
+        return Cart.objects.filter(user=self.request.user).with_items()
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -49,14 +49,14 @@ class CartDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return Cart.objects.filter(user=self.request.user)
+        return Cart.objects.filter(user=self.request.user).with_items()
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_active_cart(request):
     """Get user's active cart"""
     try:
-        cart = Cart.objects.get(user=request.user, status='active')
+        cart = Cart.objects.with_items().get(user=request.user, status='active')
         serializer = CartSerializer(cart)
         return Response(serializer.data)
     except Cart.DoesNotExist:
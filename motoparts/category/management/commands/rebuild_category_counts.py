@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from category.models import Category
+
+
+class Command(BaseCommand):
+    help = 'Recompute Category.active_motoparts_count and subtree_motoparts_count from the motopart table'
+
+    def handle(self, *args, **options):
+        updated = Category.rebuild_active_counts()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt active and subtree motopart counts for {updated} categories'))
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:01
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_active_counts(apps, schema_editor):
+    Category = apps.get_model('category', 'Category')
+    Motopart = apps.get_model('motopart', 'Motopart')
+    active = Motopart.objects.filter(
+        category=OuterRef('pk'), status='active'
+    ).order_by().values('category').annotate(n=Count('pk')).values('n')
+    Category.objects.update(active_motoparts_count=Coalesce(Subquery(active), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0002_alter_category_options_category_created_at_and_more'),
+        ('motopart', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='active_motoparts_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_active_counts, migrations.RunPython.noop),
+    ]
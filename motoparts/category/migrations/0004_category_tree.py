@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def populate_closure(apps, schema_editor):
+    """Existing categories are all roots: one self link each, subtree == own count"""
+    Category = apps.get_model('category', 'Category')
+    CategoryClosure = apps.get_model('category', 'CategoryClosure')
+    CategoryClosure.objects.bulk_create(
+        [CategoryClosure(ancestor_id=pk, descendant_id=pk, depth=0)
+         for pk in Category.objects.values_list('pk', flat=True)],
+        batch_size=500,
+    )
+    Category.objects.update(subtree_motoparts_count=F('active_motoparts_count'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0003_category_active_motoparts_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='category.category'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='subtree_motoparts_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='CategoryClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='category.category')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='category.category')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'ancestor'], name='category_ca_descend_f25d9a_idx')],
+                'constraints': [models.UniqueConstraint(fields=('ancestor', 'descendant'), name='category_closure_unique_pair')],
+            },
+        ),
+        migrations.RunPython(populate_closure, migrations.RunPython.noop),
+    ]
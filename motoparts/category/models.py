@@ -1,10 +1,22 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
 # Create your models here.
 class Category(models.Model):
+    # Written only through F()/subquery updates, never from a possibly stale instance
+    counter_fields = ('active_motoparts_count', 'subtree_motoparts_count')
+
     name = models.CharField(max_length=100)
     slug = models.SlugField(unique=True)
     image = models.URLField(blank=True, null=True)
+    parent = models.ForeignKey(
+        'self', on_delete=models.CASCADE, related_name='children', null=True, blank=True
+    )
+    # Maintained by motopart signals; rebuild with `manage.py rebuild_category_counts`
+    active_motoparts_count = models.PositiveIntegerField(default=0, editable=False)
+    # Active motoparts in this category and all of its descendants
+    subtree_motoparts_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -12,4 +24,140 @@ class Category(models.Model):
         ordering = ['-created_at']
 
     def __str__(self):
-        return f"{self.name}"
\ No newline at end of file
+        return f"{self.name}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'parent_id' in field_names:
+            instance._loaded_parent_id = instance.parent_id
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Keep the closure table and subtree counters in step with `parent`"""
+        adding = self._state.adding
+        if adding or hasattr(self, '_loaded_parent_id'):
+            old_parent_id = None if adding else self._loaded_parent_id
+        else:
+            old_parent_id = type(self).objects.filter(pk=self.pk).values_list('parent_id', flat=True).first()
+        if not adding and self.parent_id is not None and self.parent_id != old_parent_id:
+            if CategoryClosure.objects.filter(ancestor_id=self.pk, descendant_id=self.parent_id).exists():
+                raise ValueError('A category can not be moved under itself or its descendants')
+        if not adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                CategoryClosure.insert_node(self.pk, self.parent_id)
+            elif old_parent_id != self.parent_id:
+                old_ancestors = list(CategoryClosure.ancestor_ids(old_parent_id))
+                CategoryClosure.move_subtree(self.pk, self.parent_id)
+                type(self).rebuild_subtree_counts(old_ancestors + list(CategoryClosure.ancestor_ids(self.parent_id)))
+        self._loaded_parent_id = self.parent_id
+
+    def descendant_ids(self):
+        """Ids of this category and everything below it"""
+        return CategoryClosure.objects.filter(ancestor_id=self.pk).values_list('descendant_id', flat=True)
+
+    @classmethod
+    def adjust_active_count(cls, category_id, delta):
+        """Atomically add delta to one category's counter and to its ancestors' subtree counters"""
+        if category_id is None or not delta:
+            return
+        cls.objects.filter(pk=category_id).update(
+            active_motoparts_count=F('active_motoparts_count') + delta
+        )
+        cls.objects.filter(descendant_links__descendant_id=category_id).update(
+            subtree_motoparts_count=F('subtree_motoparts_count') + delta
+        )
+
+    @classmethod
+    def rebuild_active_counts(cls, category_ids=None):
+        """Recompute counters (all, or only category_ids) from the motopart table in one statement"""
+        from motopart.models import Motopart
+        active = Motopart.objects.filter(
+            category=OuterRef('pk'), status='active'
+        ).order_by().values('category').annotate(n=Count('pk')).values('n')
+        categories = cls.objects.all()
+        if category_ids is not None:
+            category_ids = list(category_ids)
+            categories = categories.filter(pk__in=category_ids)
+        updated = categories.update(active_motoparts_count=Coalesce(Subquery(active), 0))
+        if category_ids is None:
+            cls.rebuild_subtree_counts()
+        else:
+            cls.rebuild_subtree_counts(
+                CategoryClosure.objects.filter(descendant_id__in=category_ids).values_list('ancestor_id', flat=True)
+            )
+        return updated
+
+    @classmethod
+    def rebuild_subtree_counts(cls, category_ids=None):
+        """Sum active counters over each category's subtree (all, or only category_ids)"""
+        subtree = CategoryClosure.objects.filter(
+            ancestor=OuterRef('pk')
+        ).order_by().values('ancestor').annotate(
+            n=models.Sum('descendant__active_motoparts_count')
+        ).values('n')
+        categories = cls.objects.all()
+        if category_ids is not None:
+            categories = categories.filter(pk__in=list(category_ids))
+        return categories.update(subtree_motoparts_count=Coalesce(Subquery(subtree), 0))
+
+
+class CategoryClosure(models.Model):
+    """
+    Every (ancestor, descendant) pair of the category tree, including each
+    category paired with itself at depth 0. A subtree is one indexed lookup
+    on ancestor; the ancestors of a node are one lookup on descendant.
+    """
+    ancestor = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='category_closure_unique_pair'),
+        ]
+        indexes = [
+            models.Index(fields=['descendant', 'ancestor']),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
+
+    @classmethod
+    def ancestor_ids(cls, category_id):
+        """Ids of category_id and its ancestors (empty for None)"""
+        if category_id is None:
+            return []
+        return cls.objects.filter(descendant_id=category_id).values_list('ancestor_id', flat=True)
+
+    @classmethod
+    def insert_node(cls, category_id, parent_id):
+        """Link a new leaf to itself and to every ancestor of its parent"""
+        links = [cls(ancestor_id=category_id, descendant_id=category_id, depth=0)]
+        if parent_id is not None:
+            links += [
+                cls(ancestor_id=ancestor_id, descendant_id=category_id, depth=depth + 1)
+                for ancestor_id, depth in cls.objects.filter(descendant_id=parent_id).values_list('ancestor_id', 'depth')
+            ]
+        cls.objects.bulk_create(links)
+
+    @classmethod
+    def move_subtree(cls, category_id, new_parent_id):
+        """Detach the subtree rooted at category_id from its old ancestors and hang it under new_parent_id"""
+        subtree = list(cls.objects.filter(ancestor_id=category_id).values_list('descendant_id', 'depth'))
+        subtree_ids = [pk for pk, _ in subtree]
+        cls.objects.filter(descendant_id__in=subtree_ids).exclude(ancestor_id__in=subtree_ids).delete()
+        if new_parent_id is None:
+            return
+        links = [
+            cls(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=ancestor_depth + 1 + depth)
+            for ancestor_id, ancestor_depth in cls.objects.filter(descendant_id=new_parent_id).values_list('ancestor_id', 'depth')
+            for descendant_id, depth in subtree
+        ]
+        cls.objects.bulk_create(links, batch_size=500)
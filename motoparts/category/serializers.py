@@ -1,16 +1,18 @@
 from rest_framework import serializers
 from .models import Category
+from motoparts.serializers import DynamicFieldsMixin
 
-class CategorySerializer(serializers.ModelSerializer):
-    motoparts_count = serializers.SerializerMethodField()
+class CategorySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    motoparts_count = serializers.IntegerField(source='active_motoparts_count', read_only=True)
+    subtree_motoparts_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Category
-        fields = ['id', 'name', 'slug', 'image', 'created_at', 'updated_at', 'motoparts_count']
+        fields = ['id', 'name', 'slug', 'image', 'parent', 'created_at', 'updated_at', 'motoparts_count', 'subtree_motoparts_count']
         read_only_fields = ['created_at', 'updated_at']
 
-    def get_motoparts_count(self, obj):
-        """Get the count of motoparts in this category"""
-        return obj.motoparts.filter(status='active').count()
-
-    
\ No newline at end of file
+    def validate_parent(self, parent):
+        """A category can not be moved under itself or one of its descendants"""
+        if parent is not None and self.instance is not None and parent.pk in set(self.instance.descendant_ids()):
+            raise serializers.ValidationError('A category can not be moved under itself or its descendants')
+        return parent
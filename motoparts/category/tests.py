@@ -1,3 +1,222 @@
-from django.test import TestCase
+import io
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from motopart.models import Motopart, MotopartTombstone
+from .models import Category, CategoryClosure
+
+
+@override_settings(CHUNKED_DELETE_IN_BACKGROUND=False, CHUNKED_DELETE_BATCH_SIZE=1)
+class CategoryChunkedDeleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_user(
+            email='admin@example.com', username='admin', password='x', role='admin'
+        )
+        cls.root = Category.objects.create(name='Engine', slug='engine')
+        cls.mid = Category.objects.create(name='Pistons', slug='pistons', parent=cls.root)
+        cls.leaf = Category.objects.create(name='Rings', slug='rings', parent=cls.mid)
+        cls.other = Category.objects.create(name='Valves', slug='valves', parent=cls.root)
+        cls.parts = [
+            Motopart.objects.create(
+                name=f'Part {i}', slug=f'part-{i}', price=100,
+                category=category, manufacture_year=2024, supplier='Honda Official',
+            )
+            for i, category in enumerate([cls.mid, cls.mid, cls.leaf, cls.other])
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def delete(self, category):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.delete(reverse('category-detail', args=[category.pk]))
+
+    def test_delete_removes_the_subtree_in_batches(self):
+        self.assertEqual(Category.objects.get(pk=self.root.pk).subtree_motoparts_count, 4)
+        response = self.delete(self.mid)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['progress']['status'], 'done')
+        self.assertEqual(response.json()['progress']['deleted'], {
+            'category.Category': 2,
+            'category.CategoryClosure': 5,
+            'motopart.Motopart': 3,
+        })
+
+        self.assertEqual(set(Category.objects.values_list('pk', flat=True)), {self.root.pk, self.other.pk})
+        self.assertFalse(CategoryClosure.objects.filter(descendant_id__in=[self.mid.pk, self.leaf.pk]).exists())
+        self.assertEqual(list(Motopart.objects.values_list('pk', flat=True)), [self.parts[3].pk])
+        self.assertEqual(
+            sorted(MotopartTombstone.objects.values_list('motopart_id', 'slug', 'category_id')),
+            [
+                (self.parts[0].pk, 'part-0', self.mid.pk),
+                (self.parts[1].pk, 'part-1', self.mid.pk),
+                (self.parts[2].pk, 'part-2', self.leaf.pk),
+            ],
+        )
+        # Counters above the deleted subtree are recounted once it commits
+        root = Category.objects.get(pk=self.root.pk)
+        self.assertEqual((root.active_motoparts_count, root.subtree_motoparts_count), (0, 1))
+
+        progress = self.client.get(reverse('category-deletion', args=[self.mid.pk]))
+        self.assertEqual(progress.json()['status'], 'done')
+
+    def test_running_deletion_is_not_started_twice(self):
+        cache.set(f'deletion:category:{self.mid.pk}', {
+            'status': 'running', 'deleted': {}, 'heartbeat': timezone.now(),
+        })
+        response = self.delete(self.mid)
+        self.assertEqual(response.json()['message'], 'Category deletion already in progress')
+        self.assertTrue(Category.objects.filter(pk=self.mid.pk).exists())
+
+    @override_settings(CHUNKED_DELETE_STALE_SECONDS=60)
+    def test_stale_running_deletion_is_restarted(self):
+        # The worker that wrote this died a while ago
+        cache.set(f'deletion:category:{self.mid.pk}', {
+            'status': 'running', 'deleted': {'motopart.Motopart': 1},
+            'heartbeat': timezone.now() - timedelta(seconds=61),
+        })
+        response = self.delete(self.mid)
+        self.assertEqual(response.json()['message'], 'Category deletion started')
+        self.assertEqual(response.json()['progress']['status'], 'done')
+        self.assertFalse(Category.objects.filter(pk__in=[self.mid.pk, self.leaf.pk]).exists())
+
+
+class CategoryTreeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_user(
+            email='admin@example.com', username='admin', password='x', role='admin'
+        )
+        cls.a = Category.objects.create(name='A', slug='a')
+        cls.b = Category.objects.create(name='B', slug='b', parent=cls.a)
+        cls.c = Category.objects.create(name='C', slug='c', parent=cls.b)
+        cls.d = Category.objects.create(name='D', slug='d')
+        for slug, category, status in [
+            ('part-b', cls.b, 'active'), ('part-c', cls.c, 'active'),
+            ('part-c-old', cls.c, 'inactive'), ('part-d', cls.d, 'active'),
+        ]:
+            Motopart.objects.create(
+                name=slug, slug=slug, price=100, status=status,
+                category=category, manufacture_year=2024, supplier='Honda Official',
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def closure(self):
+        return set(CategoryClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+
+    def subtree_counts(self):
+        return dict(Category.objects.values_list('slug', 'subtree_motoparts_count'))
+
+    def test_moving_a_subtree_relinks_closure_rows_and_counts(self):
+        a, b, c, d = (category.pk for category in (self.a, self.b, self.c, self.d))
+        self.assertEqual(self.subtree_counts(), {'a': 2, 'b': 2, 'c': 1, 'd': 1})
+        response = self.client.patch(reverse('category-detail', args=[b]), {'parent': d}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.closure(), {
+            (a, a, 0), (b, b, 0), (c, c, 0), (d, d, 0), (b, c, 1), (d, b, 1), (d, c, 2),
+        })
+        self.assertEqual(self.subtree_counts(), {'a': 0, 'b': 2, 'c': 1, 'd': 3})
+
+        # And back to the top level
+        category = Category.objects.get(pk=b)
+        category.parent = None
+        category.save()
+        self.assertEqual(self.closure(), {(a, a, 0), (b, b, 0), (c, c, 0), (d, d, 0), (b, c, 1)})
+        self.assertEqual(self.subtree_counts(), {'a': 0, 'b': 2, 'c': 1, 'd': 1})
+
+    def test_a_category_can_not_become_its_own_descendant(self):
+        before = self.closure()
+        for parent in (self.a, self.c):
+            with self.subTest(parent=parent.slug):
+                category = Category.objects.get(pk=self.a.pk)
+                category.parent = parent
+                with self.assertRaises(ValueError):
+                    category.save()
+                response = self.client.patch(
+                    reverse('category-detail', args=[self.a.pk]), {'parent': parent.pk}, format='json'
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('parent', response.json())
+        self.assertIsNone(Category.objects.get(pk=self.a.pk).parent_id)
+        self.assertEqual(self.closure(), before)
+
+    def test_category_tree_filter_returns_every_descendant(self):
+        url = reverse('motopart-list-create')
+        for category, slugs in [
+            (self.a, {'part-b', 'part-c', 'part-c-old'}),
+            (self.b, {'part-b', 'part-c', 'part-c-old'}),
+            (self.c, {'part-c', 'part-c-old'}),
+            (self.d, {'part-d'}),
+        ]:
+            with self.subTest(category=category.slug):
+                response = self.client.get(url, {'category_tree': category.pk, 'fields': 'slug'})
+                self.assertEqual({part['slug'] for part in response.json()['results']}, slugs)
+
+
+class CategoryCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.root = Category.objects.create(name='Engine', slug='engine')
+        cls.pistons = Category.objects.create(name='Pistons', slug='pistons', parent=cls.root)
+        cls.oil = Category.objects.create(name='Oil', slug='oil')
+
+    def counts(self):
+        return {
+            slug: (active, subtree)
+            for slug, active, subtree in Category.objects.values_list(
+                'slug', 'active_motoparts_count', 'subtree_motoparts_count'
+            )
+        }
+
+    def create(self, slug, category, status='active'):
+        return Motopart.objects.create(
+            name=slug, slug=slug, price=100, status=status,
+            category=category, manufacture_year=2024, supplier='Honda Official',
+        )
+
+    def test_counters_follow_writes(self):
+        part = self.create('piston', self.pistons)
+        self.create('draft', self.pistons, status='inactive')
+        self.assertEqual(self.counts(), {'engine': (0, 1), 'pistons': (1, 1), 'oil': (0, 0)})
+
+        part.status = 'inactive'
+        part.save()
+        self.assertEqual(self.counts(), {'engine': (0, 0), 'pistons': (0, 0), 'oil': (0, 0)})
+        part.status = 'active'
+        part.save()
+        self.assertEqual(self.counts(), {'engine': (0, 1), 'pistons': (1, 1), 'oil': (0, 0)})
+
+        part.category = self.oil
+        part.save()
+        self.assertEqual(self.counts(), {'engine': (0, 0), 'pistons': (0, 0), 'oil': (1, 1)})
+        part.category = self.root
+        part.save()
+        self.assertEqual(self.counts(), {'engine': (1, 1), 'pistons': (0, 0), 'oil': (0, 0)})
+
+        part.delete()
+        self.assertEqual(self.counts(), {'engine': (0, 0), 'pistons': (0, 0), 'oil': (0, 0)})
+
+    def test_rebuild_command_repairs_drifted_counters(self):
+        self.create('piston', self.pistons)
+        self.create('filter', self.oil)
+        self.create('draft', self.oil, status='inactive')
+        expected = self.counts()
+        # Drift, e.g. from raw SQL that skipped the signals
+        Category.objects.update(active_motoparts_count=7, subtree_motoparts_count=9)
+        out = io.StringIO()
+        call_command('rebuild_category_counts', stdout=out)
+        self.assertIn('for 3 categories', out.getvalue())
+        self.assertEqual(self.counts(), expected)
+        self.assertEqual(expected, {'engine': (0, 1), 'pistons': (1, 1), 'oil': (1, 1)})
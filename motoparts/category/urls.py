@@ -4,4 +4,5 @@ from . import views
 urlpatterns = [
     path('', views.CategoryListView.as_view(), name='category-list'),
     path('<int:pk>/', views.CategoryDetailView.as_view(), name='category-detail'),
+    path('<int:pk>/deletion/', views.CategoryDeletionView.as_view(), name='category-deletion'),
 ]
\ No newline at end of file
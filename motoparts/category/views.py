@@ -1,10 +1,14 @@
 from django.shortcuts import render
 from .models import Category
-from rest_framework import generics, filters
+from rest_framework import generics, filters, status
 from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from .serializers import CategorySerializer
 from .pagination import CategoryPagination
 from user.permissions import IsAdminUser
+from motoparts.serializers import sparse_queryset
+from motoparts.deletion import deletion_progress, start_background_delete
 from django_filters.rest_framework import DjangoFilterBackend
 
 class CategoryListView(generics.ListCreateAPIView):
@@ -12,9 +16,13 @@ class CategoryListView(generics.ListCreateAPIView):
     serializer_class = CategorySerializer
     pagination_class = CategoryPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filterset_fields = {'parent': ['exact', 'isnull']}
     search_fields = ['name', 'slug']
     ordering_fields = ['name', 'created_at']
     ordering = ['-created_at']  # Default ordering
+
+    def get_queryset(self):
+        return sparse_queryset(super().get_queryset(), self.get_serializer_class(), self.request)
     
     def get_permissions(self):
         """
@@ -30,6 +38,19 @@ class CategoryListView(generics.ListCreateAPIView):
 class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+
+    def destroy(self, request, *args, **kwargs):
+        """
+        Delete the category, its subcategories and their motoparts in
+        batches in the background; poll /categories/<pk>/deletion/ for progress
+        """
+        category = self.get_object()
+        key = f'category:{category.pk}'
+        started = start_background_delete(key, Category.objects.filter(pk=category.pk))
+        return Response({
+            'message': 'Category deletion started' if started else 'Category deletion already in progress',
+            'progress': deletion_progress(key)
+        }, status=status.HTTP_202_ACCEPTED)
     
     def get_permissions(self):
         """
@@ -43,4 +64,15 @@ class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
         return [permission() for permission in permission_classes]
 
 
+class CategoryDeletionView(APIView):
+    """Progress of a background category deletion started by DELETE /categories/<pk>/"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, pk):
+        progress = deletion_progress(f'category:{pk}')
+        if progress is None:
+            return Response({'message': 'No deletion found for this category'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(progress)
+
+
 # Create your views here.
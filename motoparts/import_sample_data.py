@@ -31,14 +31,16 @@ django.setup()
 from category.models import Category
 from motopart.models import Motopart
 from user.models import CustomUser
+from motoparts.deletion import ChunkedDelete
 
 def clear_existing_data():
-    """Clear existing data (optional)"""
+    """Clear existing data (optional), in batches so memory stays flat on large databases"""
     print("Clearing existing data...")
-    Motopart.objects.all().delete()
-    Category.objects.all().delete()
-    CustomUser.objects.all().delete()
-    print("✓ Existing data cleared")
+    deleter = ChunkedDelete()
+    deleter.delete(Motopart.objects.all())
+    deleter.delete(Category.objects.all())
+    deleter.delete(CustomUser.objects.all())
+    print(f"✓ Existing data cleared ({sum(deleter.deleted.values())} rows)")
 
 def import_users():
     """Import sample users"""
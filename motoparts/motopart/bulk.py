@@ -0,0 +1,465 @@
+import csv
+import json
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from category.models import Category
+from .cache import bump_catalog_version
+from .models import Motopart
+from .search import build_search_document, get_search_backend
+from .snapshots import schedule_snapshot_refresh
+from .object_cache import motopart_cache
+from .serializers import MotopartBulkRowSerializer, MotopartBulkUpdateRowSerializer
+
+
+def after_bulk_write(motopart_ids, category_ids, reindex=True):
+    """
+    Bring derived state up to date after bulk_create/bulk_update/update().
+
+    Bulk writes skip save() and model signals, so the search index, the
+    object cache, the category counters and the catalog cache version are
+    refreshed here once per batch instead of once per row, and a catalog
+    snapshot refresh is queued. Pass reindex=False when no searchable text changed.
+    """
+    if motopart_ids and reindex:
+        get_search_backend().index_many(motopart_ids)
+    motopart_cache.invalidate(motopart_ids)
+    category_ids = {pk for pk in category_ids if pk is not None}
+    if category_ids:
+        Category.rebuild_active_counts(category_ids)
+    if motopart_ids or category_ids:
+        bump_catalog_version()
+        schedule_snapshot_refresh(category_ids, motopart_ids)
+
+
+def update_columns(values_by_pk, fields, chunk_size=500):
+    """
+    Write per-row values for a few columns with one UPDATE per chunk.
+
+    values_by_pk maps pk -> sequence of values in `fields` order. Each chunk
+    becomes `UPDATE ... SET f = CASE id WHEN .. THEN .. END, ... WHERE id IN
+    (..)`. Django's bulk_update builds the same statement through the ORM at
+    a far higher Python cost per row.
+    """
+    meta = Motopart._meta
+    db = connections[DEFAULT_DB_ALIAS]
+    quote = db.ops.quote_name
+    model_fields = [meta.get_field(name) for name in fields]
+    # Rows often share values (one updated_at, a handful of statuses); prepare each once
+    prepared = [{} for _ in fields]
+    pk_column = quote(meta.pk.column)
+    items = list(values_by_pk.items())
+    updated = 0
+    for start in range(0, len(items), chunk_size):
+        chunk = items[start:start + chunk_size]
+        assignments, params = [], []
+        for index, field in enumerate(model_fields):
+            cases = []
+            cache = prepared[index]
+            for pk, values in chunk:
+                value = values[index]
+                if value not in cache:
+                    cache[value] = field.get_db_prep_save(value, db)
+                cases.append('WHEN %s THEN %s')
+                params.extend([pk, cache[value]])
+            assignments.append(f'{quote(field.column)} = CASE {pk_column} {" ".join(cases)} END')
+        params.extend(pk for pk, _ in chunk)
+        placeholders = ', '.join(['%s'] * len(chunk))
+        with db.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {quote(meta.db_table)} SET {", ".join(assignments)} '
+                f'WHERE {pk_column} IN ({placeholders})',
+                params,
+            )
+            updated += cursor.rowcount
+    return updated
+
+
+def iter_ndjson_rows(lines):
+    """Yield (line_number, row) from NDJSON bytes, with a ValueError for bad lines"""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as exc:
+            yield number, ValueError(f'Invalid JSON: {exc}')
+
+
+def iter_csv_rows(lines):
+    """Yield (line_number, row) from CSV bytes with a header row; empty cells are omitted"""
+    reader = csv.DictReader(line.decode('utf-8') for line in lines)
+    for row in reader:
+        yield reader.line_num, {key: value for key, value in row.items() if key and value not in ('', None)}
+
+
+class MotopartUpserter:
+    """
+    Insert-or-update motoparts keyed by slug, one batch at a time.
+
+    Each batch costs one validation pass, one category lookup, one slug
+    lookup and one bulk_create/bulk_update inside its own transaction.
+    Rows that fail validation are reported and skipped; they never abort
+    the rest of the batch. With `supplier`, rows may only update that
+    supplier's parts: a slug owned by another supplier is reported instead,
+    checked under the batch's row locks.
+    """
+    batch_size = 1000
+    max_errors = 1000
+    required_on_create = ['name', 'price', 'category_id', 'manufacture_year', 'supplier']
+    search_fields = {'name', 'supplier', 'description'}
+
+    def __init__(self, batch_size=None, supplier=None):
+        if batch_size:
+            self.batch_size = batch_size
+        self.supplier = supplier
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, line, slug, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'slug': slug, 'errors': errors})
+
+    def process(self, rows):
+        """Consume an iterable of (line_number, dict) pairs"""
+        batch = []
+        for line, row in rows:
+            if isinstance(row, Exception):
+                self.add_error(line, None, {'non_field_errors': [str(row)]})
+                continue
+            batch.append((line, row))
+            if len(batch) >= self.batch_size:
+                self.apply_batch(batch)
+                batch = []
+        if batch:
+            self.apply_batch(batch)
+        return self.summary()
+
+    def summary(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+        }
+
+    def validate_batch(self, batch):
+        validator = MotopartBulkRowSerializer()
+        valid = []
+        for line, row in batch:
+            try:
+                valid.append((line, validator.run_validation(row)))
+            except ValidationError as exc:
+                self.add_error(line, row.get('slug') if isinstance(row, dict) else None, exc.detail)
+        return valid
+
+    def apply_batch(self, batch):
+        rows = self.validate_batch(batch)
+        if not rows:
+            return
+
+        category_ids = {data['category_id'] for _, data in rows if 'category_id' in data}
+        known_categories = set(
+            Category.objects.filter(pk__in=category_ids).values_list('pk', flat=True)
+        )
+
+        with transaction.atomic():
+            existing = Motopart.objects.select_for_update().in_bulk(
+                [data['slug'] for _, data in rows], field_name='slug'
+            )
+            now = timezone.now()
+            to_create = {}
+            to_update = {}
+            update_fields = set()
+            touched_categories = set()
+
+            for line, data in rows:
+                slug = data['slug']
+                if data.get('category_id') is not None and data['category_id'] not in known_categories:
+                    self.add_error(line, slug, {'category_id': ['Category not found']})
+                    continue
+                part = existing.get(slug) or to_create.get(slug)
+                if self.supplier is not None and slug in existing and part.supplier != self.supplier:
+                    self.add_error(line, slug, {'slug': [f'Slug belongs to supplier "{part.supplier}"']})
+                    continue
+                if part is None:
+                    missing = [field for field in self.required_on_create if data.get(field) is None]
+                    if missing:
+                        self.add_error(line, slug, {field: ['This field is required.'] for field in missing})
+                        continue
+                    part = Motopart()
+                    to_create[slug] = part
+                elif slug in existing:
+                    to_update[slug] = part
+                    touched_categories.add(part.category_id)
+                    update_fields.update(field for field in data if field != 'slug')
+                for field, value in data.items():
+                    setattr(part, field, value)
+                part.updated_at = now
+                part.search_document = build_search_document(part)
+                touched_categories.add(part.category_id)
+
+            if to_create:
+                Motopart.objects.bulk_create(to_create.values(), batch_size=self.batch_size)
+                if any(part.pk is None for part in to_create.values()):
+                    # Backends without RETURNING (MySQL) do not set pks on bulk_create
+                    created_ids = dict(
+                        Motopart.objects.filter(slug__in=list(to_create)).values_list('slug', 'pk')
+                    )
+                    for slug, part in to_create.items():
+                        part.pk = created_ids[slug]
+            if to_update:
+                fields = sorted(update_fields) + ['updated_at']
+                if update_fields & self.search_fields:
+                    fields.append('search_document')
+                Motopart.objects.bulk_update(to_update.values(), fields, batch_size=self.batch_size)
+
+            written = [part.pk for part in to_create.values()] + [part.pk for part in to_update.values()]
+            after_bulk_write(written, touched_categories)
+
+        self.created += len(to_create)
+        self.updated += len(to_update)
+
+
+class MotopartBulkUpdater:
+    """
+    Apply many `{id|slug, price?, discount?, stock?, status?}` patches at once.
+
+    Rows are validated field by field against the row serializer's fields
+    (a full serializer pass per row costs several times more). Targets are
+    locked and read in chunks, later rows for the same part win, and only
+    parts whose values actually change are written with update_columns, so
+    updated_at and the change feed only move for real changes. Everything
+    runs in one transaction.
+    """
+    fields = ['price', 'discount', 'stock', 'status']
+    chunk_size = 500
+
+    def __init__(self):
+        self.row_fields = MotopartBulkUpdateRowSerializer().fields
+        self.results = []
+        self.failed = 0
+
+    def validate(self, index, row):
+        """Return (key_field, key, changes) or record an error and return None"""
+        errors = {}
+        if not isinstance(row, dict):
+            errors['non_field_errors'] = ['Expected an object']
+        else:
+            unknown = set(row) - set(self.row_fields)
+            if unknown:
+                errors['non_field_errors'] = [f"Unknown fields: {', '.join(sorted(unknown))}"]
+            if ('id' in row) == ('slug' in row):
+                errors['non_field_errors'] = ['Provide exactly one of id or slug']
+            elif not any(field in row for field in self.fields):
+                errors['non_field_errors'] = [f"Provide at least one of {', '.join(self.fields)}"]
+        if not errors:
+            data = {}
+            for name, value in row.items():
+                try:
+                    data[name] = self.row_fields[name].run_validation(value)
+                except ValidationError as exc:
+                    errors[name] = exc.detail
+        if errors:
+            self.failed += 1
+            self.results.append({'index': index, 'result': 'invalid', 'errors': errors})
+            return None
+        key_field = 'id' if 'id' in data else 'slug'
+        return key_field, data.pop(key_field), data
+
+    def load_current(self, ids, slugs):
+        """Lock the targets and return ({pk: [category_id, *fields]}, {slug: pk})"""
+        current, pk_by_slug = {}, {}
+        for lookup, keys in (('pk__in', list(ids)), ('slug__in', list(slugs))):
+            for start in range(0, len(keys), self.chunk_size):
+                rows = Motopart.objects.select_for_update().filter(
+                    **{lookup: keys[start:start + self.chunk_size]}
+                ).order_by().values_list('id', 'slug', 'category_id', *self.fields)
+                for pk, slug, *values in rows:
+                    current[pk] = values
+                    pk_by_slug[slug] = pk
+        return current, pk_by_slug
+
+    def apply(self, rows):
+        patches = []
+        for index, row in enumerate(rows):
+            patch = self.validate(index, row)
+            if patch is not None:
+                patches.append((index, *patch))
+
+        with transaction.atomic():
+            current, pk_by_slug = self.load_current(
+                {key for _, field, key, _ in patches if field == 'id'},
+                {key for _, field, key, _ in patches if field == 'slug'},
+            )
+            pending, targets, touched = {}, [], set()
+            for index, key_field, key, changes in patches:
+                pk = key if key_field == 'id' else pk_by_slug.get(key)
+                if pk not in current:
+                    self.failed += 1
+                    self.results.append({'index': index, key_field: key, 'result': 'not_found'})
+                    continue
+                values = pending.setdefault(pk, list(current[pk]))
+                for field, value in changes.items():
+                    values[1 + self.fields.index(field)] = value
+                touched.update(changes)
+                targets.append((index, pk))
+
+            changed = {pk: values for pk, values in pending.items() if values != current[pk]}
+            if changed:
+                columns = [field for field in self.fields if field in touched]
+                positions = [1 + self.fields.index(field) for field in columns]
+                now = timezone.now()
+                update_columns(
+                    {pk: [values[i] for i in positions] + [now] for pk, values in changed.items()},
+                    columns + ['updated_at'],
+                    chunk_size=self.chunk_size,
+                )
+                status_index = 1 + self.fields.index('status')
+                touched_categories = {
+                    values[0] for pk, values in changed.items()
+                    if values[status_index] != current[pk][status_index]
+                }
+                after_bulk_write(list(changed), touched_categories, reindex=False)
+
+        for index, pk in targets:
+            self.results.append({'index': index, 'id': pk, 'result': 'updated' if pk in changed else 'unchanged'})
+        self.results.sort(key=lambda result: result['index'])
+        return self.summary(len(changed))
+
+    def summary(self, updated):
+        return {
+            'updated': updated,
+            'unchanged': sum(1 for result in self.results if result['result'] == 'unchanged'),
+            'failed': self.failed,
+            'results': self.results,
+        }
+
+
+class SupplierFeedSync:
+    """
+    Apply a supplier's price/stock feed, writing only the rows that changed.
+
+    The supplier's current price/discount/stock/status is read once into a
+    slug -> tuple map. Feed rows are streamed and compared against it, so
+    memory is bounded by the supplier's catalog, not the feed. Changed rows
+    are written with update_columns in batches. Unknown slugs go through
+    MotopartUpserter restricted to the supplier, so a slug owned by another
+    supplier is reported as a failed row, never taken over. Slugs left in
+    the map at the end are missing from the feed.
+
+    A dry run computes the same diff. It runs each insert batch for real and
+    rolls it back, so validation, required fields and slug ownership are
+    checked exactly as in a real run.
+    """
+    tracked_fields = ['price', 'discount', 'stock', 'status']
+    batch_size = 1000
+
+    def __init__(self, supplier, batch_size=None, missing_status=None, dry_run=False):
+        self.supplier = supplier
+        if batch_size:
+            self.batch_size = batch_size
+        self.missing_status = missing_status
+        self.dry_run = dry_run
+        self.upserter = MotopartUpserter(batch_size=self.batch_size, supplier=supplier)
+        self.updated = 0
+        self.unchanged = 0
+        self.current = {}
+
+    def load_current(self):
+        rows = Motopart.objects.filter(supplier=self.supplier).values_list(
+            'slug', 'id', 'category_id', *self.tracked_fields
+        )
+        self.current = {row[0]: row[1:] for row in rows.iterator()}
+
+    def process(self, rows):
+        self.load_current()
+        validator = MotopartBulkRowSerializer()
+        changed, new_rows = [], []
+        for line, row in rows:
+            if isinstance(row, Exception):
+                self.upserter.add_error(line, None, {'non_field_errors': [str(row)]})
+                continue
+            try:
+                data = validator.run_validation(row)
+            except ValidationError as exc:
+                self.upserter.add_error(line, row.get('slug') if isinstance(row, dict) else None, exc.detail)
+                continue
+            state = self.current.pop(data['slug'], None)
+            if state is None:
+                data['supplier'] = self.supplier
+                new_rows.append((line, data))
+                if len(new_rows) >= self.batch_size:
+                    self.insert(new_rows)
+                    new_rows = []
+                continue
+            pk, category_id, *values = state
+            incoming = [data.get(field, value) for field, value in zip(self.tracked_fields, values)]
+            if incoming == values:
+                self.unchanged += 1
+                continue
+            changed.append((pk, category_id, values[3], incoming))
+            if len(changed) >= self.batch_size:
+                self.update(changed)
+                changed = []
+        if changed:
+            self.update(changed)
+        if new_rows:
+            self.insert(new_rows)
+        missing = list(self.current.values())
+        if missing and self.missing_status:
+            self.mark_missing(missing)
+        return self.summary(len(missing))
+
+    def insert(self, rows):
+        if not self.dry_run:
+            self.upserter.apply_batch(rows)
+            return
+        with transaction.atomic():
+            self.upserter.apply_batch(rows)
+            transaction.set_rollback(True)
+
+    def update(self, changed):
+        self.updated += len(changed)
+        if self.dry_run:
+            return
+        now = timezone.now()
+        values_by_pk = {}
+        touched_categories = set()
+        for pk, category_id, old_status, values in changed:
+            values_by_pk[pk] = values + [now]
+            if values[3] != old_status:
+                touched_categories.add(category_id)
+        with transaction.atomic():
+            update_columns(values_by_pk, self.tracked_fields + ['updated_at'])
+            after_bulk_write(list(values_by_pk), touched_categories, reindex=False)
+
+    def mark_missing(self, missing):
+        if self.dry_run:
+            return
+        stale = [(pk, category_id) for pk, category_id, _, _, _, status in missing if status != self.missing_status]
+        for start in range(0, len(stale), self.batch_size):
+            chunk = stale[start:start + self.batch_size]
+            ids = [pk for pk, _ in chunk]
+            with transaction.atomic():
+                Motopart.objects.filter(pk__in=ids).update(
+                    status=self.missing_status, updated_at=timezone.now()
+                )
+                after_bulk_write(ids, {category_id for _, category_id in chunk}, reindex=False)
+
+    def summary(self, missing):
+        return {
+            'inserted': self.upserter.created,
+            # Upserter updates: slugs repeated in the feed or created by the supplier since load_current
+            'updated': self.updated + self.upserter.updated,
+            'unchanged': self.unchanged,
+            'missing': missing,
+            'failed': self.upserter.failed,
+            'errors': self.upserter.errors,
+        }
@@ -0,0 +1,107 @@
+import hashlib
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F
+from django.utils import timezone
+from .models import CatalogVersion
+
+
+def get_catalog_version():
+    """Current committed catalog version; part of every derived cache key"""
+    version = CatalogVersion.objects.filter(pk=1).values_list('version', flat=True).first()
+    return version or 1
+
+
+def bump_catalog_version():
+    """
+    Invalidate everything derived from the catalog after a write. Call it
+    inside the write's transaction: the bump then commits (or rolls back)
+    with the write, and concurrent writers queue on the version row.
+    """
+    if not CatalogVersion.objects.filter(pk=1).update(version=F('version') + 1, updated_at=timezone.now()):
+        CatalogVersion.objects.get_or_create(pk=1, defaults={'version': 2})
+
+
+def catalog_cache_key(prefix, query_params, ignored=()):
+    """Cache key for a catalog query, independent of parameter order"""
+    items = sorted(
+        (name, value)
+        for name in query_params
+        if name not in ignored
+        for value in query_params.getlist(name)
+        if value != ''
+    )
+    digest = hashlib.md5(repr(items).encode()).hexdigest()
+    return f'motopart:{prefix}:v{get_catalog_version()}:{digest}'
+
+
+class CatalogReplica(ABC):
+    """
+    Base of the in-process copies of the catalog: the typeahead index, the
+    trigram index and the columnar snapshot.
+
+    `version` is the CatalogVersion a copy was built from, read before its
+    rows, so a write racing the build can only make the copy look older than
+    it is. It changes only when rebuild() swaps in a new copy. Saves in this
+    process patch the copy once they commit, so this process reads its own
+    writes, but the version stays as it was. A bump from any process is only
+    ever adopted by rebuilding.
+
+    refresh() runs on the request path and never waits for a build. At most
+    once per MOTOPART_CATALOG_POLL_SECONDS it starts a background thread that
+    reads the version and rebuilds if the version moved. Requests keep
+    reading the previous copy in the meantime. With
+    MOTOPART_REPLICA_REBUILD_IN_BACKGROUND = False the check and the build
+    run inline instead.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._checked_at = None
+        self.version = None
+
+    @abstractmethod
+    def build(self, version):
+        """Read the catalog and swap the new copy in under self._lock, setting self.version"""
+
+    def rebuild(self):
+        self.build(get_catalog_version())
+
+    def refresh(self, version=None):
+        """
+        Bring the copy up to date without blocking. Pass `version` when the
+        caller has already read it; the poll interval then does not apply.
+        """
+        background = getattr(settings, 'MOTOPART_REPLICA_REBUILD_IN_BACKGROUND', True)
+        now = time.monotonic()
+        with self._lock:
+            if self._refreshing:
+                return
+            if version is None:
+                interval = getattr(settings, 'MOTOPART_CATALOG_POLL_SECONDS', 2)
+                if self._checked_at is not None and now - self._checked_at < interval:
+                    return
+                self._checked_at = now
+            elif version == self.version:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                if (version if version is not None else get_catalog_version()) != self.version:
+                    self.rebuild()
+            finally:
+                with self._lock:
+                    self._refreshing = False
+                if background:
+                    connections.close_all()
+
+        if background:
+            threading.Thread(target=run, name=f'{type(self).__name__}-rebuild', daemon=True).start()
+        else:
+            run()
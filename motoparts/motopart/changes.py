@@ -0,0 +1,98 @@
+import base64
+import binascii
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import MotopartTombstone
+
+
+class CursorExpired(Exception):
+    """The cursor was issued before the tombstone retention window"""
+
+
+def encode_change_cursor(changed_at, pk, issued_at=None):
+    payload = json.dumps({
+        't': changed_at.isoformat(),
+        'id': pk,
+        'at': (issued_at or timezone.now()).isoformat(),
+    })
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_change_cursor(encoded):
+    """Return (changed_at, id, issued_at) or raise ValueError"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+        changed_at = parse_datetime(data['t'])
+        issued_at = parse_datetime(data['at'])
+        if changed_at is None or issued_at is None:
+            raise ValueError
+        return changed_at, int(data['id']), issued_at
+    except (TypeError, KeyError, binascii.Error) as exc:
+        raise ValueError(str(exc))
+
+
+def tombstone_retention():
+    return timedelta(days=getattr(settings, 'MOTOPART_TOMBSTONE_RETENTION_DAYS', 30))
+
+
+class ChangeFeed:
+    """
+    Created/updated parts and deletions in (changed_at, id) order.
+
+    Upserts come from the (updated_at, id) index on Motopart, deletions from
+    the (deleted_at, motopart_id) index on MotopartTombstone; each page is
+    one range scan on each and a merge of the two. Rows changed within the
+    last `settle` are held back so a write that commits late with an older
+    updated_at is not skipped by a cursor that already moved past it.
+    """
+    settle = timedelta(seconds=2)
+
+    def __init__(self, since=None, limit=200):
+        self.since = since
+        self.limit = limit
+
+    def filter_after(self, queryset, time_field, id_field, horizon):
+        queryset = queryset.filter(**{f'{time_field}__lte': horizon})
+        if self.since is not None:
+            changed_at, pk, _ = self.since
+            queryset = queryset.filter(
+                Q(**{f'{time_field}__gt': changed_at})
+                | Q(**{time_field: changed_at, f'{id_field}__gt': pk})
+            )
+        return queryset.order_by(time_field, id_field)[:self.limit + 1]
+
+    def fetch(self, queryset):
+        """
+        Return (entries, has_more). Entries are (changed_at, id, op, obj)
+        with op 'upsert' for a Motopart and 'delete' for a MotopartTombstone.
+        """
+        now = timezone.now()
+        # Deletions after the cursor was issued are still in the tombstone
+        # table unless the client has been away longer than the retention
+        if self.since is not None and self.since[2] < now - tombstone_retention():
+            raise CursorExpired
+        horizon = now - self.settle
+        upserts = [
+            (part.updated_at, part.pk, 'upsert', part)
+            for part in self.filter_after(queryset, 'updated_at', 'id', horizon)
+        ]
+        deletions = [
+            (tombstone.deleted_at, tombstone.motopart_id, 'delete', tombstone)
+            for tombstone in self.filter_after(
+                MotopartTombstone.objects.all(), 'deleted_at', 'motopart_id', horizon
+            )
+        ]
+        merged = sorted(upserts + deletions, key=lambda entry: (entry[0], entry[1]))
+        return merged[:self.limit], len(merged) > self.limit
+
+
+def prune_tombstones():
+    """Delete tombstones older than the retention window; returns the count"""
+    cutoff = timezone.now() - tombstone_retention()
+    deleted, _ = MotopartTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,302 @@
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import datetime
+from itertools import accumulate
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.cache import caches
+from .cache import CatalogReplica, get_catalog_version
+from .models import Motopart
+
+
+def columnar_enabled():
+    return getattr(settings, 'MOTOPART_COLUMNAR_ENGINE', False)
+
+
+def columnar_cache():
+    """The cache alias workers share snapshots through, or None to build one per process"""
+    alias = getattr(settings, 'MOTOPART_COLUMNAR_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def _bitmask(positions, size):
+    """Python int with the given row positions set; AND/bit_count run in C"""
+    buffer = bytearray((size + 7) // 8)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def _parse_bool(value):
+    if value in ('true', 'True', '1'):
+        return True
+    if value in ('false', 'False', '0'):
+        return False
+    raise ValueError(value)
+
+
+class RankedMask:
+    """
+    A filter mask re-expressed in sort order: bit r is set when the row of
+    rank r matches. A running popcount per chunk finds the chunk holding the
+    n-th match with a bisect, so a page only walks the bits of the chunks it
+    spans instead of every row before it.
+    """
+    chunk_bytes = 128
+
+    def __init__(self, mask, order, size):
+        flags = format(mask, f'0{size}b')[::-1] if size else ''
+        # itemgetter and join permute the flags in C
+        ranked = ''.join(itemgetter(*order)(flags)) if size > 1 else flags
+        self.data = int(ranked[::-1] or '0', 2).to_bytes(max(1, (size + 7) // 8), 'little')
+        step = self.chunk_bytes
+        self.counts = array('q', accumulate(
+            int.from_bytes(self.data[i:i + step], 'little').bit_count()
+            for i in range(0, len(self.data), step)
+        ))
+        self.total = self.counts[-1]
+
+    def ranks(self, start, stop):
+        """Ranks of the start-th to (stop - 1)-th matching rows, ascending"""
+        step = self.chunk_bytes
+        chunk = bisect_right(self.counts, start)
+        seen = self.counts[chunk - 1] if chunk else 0
+        found = []
+        while chunk < len(self.counts) and len(found) < stop - start:
+            bits = int.from_bytes(self.data[chunk * step:(chunk + 1) * step], 'little')
+            base = chunk * step * 8
+            while bits and len(found) < stop - start:
+                low = bits & -bits
+                if seen >= start:
+                    found.append(base + low.bit_length() - 1)
+                seen += 1
+                bits ^= low
+            chunk += 1
+        return found
+
+
+class CatalogSnapshot:
+    """
+    Immutable column snapshot of the catalog.
+
+    Rows are addressed by position. `ids` maps position to pk, every filter
+    value has a bitmask of the positions holding it, and every sortable field
+    has a precomputed permutation of positions sorted by (value, id). The
+    RankedMask of recent filter/sort combinations is kept per snapshot.
+    """
+    filter_columns = {
+        'category': 'category_id',
+        'status': 'status',
+        'manufacture_year': 'manufacture_year',
+        'supplier': 'supplier',
+        'available': 'is_available',
+    }
+    sort_columns = ['name', 'price', 'discounted_price', 'stock', 'manufacture_year', 'created_at']
+    ranked_limit = 128
+
+    def __init__(self, version):
+        self.version = version
+        self._ranked = OrderedDict()
+        self._ranked_lock = threading.Lock()
+        columns = list(dict.fromkeys(['id', *self.filter_columns.values(), *self.sort_columns]))
+        rows = list(Motopart.objects.order_by('id').values_list(*columns))
+        self.size = len(rows)
+        self.ids = array('q', (row[0] for row in rows))
+        self.all_mask = (1 << self.size) - 1
+
+        self.masks = {}
+        for param, column in self.filter_columns.items():
+            index = columns.index(column)
+            positions = {}
+            for position, row in enumerate(rows):
+                positions.setdefault(row[index], []).append(position)
+            self.masks[param] = {value: _bitmask(found, self.size) for value, found in positions.items()}
+
+        self.orders = {}
+        for column in self.sort_columns:
+            index = columns.index(column)
+            keys = [row[index] for row in rows]
+            if column == 'created_at':
+                keys = [value.timestamp() if isinstance(value, datetime) else value for value in keys]
+            # rows are in id order and sort() is stable, so ties stay in id order
+            self.orders[column] = array('l', sorted(range(self.size), key=keys.__getitem__))
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_ranked'], state['_ranked_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state, _ranked=OrderedDict(), _ranked_lock=threading.Lock())
+
+    def ranked(self, filters, mask, column):
+        """RankedMask of `mask` (the match of `filters`) in `column` order, cached"""
+        key = (tuple(sorted(filters.items())), column)
+        with self._ranked_lock:
+            ranked = self._ranked.get(key)
+            if ranked is not None:
+                self._ranked.move_to_end(key)
+                return ranked
+        ranked = RankedMask(mask, self.orders[column], self.size)
+        with self._ranked_lock:
+            self._ranked[key] = ranked
+            if len(self._ranked) > self.ranked_limit:
+                self._ranked.popitem(last=False)
+        return ranked
+
+    def parse_filters(self, params):
+        """
+        Filter values in column types, or None for anything the engine cannot
+        answer. That includes categories without parts in the snapshot: the
+        ORM filter validates the id against the category table and answers
+        unknown ones with 400.
+        """
+        parsed = {}
+        for param in self.filter_columns:
+            value = params.get(param)
+            if value in (None, ''):
+                continue
+            try:
+                if param in ('category', 'manufacture_year'):
+                    value = int(value)
+                elif param == 'available':
+                    value = _parse_bool(value)
+            except ValueError:
+                return None
+            if param == 'status' and value not in dict(Motopart.STATUS_CHOICES):
+                return None
+            if param == 'category' and value not in self.masks['category']:
+                return None
+            parsed[param] = value
+        return parsed
+
+    def match(self, filters):
+        mask = self.all_mask
+        for param, value in filters.items():
+            mask &= self.masks[param].get(value, 0)
+            if not mask:
+                break
+        return mask
+
+    def ordering(self, requested, default):
+        """(column, descending) for a single supported field, or None"""
+        field = requested or default
+        if ',' in field:
+            return None
+        column = field.lstrip('-')
+        if column not in self.orders:
+            return None
+        return column, field.startswith('-')
+
+
+class ColumnarResult:
+    """
+    Matching rows in order, as a sequence a Django Paginator can slice.
+
+    count() is a popcount of the filter mask; a slice of a filtered result
+    comes from the snapshot's RankedMask, and only the rows of the slice are
+    hydrated.
+    """
+
+    def __init__(self, snapshot, filters, column, descending, queryset):
+        self.snapshot = snapshot
+        self.filters = filters
+        self.mask = snapshot.match(filters)
+        self.column = column
+        self.order = snapshot.orders[column]
+        self.descending = descending
+        self.queryset = queryset
+        self._count = self.mask.bit_count()
+
+    def count(self):
+        return self._count
+
+    def __len__(self):
+        return self._count
+
+    def positions(self, start, stop):
+        if self.descending:
+            # The same ranks counted from the end
+            start, stop = self._count - stop, self._count - start
+        if self.mask == self.snapshot.all_mask:
+            positions = list(self.order[start:stop])
+        else:
+            ranks = self.snapshot.ranked(self.filters, self.mask, self.column).ranks(start, stop)
+            positions = [self.order[rank] for rank in ranks]
+        return positions[::-1] if self.descending else positions
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice) or item.step not in (None, 1):
+            raise TypeError('ColumnarResult only supports contiguous slices')
+        start, stop, _ = item.indices(self._count)
+        if stop <= start:
+            return []
+        ids = [self.snapshot.ids[position] for position in self.positions(start, stop)]
+        rows = self.queryset.in_bulk(ids)
+        return [rows[pk] for pk in ids if pk in rows]
+
+
+class ColumnarCatalog(CatalogReplica):
+    """
+    Optional in-process engine for the default catalog listing.
+
+    Answers category/status/manufacture_year/supplier/available filters with
+    single-field ordering and page-number pagination from a column snapshot,
+    so the database only sees a version lookup and a primary-key lookup for
+    the page's rows. A snapshot is used only while it matches the committed
+    CatalogVersion. Otherwise the request goes through the ORM and a rebuild
+    starts in the background (see CatalogReplica), so results are never
+    stale. Anything else (search, price ranges, cursors, multi-field
+    ordering) also returns None and goes through the ORM. With
+    MOTOPART_COLUMNAR_CACHE set, the first worker to build a version shares
+    the snapshot and the others load it instead of scanning the table.
+    """
+    supported_params = {
+        'page', 'page_size', 'ordering', 'fields', 'expand', *CatalogSnapshot.filter_columns
+    }
+    shared_timeout = 60 * 60
+
+    def __init__(self):
+        super().__init__()
+        self.snapshot = None
+
+    def build(self, version):
+        """Load the version's snapshot from the shared cache, or build and share it"""
+        cache = columnar_cache()
+        key = f'motopart:columnar:{version}'
+        snapshot = cache.get(key) if cache is not None else None
+        if snapshot is None:
+            snapshot = CatalogSnapshot(version)
+            if cache is not None:
+                cache.set(key, snapshot, self.shared_timeout)
+        with self._lock:
+            self.snapshot = snapshot
+            self.version = version
+
+    def current(self):
+        """The snapshot of the committed catalog version, or None while one is being built"""
+        version = get_catalog_version()
+        snapshot = self.snapshot
+        if snapshot is None or snapshot.version != version:
+            self.refresh(version)
+            snapshot = self.snapshot
+        return snapshot if snapshot is not None and snapshot.version == version else None
+
+    def query(self, params, queryset, default_ordering):
+        """ColumnarResult for the request, or None when the ORM has to answer it"""
+        if any(param not in self.supported_params for param in params):
+            return None
+        snapshot = self.current()
+        if snapshot is None:
+            return None
+        filters = snapshot.parse_filters(params)
+        ordering = snapshot.ordering(params.get('ordering', '').strip(), default_ordering)
+        if filters is None or ordering is None:
+            return None
+        return ColumnarResult(snapshot, filters, *ordering, queryset)
+
+
+columnar_catalog = ColumnarCatalog()
@@ -0,0 +1,56 @@
+import django_filters
+from django.db.models import Case, IntegerField, Value, When
+from rest_framework import filters
+from rest_framework.settings import api_settings
+from .models import Motopart
+from .fuzzy import fuzzy_index
+from .search import get_search_backend
+
+
+class MotopartFilter(django_filters.FilterSet):
+    """Catalog filters, including price range and availability on the generated columns"""
+    min_price = django_filters.NumberFilter(field_name='discounted_price', lookup_expr='gte')
+    max_price = django_filters.NumberFilter(field_name='discounted_price', lookup_expr='lte')
+    available = django_filters.BooleanFilter(field_name='is_available')
+    # Parts anywhere under a category: one join on the closure table's ancestor index
+    category_tree = django_filters.NumberFilter(field_name='category__ancestor_links__ancestor')
+
+    class Meta:
+        model = Motopart
+        fields = ['category', 'status', 'manufacture_year', 'supplier']
+
+
+class MotopartSearchFilter(filters.SearchFilter):
+    """`?search=` backed by the full-text index instead of LIKE scans"""
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        query = ' '.join(terms)
+        results = get_search_backend().search(queryset, query)
+        if results.exists():
+            return results
+        return self.fuzzy_search(queryset, query)
+
+    def fuzzy_search(self, queryset, query):
+        """Typo-tolerant fallback: closest parts by edit distance, best first"""
+        distances = fuzzy_index.search(query)
+        return queryset.filter(pk__in=list(distances)).annotate(
+            search_rank=Case(
+                *[When(pk=pk, then=Value(-distance)) for pk, distance in distances.items()],
+                default=Value(None),
+                output_field=IntegerField(),
+            )
+        )
+
+
+class MotopartOrderingFilter(filters.OrderingFilter):
+    """Order search results by relevance unless the client asks otherwise"""
+
+    def get_ordering(self, request, queryset, view):
+        params = request.query_params.get(self.ordering_param)
+        search = request.query_params.get(api_settings.SEARCH_PARAM)
+        if not params and search and 'search_rank' in queryset.query.annotations:
+            return ['-search_rank'] + list(self.get_default_ordering(view) or [])
+        return super().get_ordering(request, queryset, view)
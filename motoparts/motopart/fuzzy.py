@@ -0,0 +1,151 @@
+from collections import Counter
+
+from .cache import CatalogReplica
+from .search import tokenize
+
+
+def trigrams(token):
+    """Trigrams of a token padded with one marker on each side"""
+    padded = f'${token}$'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_distance(token):
+    """Edit budget for a query token: none for numbers, more for longer words"""
+    if token.isdigit():
+        return 0
+    if len(token) <= 4:
+        return 1
+    return 2
+
+
+def bounded_levenshtein(a, b, limit):
+    """Edit distance between a and b, or None when it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            ))
+        if min(current) > limit:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= limit else None
+
+
+class TrigramIndex(CatalogReplica):
+    """
+    In-process trigram index over motopart name tokens for typo-tolerant search.
+
+    A query token only gets compared against vocabulary tokens that share
+    enough trigrams with it to possibly be within its edit budget (each edit
+    destroys at most three trigrams), so lookups stay sub-linear in the size
+    of the vocabulary. The index follows the catalog as described in
+    CatalogReplica, like the typeahead PrefixIndex.
+    """
+    max_results = 200
+
+    def __init__(self):
+        super().__init__()
+        self._postings = {}
+        self._grams = {}
+        self._tokens = {}
+
+    @staticmethod
+    def _add(postings, grams, tokens_by_pk, pk, name):
+        tokens = set(tokenize(name))
+        tokens_by_pk[pk] = tokens
+        for token in tokens:
+            ids = postings.setdefault(token, set())
+            if not ids:
+                for gram in trigrams(token):
+                    grams.setdefault(gram, set()).add(token)
+            ids.add(pk)
+
+    def _remove_locked(self, pk):
+        for token in self._tokens.pop(pk, ()):
+            ids = self._postings.get(token)
+            if ids is None:
+                continue
+            ids.discard(pk)
+            if not ids:
+                del self._postings[token]
+                for gram in trigrams(token):
+                    self._grams[gram].discard(token)
+
+    def build(self, version):
+        from .models import Motopart
+        postings, grams, tokens = {}, {}, {}
+        for pk, name in Motopart.objects.values_list('id', 'name').iterator():
+            self._add(postings, grams, tokens, pk, name)
+        with self._lock:
+            self._postings, self._grams, self._tokens = postings, grams, tokens
+            self.version = version
+
+    def update(self, motopart):
+        """Re-index one committed part"""
+        if self.version is None:
+            return
+        with self._lock:
+            self._remove_locked(motopart.pk)
+            self._add(self._postings, self._grams, self._tokens, motopart.pk, motopart.name)
+
+    def remove(self, pk):
+        if self.version is None:
+            return
+        with self._lock:
+            self._remove_locked(pk)
+
+    def _similar_tokens(self, token):
+        """Vocabulary tokens within the edit budget of token, with their distance"""
+        limit = max_distance(token)
+        if token in self._postings and limit == 0:
+            return {token: 0}
+        grams = trigrams(token)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._grams.get(gram, ()))
+        needed = len(grams) - 3 * limit
+        matches = {}
+        for candidate, count in shared.items():
+            if count < needed:
+                continue
+            # A query that is a prefix of the word ("wav" -> "wave") costs 1
+            if candidate.startswith(token):
+                distance = 0 if candidate == token else 1
+            else:
+                distance = bounded_levenshtein(token, candidate, limit)
+            if distance is not None and distance <= limit:
+                matches[candidate] = distance
+        return matches
+
+    def search(self, query):
+        """Map of part id -> total edit distance for parts matching every query token"""
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return {}
+        self.refresh()
+        with self._lock:
+            scores = None
+            for token in query_tokens:
+                best = {}
+                for candidate, distance in self._similar_tokens(token).items():
+                    for pk in self._postings[candidate]:
+                        if pk not in best or distance < best[pk]:
+                            best[pk] = distance
+                if scores is None:
+                    scores = best
+                else:
+                    scores = {pk: scores[pk] + distance for pk, distance in best.items() if pk in scores}
+                if not scores:
+                    return {}
+        ranked = sorted(scores.items(), key=lambda item: (item[1], item[0]))
+        return dict(ranked[:self.max_results])
+
+
+fuzzy_index = TrigramIndex()
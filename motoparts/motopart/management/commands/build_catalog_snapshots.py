@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from motopart.snapshots import CatalogSnapshotWriter
+
+
+class Command(BaseCommand):
+    help = (
+        'Render the public catalog listings (motoparts, categories and per-category '
+        'pages) to JSON files with gzip siblings, swapped in atomically'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--root', help='Output directory (defaults to CATALOG_SNAPSHOT_ROOT)')
+        parser.add_argument('--pages', type=int, help='Pages per listing (defaults to CATALOG_SNAPSHOT_PAGES)')
+        parser.add_argument(
+            '--category', type=int, action='append', dest='categories',
+            help='Only refresh the shared listings and these categories; repeatable',
+        )
+
+    def handle(self, *args, **options):
+        writer = CatalogSnapshotWriter(root=options['root'], pages=options['pages'])
+        if options['categories']:
+            writer.refresh(set(options['categories']))
+        else:
+            writer.build_all()
+        self.stdout.write(self.style.SUCCESS(f'Wrote {writer.written} snapshot pages to {writer.root}'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from motopart.related import CoPurchaseBuilder
+
+
+class Command(BaseCommand):
+    help = (
+        'Fold order items placed since the last run into the co-purchase counts '
+        'and refresh the "frequently bought together" top-K table'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Recount the whole order history')
+        parser.add_argument('--top-k', type=int, help='Neighbours kept per part; changing it needs --rebuild')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        builder = CoPurchaseBuilder(top_k=options['top_k'], batch_size=options['batch_size'])
+        summary = builder.refresh(rebuild=options['rebuild'])
+        self.stdout.write(self.style.SUCCESS(
+            f"orders={summary['orders']} pairs={summary['pairs']} parts={summary['parts']} "
+            f"last_order_item_id={summary['last_order_item_id']}"
+        ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from motopart.changes import prune_tombstones, tombstone_retention
+
+
+class Command(BaseCommand):
+    help = 'Delete change feed tombstones older than MOTOPART_TOMBSTONE_RETENTION_DAYS'
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} tombstones older than {tombstone_retention().days} days'
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from motopart.models import Motopart
+from motopart.search import build_search_document, get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Recompute motopart search documents and rebuild the full-text index'
+
+    def handle(self, *args, **options):
+        parts = list(Motopart.objects.only('id', 'name', 'supplier', 'description'))
+        for part in parts:
+            part.search_document = build_search_document(part)
+        Motopart.objects.bulk_update(parts, ['search_document'], batch_size=500)
+        get_search_backend().rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {len(parts)} motoparts'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from motopart.popularity import SalesCounter
+
+
+class Command(BaseCommand):
+    help = 'Count order items placed since the last run into MotopartStats.sales and the popularity score'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        summary = SalesCounter(batch_size=options['batch_size']).refresh()
+        self.stdout.write(self.style.SUCCESS(
+            f"units={summary['units']} parts={summary['parts']} "
+            f"last_order_item_id={summary['last_order_item_id']}"
+        ))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from motopart.bulk import SupplierFeedSync, iter_csv_rows, iter_ndjson_rows
+from motopart.models import Motopart
+
+
+class Command(BaseCommand):
+    help = (
+        "Sync one supplier's price/stock feed (CSV or NDJSON keyed by slug), "
+        "writing only rows whose price, discount, stock or status changed"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('supplier', help='Motopart.supplier value, e.g. "Honda Official"')
+        parser.add_argument('path', help='Feed file')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--missing-status',
+            choices=[choice for choice, _ in Motopart.STATUS_CHOICES],
+            help='Set this status on parts of the supplier that are absent from the feed',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Report the diff without writing')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        feed_format = options['format'] or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+        sync = SupplierFeedSync(
+            options['supplier'],
+            batch_size=options['batch_size'],
+            missing_status=options['missing_status'],
+            dry_run=options['dry_run'],
+        )
+        try:
+            with open(path, 'rb') as feed:
+                rows = iter_csv_rows(feed) if feed_format == 'csv' else iter_ndjson_rows(feed)
+                summary = sync.process(rows)
+        except OSError as exc:
+            raise CommandError(f'Cannot read feed: {exc}')
+
+        for error in summary['errors']:
+            self.stderr.write(f"line {error['line']} ({error['slug']}): {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{'[dry run] ' if options['dry_run'] else ''}"
+            f"inserted={summary['inserted']} updated={summary['updated']} "
+            f"unchanged={summary['unchanged']} missing={summary['missing']} failed={summary['failed']}"
+        ))
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:58
+
+import unicodedata
+
+from django.db import migrations, models
+
+# Frozen copies of motopart.search as of this migration, so later changes to
+# the live folding or renames there do not change what it does
+SEARCH_INDEX_TABLE = 'motopart_search_index'
+BATCH_SIZE = 500
+
+
+def fold_text(value):
+    if not value:
+        return ''
+    value = value.lower().replace('đ', 'd')
+    decomposed = unicodedata.normalize('NFD', value)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def build_search_document(motopart):
+    return ' '.join(fold_text(part) for part in (
+        motopart.name, motopart.supplier, motopart.description
+    ) if part)
+
+
+def populate_search_documents(apps, schema_editor):
+    Motopart = apps.get_model('motopart', 'Motopart')
+    batch = []
+    for part in Motopart.objects.only('name', 'supplier', 'description').iterator(chunk_size=BATCH_SIZE):
+        part.search_document = build_search_document(part)
+        batch.append(part)
+        if len(batch) >= BATCH_SIZE:
+            Motopart.objects.bulk_update(batch, ['search_document'])
+            batch = []
+    Motopart.objects.bulk_update(batch, ['search_document'])
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_INDEX_TABLE} "
+            f"USING fts5(document, tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {SEARCH_INDEX_TABLE} (rowid, document) "
+            f"SELECT id, search_document FROM motopart_motopart"
+        )
+    elif vendor == 'mysql':
+        schema_editor.execute(
+            'CREATE FULLTEXT INDEX motopart_search_document_ft '
+            'ON motopart_motopart (search_document)'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_INDEX_TABLE}')
+    elif vendor == 'mysql':
+        schema_editor.execute('DROP INDEX motopart_search_document_ft ON motopart_motopart')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('motopart', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='motopart',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
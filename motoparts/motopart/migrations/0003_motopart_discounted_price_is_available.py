@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:00
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0002_alter_category_options_category_created_at_and_more'),
+        ('motopart', '0002_motopart_search_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='motopart',
+            name='discounted_price',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(discount__gt=0, then=django.db.models.expressions.CombinedExpression(models.F('price'), '-', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('price'), '*', models.F('discount')), '/', models.Value(100)))), default=models.F('price')), output_field=models.FloatField()),
+        ),
+        migrations.AddField(
+            model_name='motopart',
+            name='is_available',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(models.Q(('status', 'active'), ('stock__gt', 0)), then=models.Value(True)), default=models.Value(False)), output_field=models.BooleanField()),
+        ),
+        migrations.AddIndex(
+            model_name='motopart',
+            index=models.Index(fields=['discounted_price'], name='motopart_mo_discoun_30c608_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='motopart',
+            index=models.Index(fields=['is_available', 'discounted_price'], name='motopart_mo_is_avai_b0264a_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0003_category_active_motoparts_count'),
+        ('motopart', '0003_motopart_discounted_price_is_available'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MotopartTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('motopart_id', models.BigIntegerField()),
+                ('slug', models.SlugField()),
+                ('category_id', models.BigIntegerField(null=True)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='motopart',
+            index=models.Index(fields=['updated_at', 'id'], name='motopart_mo_updated_cb2212_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='motoparttombstone',
+            index=models.Index(fields=['deleted_at', 'motopart_id'], name='motopart_mo_deleted_bff1ec_idx'),
+        ),
+    ]
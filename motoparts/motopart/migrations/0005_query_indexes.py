@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0003_category_active_motoparts_count'),
+        ('motopart', '0004_motopart_change_feed'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='motopart',
+            index=models.Index(fields=['category', 'status'], name='motopart_mo_categor_eb4f05_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='motopart',
+            index=models.Index(fields=['-created_at'], name='motopart_mo_created_a79a33_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('motopart', '0005_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoPurchaseWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_order_item_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CoPurchaseCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('motopart', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='motopart.motopart')),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='motopart.motopart')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('motopart', 'other'), name='copurchase_unique_pair')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RelatedMotopart',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.PositiveIntegerField()),
+                ('motopart', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_links', to='motopart.motopart')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='motopart.motopart')),
+            ],
+            options={
+                'ordering': ['motopart', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('motopart', 'rank'), name='related_motopart_unique_rank')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0004_category_tree'),
+        ('motopart', '0006_related_motoparts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MotopartSalesWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_order_item_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MotopartStats',
+            fields=[
+                ('motopart', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='motopart.motopart')),
+                ('views', models.PositiveBigIntegerField(default=0)),
+                ('sales', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='motopart',
+            name='popularity',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='motopart',
+            index=models.Index(fields=['-popularity'], name='motopart_mo_popular_3a2f5a_idx'),
+        ),
+    ]
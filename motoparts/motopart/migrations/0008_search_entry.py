@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('motopart', '0007_popularity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MotopartSearchEntry',
+            fields=[
+                ('motopart', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='motopart.motopart')),
+                ('document', models.TextField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'motopart_search_index',
+                'managed': False,
+            },
+        ),
+    ]
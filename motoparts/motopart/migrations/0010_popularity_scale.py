@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:59
+
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_scale(apps, schema_editor):
+    # The scale scores were written in until now: a fixed epoch and the configured half-life
+    apps.get_model('motopart', 'PopularityScale').objects.get_or_create(pk=1, defaults={
+        'epoch': datetime(2025, 1, 1, tzinfo=timezone.utc),
+        'half_life_days': getattr(settings, 'MOTOPART_POPULARITY_HALF_LIFE_DAYS', 7),
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('motopart', '0009_catalog_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PopularityScale',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('epoch', models.DateTimeField()),
+                ('half_life_days', models.FloatField()),
+            ],
+        ),
+        migrations.RunPython(create_scale, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,9 @@
-from django.db import models
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Value, When
 from category.models import Category
+from .search import SEARCH_INDEX_TABLE, Match, build_search_document
 
 # Create your models here.
 class Motopart(models.Model):
@@ -8,6 +12,8 @@ class Motopart(models.Model):
         ('inactive', 'Inactive'),
         ('out_of_stock', 'Out of Stock'),
     ]
+    # Written only through F()/raw increments, never from a possibly stale instance
+    counter_fields = ('popularity',)
     
     name = models.CharField(max_length=255)
     slug = models.SlugField(unique=True)
@@ -22,21 +28,197 @@ class Motopart(models.Model):
     supplier = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Diacritic-folded name/supplier/description, fed to the full-text index
+    search_document = models.TextField(blank=True, default='', editable=False)
+    # Stored generated columns so sorting/filtering on them runs in SQL against an index
+    discounted_price = models.GeneratedField(
+        expression=Case(
+            When(discount__gt=0, then=F('price') - F('price') * F('discount') / 100),
+            default=F('price'),
+        ),
+        output_field=models.FloatField(),
+        db_persist=True,
+    )
+    is_available = models.GeneratedField(
+        expression=Case(
+            When(Q(status='active') & Q(stock__gt=0), then=Value(True)),
+            default=Value(False),
+        ),
+        output_field=models.BooleanField(),
+        db_persist=True,
+    )
+    # Decayed views + sales, maintained by motopart.popularity; larger is more popular
+    popularity = models.FloatField(default=0, editable=False)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['discounted_price']),
+            models.Index(fields=['is_available', 'discounted_price']),
+            # Change feed range scans on (updated_at, id)
+            models.Index(fields=['updated_at', 'id']),
+            models.Index(fields=['category', 'status']),
+            models.Index(fields=['-created_at']),
+            models.Index(fields=['-popularity']),
+        ]
         
     def __str__(self):
         return self.name
     
-    @property
-    def discounted_price(self):
-        """Calculate the price after discount"""
-        if self.discount > 0:
-            return self.price - (self.price * self.discount / 100)
-        return self.price
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'category_id' in field_names:
+            instance._loaded_category_id = instance.category_id
+        # Remember which category counter this row currently contributes to
+        if 'status' in field_names and 'category_id' in field_names:
+            instance._counted_category_id = instance.counted_category_id
+        return instance
     
     @property
-    def is_available(self):
-        """Check if motopart is available for purchase"""
-        return self.status == 'active' and self.stock > 0
+    def counted_category_id(self):
+        """Category whose active counter includes this part, or None"""
+        return self.category_id if self.status == 'active' else None
+    
+    def save(self, *args, **kwargs):
+        """Refresh the search document before saving"""
+        self.search_document = build_search_document(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'search_document' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['search_document']
+        adding = self._state.adding
+        if not adding and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and not field.generated
+                and field.attname not in deferred and field.name not in self.counter_fields
+            ]
+        # Counter updates happen in post_save, inside the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        if not adding:
+            # Generated columns are only returned on INSERT; defer them so the
+            # next access reloads the values the database computed
+            for field_name in ('discounted_price', 'is_available'):
+                self.__dict__.pop(field_name, None)
+
+
+
+class MotopartSearchEntry(models.Model):
+    """
+    Read-only view of the SQLite FTS5 index (motopart.search), so searches can
+    join it on rowid through the ORM. The table is created by migration 0002
+    and written only by SQLiteFTSSearchBackend; `rank` is FTS5's hidden bm25
+    column and is only meaningful under a `document__match` filter.
+    """
+    motopart = models.OneToOneField(
+        Motopart, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+        db_constraint=False, related_name='search_entry',
+    )
+    document = models.TextField()
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = SEARCH_INDEX_TABLE
+
+
+MotopartSearchEntry._meta.get_field('document').register_lookup(Match)
+
+
+class CatalogVersion(models.Model):
+    """
+    Single row: the catalog version, bumped in the transaction of every
+    catalog write (motopart.cache). It lives in the database so every worker
+    sees every other worker's writes, which a local-memory cache can not do.
+    """
+    version = models.PositiveBigIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class MotopartTombstone(models.Model):
+    """A deleted motopart, kept so the change feed can report the deletion"""
+    motopart_id = models.BigIntegerField()
+    slug = models.SlugField()
+    category_id = models.BigIntegerField(null=True)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'motopart_id']),
+        ]
+
+    def __str__(self):
+        return f'{self.slug} (deleted)'
+
+
+class CoPurchaseCount(models.Model):
+    """
+    Number of orders containing both parts: one cell of the sparse
+    co-occurrence matrix, stored in both directions. Built by
+    `manage.py build_related_motoparts`.
+    """
+    motopart = models.ForeignKey(Motopart, on_delete=models.CASCADE, related_name='+')
+    other = models.ForeignKey(Motopart, on_delete=models.CASCADE, related_name='+')
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['motopart', 'other'], name='copurchase_unique_pair'),
+        ]
+
+    def __str__(self):
+        return f'{self.motopart_id} + {self.other_id}: {self.orders}'
+
+
+class RelatedMotopart(models.Model):
+    """Top-K co-purchased parts of a part, ranked; all the related endpoint reads"""
+    motopart = models.ForeignKey(Motopart, on_delete=models.CASCADE, related_name='related_links')
+    related = models.ForeignKey(Motopart, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['motopart', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['motopart', 'rank'], name='related_motopart_unique_rank'),
+        ]
+
+    def __str__(self):
+        return f'{self.motopart_id} #{self.rank}: {self.related_id}'
+
+
+class CoPurchaseWatermark(models.Model):
+    """Single row: the last OrderItem id folded into CoPurchaseCount"""
+    last_order_item_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class MotopartStats(models.Model):
+    """Lifetime view and sales counters of a part, written in batches by motopart.popularity"""
+    motopart = models.OneToOneField(Motopart, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    views = models.PositiveBigIntegerField(default=0)
+    sales = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.motopart_id}: {self.views} views, {self.sales} sold'
+
+
+class PopularityScale(models.Model):
+    """
+    Single row: the epoch and half-life that Motopart.popularity is expressed
+    in. An event at time t adds 2 ** ((t - epoch) / half_life); see
+    motopart.popularity.
+    """
+    epoch = models.DateTimeField()
+    half_life_days = models.FloatField()
+
+    def weight(self, at):
+        return 2 ** ((at - self.epoch) / timedelta(days=self.half_life_days))
+
+
+class MotopartSalesWatermark(models.Model):
+    """Single row: the last OrderItem id counted into MotopartStats.sales"""
+    last_order_item_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
@@ -0,0 +1,84 @@
+import copy
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+class MotopartObjectCache:
+    """
+    Read-through cache of single Motopart rows, by pk and by slug.
+
+    Entries live in the cache alias named by MOTOPART_OBJECT_CACHE (the
+    local-memory `default` cache unless configured otherwise), so pointing
+    the alias at a shared backend shares them across workers. Only the
+    part's own columns are cached; related objects such as the category are
+    loaded separately so category edits never leave stale copies behind.
+    The slug key only stores the pk, so a renamed slug can not resolve to
+    the wrong part. Model signals and after_bulk_write drop entries, and
+    rows read inside a transaction are only cached once it commits.
+    """
+    timeout = 300
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'MOTOPART_OBJECT_CACHE', 'default')]
+
+    @staticmethod
+    def pk_key(pk):
+        return f'motopart:object:{pk}'
+
+    @staticmethod
+    def slug_key(slug):
+        return f'motopart:object:slug:{slug}'
+
+    def queryset(self, select_related=False):
+        from .models import Motopart
+        queryset = Motopart.objects.defer('search_document')
+        return queryset.select_related('category') if select_related else queryset
+
+    def store(self, motopart):
+        """
+        Cache the row once the transaction that read it commits (at once in
+        autocommit): a row read inside a transaction that rolls back may
+        never have existed.
+        """
+        stored = copy.copy(motopart)
+        stored._state.fields_cache = {}
+        entries = {self.pk_key(stored.pk): stored, self.slug_key(stored.slug): stored.pk}
+        transaction.on_commit(lambda: self.cache.set_many(entries, self.timeout))
+
+    def get(self, pk, select_related=False):
+        """The part with this pk, or None; select_related joins the category on a miss"""
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            return None
+        motopart = self.cache.get(self.pk_key(pk))
+        if motopart is None:
+            motopart = self.queryset(select_related).filter(pk=pk).first()
+            if motopart is not None:
+                self.store(motopart)
+        return motopart
+
+    def get_by_slug(self, slug, select_related=False):
+        pk = self.cache.get(self.slug_key(slug))
+        if pk is not None:
+            motopart = self.get(pk, select_related)
+            if motopart is not None and motopart.slug == slug:
+                return motopart
+        motopart = self.queryset(select_related).filter(slug=slug).first()
+        if motopart is not None:
+            self.store(motopart)
+        return motopart
+
+    def invalidate(self, pks):
+        """Drop cached rows now and again on commit, so a read racing the write can not re-cache it"""
+        keys = [self.pk_key(pk) for pk in pks]
+        if not keys:
+            return
+        self.cache.delete_many(keys)
+        transaction.on_commit(lambda: self.cache.delete_many(keys))
+
+
+motopart_cache = MotopartObjectCache()
@@ -1,5 +1,13 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class MotopartPagination(PageNumberPagination):
@@ -19,4 +27,153 @@ class MotopartPagination(PageNumberPagination):
                 'page_size': self.get_page_size(self.request)
             },
             'results': data
-        })
\ No newline at end of file
+        })
+
+
+class MotopartCursorPagination(BasePagination):
+    """
+    Keyset pagination for infinite-scroll clients.
+
+    Pages are selected with `WHERE (key, id) > (last_key, last_id)` on the
+    active ordering instead of COUNT(*) + OFFSET, so deep pages cost the same
+    as the first one. Enabled with `?pagination=cursor` or any `?cursor=`.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    count_query_param = 'count'
+    ordering_param = 'ordering'
+    # Orderings that have a (field, id) keyset; anything else falls back to the default
+    keyset_fields = ['created_at', 'price', 'name']
+    default_ordering = '-created_at'
+    invalid_cursor_message = 'Invalid cursor'
+
+    @classmethod
+    def is_requested(cls, request):
+        return (
+            request.query_params.get(cls.mode_query_param) == 'cursor'
+            or cls.cursor_query_param in request.query_params
+        )
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+            if size > 0:
+                return min(size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def get_ordering(self, request):
+        requested = request.query_params.get(self.ordering_param, '')
+        first = requested.split(',')[0].strip()
+        if first.lstrip('-') in self.keyset_fields:
+            return first
+        return self.default_ordering
+
+    def encode_cursor(self, ordering, item, reverse):
+        field = ordering.lstrip('-')
+        value = getattr(item, field)
+        if field == 'created_at':
+            value = value.isoformat()
+        payload = json.dumps({'o': ordering, 'v': value, 'id': item.pk, 'r': reverse})
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, cursor
+        )
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            ordering = data['o']
+            if not isinstance(ordering, str) or ordering.lstrip('-') not in self.keyset_fields:
+                raise ValueError
+            value = self.parse_cursor_value(ordering.lstrip('-'), data['v'])
+            return ordering, value, int(data['id']), bool(data['r'])
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def parse_cursor_value(self, field, value):
+        """The key value of a cursor as the field's type; ValueError for anything else"""
+        if field == 'created_at':
+            value = parse_datetime(value) if isinstance(value, str) else None
+        elif field == 'price':
+            value = float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+        elif not isinstance(value, str):
+            value = None
+        if value is None:
+            raise ValueError
+        return value
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        self.include_count = request.query_params.get(self.count_query_param) == 'true'
+        self.count = queryset.count() if self.include_count else None
+
+        ordering = self.get_ordering(request)
+        cursor = self.decode_cursor(request)
+        reverse = False
+        if cursor is not None:
+            ordering, value, last_id, reverse = cursor
+
+        field = ordering.lstrip('-')
+        descending = ordering.startswith('-')
+        # Walking backwards flips both the comparison and the ordering
+        if descending != reverse:
+            order_by = ['-' + field, '-id']
+            lookup = 'lt'
+        else:
+            order_by = [field, 'id']
+            lookup = 'gt'
+
+        queryset = queryset.order_by(*order_by)
+        loaded, deferring = queryset.query.deferred_loading
+        if loaded and not deferring:
+            # Sparse fieldsets: the cursor still needs the key column
+            queryset = queryset.only(*loaded, field)
+        if cursor is not None:
+            queryset = queryset.filter(
+                Q(**{f'{field}__{lookup}': value})
+                | Q(**{field: value, f'id__{lookup}': last_id})
+            )
+
+        results = list(queryset[:self.page_size_value + 1])
+        has_more = len(results) > self.page_size_value
+        results = results[:self.page_size_value]
+        if reverse:
+            results.reverse()
+
+        self.ordering = ordering
+        self.has_next = has_more if not reverse else cursor is not None
+        self.has_previous = cursor is not None if not reverse else has_more
+        self.page = results
+        return results
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.ordering, self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.ordering, self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'pagination': {
+                'count': self.count,
+                'next': self.get_next_link(),
+                'previous': self.get_previous_link(),
+                'current_page': None,
+                'total_pages': None,
+                'page_size': self.page_size_value
+            },
+            'results': data
+        })
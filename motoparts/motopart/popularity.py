@@ -0,0 +1,171 @@
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+from django.db.models import F, Min
+from django.utils import timezone
+from .models import Motopart, MotopartSalesWatermark, MotopartStats, PopularityScale
+
+# Forward decay: an event adds 2 ** (age of the epoch in half-lives) instead
+# of every score being multiplied down over time. Newer events outweigh older
+# ones by exactly the decay factor, so the order is that of decayed scores
+# while only rows with new events are ever written. The weights grow without
+# bound, so lock_popularity_scale() moves the epoch forward every
+# REBASE_HALF_LIVES half-lives and rescales the stored scores, which keeps
+# them below 2 ** REBASE_HALF_LIVES.
+REBASE_HALF_LIVES = 32
+
+
+def popularity_half_life_days():
+    return getattr(settings, 'MOTOPART_POPULARITY_HALF_LIFE_DAYS', 7)
+
+
+def lock_popularity_scale(now=None):
+    """
+    Lock and return the PopularityScale row, rebasing it first when it is
+    due or the configured half-life changed. Call inside a transaction and
+    weigh the events written in that transaction with the returned scale;
+    the lock keeps a concurrent rebase from landing between the two.
+    """
+    now = now or timezone.now()
+    half_life = popularity_half_life_days()
+    scale, _ = PopularityScale.objects.select_for_update().get_or_create(
+        pk=1, defaults={'epoch': now, 'half_life_days': half_life}
+    )
+    age = (now - scale.epoch) / timedelta(days=scale.half_life_days)
+    if age >= REBASE_HALF_LIVES or scale.half_life_days != half_life:
+        rebase_popularity(scale, now, half_life)
+    return scale
+
+
+def rebase_popularity(scale, epoch, half_life_days):
+    """
+    Express every score relative to `epoch`: multiplying all of them by one
+    factor keeps their order. A new half-life applies from `epoch` on; the
+    decay up to it stays at the old rate.
+    """
+    # 2 ** -age underflows to 0 after a long pause instead of overflowing
+    factor = 2 ** -((epoch - scale.epoch) / timedelta(days=scale.half_life_days))
+    Motopart.objects.filter(popularity__gt=0).update(popularity=F('popularity') * factor)
+    scale.epoch, scale.half_life_days = epoch, half_life_days
+    scale.save()
+
+
+def add_popularity(counter_field, counts, scores):
+    """
+    Add counts[pk] to MotopartStats.<counter_field> and scores[pk] to
+    Motopart.popularity: one executemany upsert and one executemany UPDATE.
+    Parts deleted since the events were counted are dropped. Scores must be
+    weighted with lock_popularity_scale() in the caller's transaction.
+    """
+    existing = set(Motopart.objects.filter(pk__in=list(counts)).values_list('pk', flat=True))
+    if not existing:
+        return 0
+    db = connections[DEFAULT_DB_ALIAS]
+    quote = db.ops.quote_name
+    stats = quote(MotopartStats._meta.db_table)
+    pk, column = quote('motopart_id'), quote(counter_field)
+    other = quote('sales' if counter_field == 'views' else 'views')
+    if db.vendor == 'mysql':
+        upsert = f'ON DUPLICATE KEY UPDATE {column} = {column} + VALUES({column})'
+    else:
+        upsert = f'ON CONFLICT ({pk}) DO UPDATE SET {column} = {stats}.{column} + EXCLUDED.{column}'
+    popularity = quote('popularity')
+    with transaction.atomic(), db.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {stats} ({pk}, {column}, {other}) VALUES (%s, %s, 0) {upsert}',
+            [(motopart_id, counts[motopart_id]) for motopart_id in existing],
+        )
+        cursor.executemany(
+            f'UPDATE {quote(Motopart._meta.db_table)} SET {popularity} = {popularity} + %s '
+            f'WHERE {quote(Motopart._meta.pk.column)} = %s',
+            [(scores[motopart_id], motopart_id) for motopart_id in existing],
+        )
+    return len(existing)
+
+
+class ViewCounter:
+    """
+    Detail-page views counted in process memory.
+
+    The request that finds the buffer older than MOTOPART_VIEW_FLUSH_SECONDS
+    writes it out with add_popularity, so a bestseller costs one batched
+    increment per interval instead of a row lock per view. Views still
+    buffered when a worker exits are lost, which a popularity ranking can
+    afford. A failed write keeps the counts for the next flush and never
+    fails the request that triggered it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._last_flush = time.monotonic()
+
+    @property
+    def interval(self):
+        return getattr(settings, 'MOTOPART_VIEW_FLUSH_SECONDS', 30)
+
+    def record(self, motopart_id):
+        with self._lock:
+            self._pending[motopart_id] += 1
+            if time.monotonic() - self._last_flush < self.interval:
+                return
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+        try:
+            with transaction.atomic():
+                weight = lock_popularity_scale().weight(timezone.now())
+                return add_popularity('views', pending, {pk: count * weight for pk, count in pending.items()})
+        except (DatabaseError, ArithmeticError):
+            with self._lock:
+                self._pending.update(pending)
+            return 0
+
+
+view_counter = ViewCounter()
+
+
+class SalesCounter:
+    """
+    Folds order items placed since the last run into MotopartStats.sales
+    and the popularity score, each unit weighted by when it was ordered.
+    Items younger than `settle` wait for the next run, as in
+    motopart.related.CoPurchaseBuilder. Every run also rebases the
+    popularity scale when it is due, even when no new items were sold.
+    """
+    settle = timedelta(minutes=1)
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+
+    def refresh(self):
+        from orderitem.models import OrderItem
+        sale_weight = getattr(settings, 'MOTOPART_POPULARITY_SALE_WEIGHT', 20)
+        with transaction.atomic():
+            scale = lock_popularity_scale()
+            watermark, _ = MotopartSalesWatermark.objects.select_for_update().get_or_create(pk=1)
+            items = OrderItem.objects.filter(id__gt=watermark.last_order_item_id)
+            unsettled = items.filter(created_at__gt=timezone.now() - self.settle).aggregate(first=Min('id'))['first']
+            if unsettled is not None:
+                items = items.filter(id__lt=unsettled)
+            units, scores = Counter(), defaultdict(float)
+            max_id = watermark.last_order_item_id
+            for pk, motopart_id, quantity, created_at in items.order_by('id').values_list(
+                'id', 'motopart_id', 'quantity', 'created_at'
+            ).iterator(chunk_size=self.batch_size):
+                units[motopart_id] += quantity
+                scores[motopart_id] += quantity * sale_weight * scale.weight(created_at)
+                max_id = pk
+            parts = add_popularity('sales', units, scores) if units else 0
+            watermark.last_order_item_id = max_id
+            watermark.save()
+        return {'units': sum(units.values()), 'parts': parts, 'last_order_item_id': max_id}
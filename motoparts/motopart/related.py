@@ -0,0 +1,147 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+from itertools import permutations, product
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F, Min, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from .models import CoPurchaseCount, CoPurchaseWatermark, RelatedMotopart
+
+
+def related_top_k():
+    return getattr(settings, 'RELATED_MOTOPARTS_TOP_K', 10)
+
+
+def _quoted(model, *fields):
+    """Quoted table name followed by the quoted columns of fields"""
+    quote = connections[DEFAULT_DB_ALIAS].ops.quote_name
+    return [quote(model._meta.db_table)] + [quote(model._meta.get_field(name).column) for name in fields]
+
+
+def _executemany(sql, rows):
+    """Integer-only rows go straight to the cursor; model instances would cost more than the write"""
+    if rows:
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.executemany(sql, rows)
+
+
+def _chunks(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class CoPurchaseBuilder:
+    """
+    Folds new order items into CoPurchaseCount and re-ranks RelatedMotopart
+    for every part whose counts changed.
+
+    A run reads the OrderItems past the watermark, grouped by order, and
+    tallies the pairs among an order's new parts and between its new and
+    already counted parts; orders without new items are never read again.
+    Items younger than `settle` wait for the next run, so a transaction
+    committing late can not land below a watermark that already moved.
+    """
+    settle = timedelta(minutes=1)
+
+    def __init__(self, top_k=None, batch_size=1000):
+        self.top_k = top_k or related_top_k()
+        self.batch_size = batch_size
+
+    def new_items_by_order(self, last_id):
+        """({order_id: {motopart_id}}, highest item id read) past last_id"""
+        from orderitem.models import OrderItem
+        items = OrderItem.objects.filter(id__gt=last_id)
+        unsettled = items.filter(created_at__gt=timezone.now() - self.settle).aggregate(first=Min('id'))['first']
+        if unsettled is not None:
+            items = items.filter(id__lt=unsettled)
+        by_order, max_id = defaultdict(set), last_id
+        for pk, order_id, motopart_id in items.order_by('id').values_list('id', 'order_id', 'motopart_id').iterator(chunk_size=self.batch_size):
+            by_order[order_id].add(motopart_id)
+            max_id = pk
+        return by_order, max_id
+
+    def count_pairs(self, new_by_order, last_id):
+        """Counter of (motopart_id, other_id) -> orders added by the new items"""
+        from orderitem.models import OrderItem
+        counts = Counter()
+        for orders in _chunks(new_by_order, self.batch_size):
+            old_by_order = defaultdict(set)
+            if last_id:
+                for order_id, motopart_id in OrderItem.objects.filter(
+                    order_id__in=orders, id__lte=last_id
+                ).values_list('order_id', 'motopart_id'):
+                    old_by_order[order_id].add(motopart_id)
+            for order_id in orders:
+                old = old_by_order.get(order_id, set())
+                new = new_by_order[order_id] - old
+                # Counter.update tallies each pair generator in C
+                counts.update(permutations(new, 2))
+                counts.update(product(new, old))
+                counts.update(product(old, new))
+        return counts
+
+    def apply_counts(self, counts):
+        by_part = defaultdict(dict)
+        for (motopart_id, other_id), count in counts.items():
+            by_part[motopart_id][other_id] = count
+        table, id_column, motopart, other, orders = _quoted(CoPurchaseCount, 'id', 'motopart', 'other', 'orders')
+        for parts in _chunks(by_part, self.batch_size):
+            others = {other_id for motopart_id in parts for other_id in by_part[motopart_id]}
+            changed = []
+            for pk, motopart_id, other_id in CoPurchaseCount.objects.filter(
+                motopart_id__in=parts, other_id__in=others
+            ).values_list('pk', 'motopart_id', 'other_id'):
+                delta = by_part[motopart_id].pop(other_id, None)
+                if delta:
+                    changed.append((delta, pk))
+            _executemany(f'UPDATE {table} SET {orders} = {orders} + %s WHERE {id_column} = %s', changed)
+            _executemany(f'INSERT INTO {table} ({motopart}, {other}, {orders}) VALUES (%s, %s, %s)', [
+                (motopart_id, other_id, count)
+                for motopart_id in parts
+                for other_id, count in by_part[motopart_id].items()
+            ])
+        return set(by_part)
+
+    def rank(self, motopart_ids):
+        """Replace the top-K rows of motopart_ids from their current counts, one INSERT ... SELECT per chunk"""
+        table, *columns = _quoted(RelatedMotopart, 'motopart', 'related', 'score', 'rank')
+        for parts in _chunks(sorted(motopart_ids), self.batch_size):
+            ranked = CoPurchaseCount.objects.filter(motopart_id__in=parts).annotate(
+                position=Window(
+                    RowNumber(),
+                    partition_by=[F('motopart_id')],
+                    order_by=[F('orders').desc(), F('other_id').asc()],
+                )
+            ).filter(position__lte=self.top_k).values_list('motopart_id', 'other_id', 'orders', 'position')
+            sql, params = ranked.query.sql_with_params()
+            RelatedMotopart.objects.filter(motopart_id__in=parts).delete()
+            with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {table} ({", ".join(columns)}) {sql}',
+                    params,
+                )
+
+    def refresh(self, rebuild=False):
+        """Fold in orders since the last run (or everything with rebuild); returns a summary"""
+        with transaction.atomic():
+            watermark, _ = CoPurchaseWatermark.objects.select_for_update().get_or_create(pk=1)
+            last_id = watermark.last_order_item_id
+            if rebuild:
+                CoPurchaseCount.objects.all().delete()
+                RelatedMotopart.objects.all().delete()
+                last_id = 0
+            new_by_order, max_id = self.new_items_by_order(last_id)
+            counts = self.count_pairs(new_by_order, last_id)
+            touched = self.apply_counts(counts)
+            self.rank(touched)
+            watermark.last_order_item_id = max_id
+            watermark.save()
+        return {
+            'orders': len(new_by_order),
+            'pairs': len(counts),
+            'parts': len(touched),
+            'last_order_item_id': max_id,
+        }
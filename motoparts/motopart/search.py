@@ -0,0 +1,183 @@
+import re
+import unicodedata
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Lookup
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+
+SEARCH_INDEX_TABLE = 'motopart_search_index'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fold_text(value):
+    """Lowercase and strip Vietnamese diacritics so "Nhớt" and "nhot" compare equal"""
+    if not value:
+        return ''
+    value = value.lower().replace('đ', 'd')
+    decomposed = unicodedata.normalize('NFD', value)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(value):
+    """Split folded text into search tokens"""
+    return _TOKEN_RE.findall(fold_text(value))
+
+
+def build_search_document(motopart):
+    """Build the folded text that is indexed for a motopart"""
+    return ' '.join(fold_text(part) for part in (
+        motopart.name, motopart.supplier, motopart.description
+    ) if part)
+
+
+class Match(Lookup):
+    """`document__match=<fts5 query>` on MotopartSearchEntry: a full-text MATCH on the index column"""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class BaseSearchBackend(ABC):
+    """Interface for catalog search backends"""
+
+    @abstractmethod
+    def search(self, queryset, query):
+        """Filter queryset to rows matching query and annotate `search_rank` (higher is better)"""
+
+    def index(self, motopart):
+        """Add or refresh one motopart in the index"""
+
+    def index_many(self, pks):
+        """Refresh many motoparts after a bulk write that skipped signals"""
+
+    def remove(self, pk):
+        """Drop one motopart from the index"""
+
+    def remove_many(self, pks):
+        """Drop many motoparts after a bulk delete that skipped signals"""
+        for pk in pks:
+            self.remove(pk)
+
+    def rebuild(self):
+        """Rebuild the whole index from the motopart table"""
+
+
+class LikeSearchBackend(BaseSearchBackend):
+    """Fallback for databases without a full-text index: LIKE over the folded document"""
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset
+        for token in tokens:
+            queryset = queryset.filter(search_document__icontains=token)
+        return queryset.annotate(search_rank=RawSQL('0', []))
+
+
+class SQLiteFTSSearchBackend(BaseSearchBackend):
+    """FTS5 inverted index kept in a side table keyed by motopart id"""
+
+    def _match_expression(self, query):
+        return ' '.join(f'"{token}"*' for token in tokenize(query))
+
+    def search(self, queryset, query):
+        match = self._match_expression(query)
+        if not match:
+            return queryset
+        # Join the index once through MotopartSearchEntry: a correlated rank
+        # subquery re-runs the MATCH for every row, which is quadratic on broad terms.
+        return queryset.filter(search_entry__document__match=match).annotate(
+            # FTS5 rank is bm25(), where lower means more relevant
+            search_rank=-F('search_entry__rank')
+        )
+
+    def index(self, motopart):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_INDEX_TABLE} WHERE rowid = %s', [motopart.pk])
+            cursor.execute(
+                f'INSERT INTO {SEARCH_INDEX_TABLE} (rowid, document) VALUES (%s, %s)',
+                [motopart.pk, motopart.search_document],
+            )
+
+    def index_many(self, pks):
+        from .models import Motopart
+        table = Motopart._meta.db_table
+        pks = list(pks)
+        for start in range(0, len(pks), 500):
+            chunk = pks[start:start + 500]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {SEARCH_INDEX_TABLE} WHERE rowid IN ({placeholders})', chunk)
+                cursor.execute(
+                    f'INSERT INTO {SEARCH_INDEX_TABLE} (rowid, document) '
+                    f'SELECT id, search_document FROM {table} WHERE id IN ({placeholders})',
+                    chunk,
+                )
+
+    def remove(self, pk):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_INDEX_TABLE} WHERE rowid = %s', [pk])
+
+    def remove_many(self, pks):
+        pks = list(pks)
+        for start in range(0, len(pks), 500):
+            chunk = pks[start:start + 500]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {SEARCH_INDEX_TABLE} WHERE rowid IN ({placeholders})', chunk)
+
+    def rebuild(self):
+        from .models import Motopart
+        table = Motopart._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_INDEX_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {SEARCH_INDEX_TABLE} (rowid, document) '
+                f'SELECT id, search_document FROM {table}'
+            )
+
+
+class MySQLFullTextSearchBackend(BaseSearchBackend):
+    """FULLTEXT index on motopart.search_document, maintained by MySQL itself"""
+
+    def _match_expression(self, query):
+        return ' '.join(f'+{token}*' for token in tokenize(query))
+
+    def search(self, queryset, query):
+        match = self._match_expression(query)
+        if not match:
+            return queryset
+        return queryset.annotate(
+            search_rank=RawSQL(
+                'MATCH (search_document) AGAINST (%s IN BOOLEAN MODE)', [match]
+            )
+        ).filter(search_rank__gt=0)
+
+
+_VENDOR_BACKENDS = {
+    'sqlite': SQLiteFTSSearchBackend,
+    'mysql': MySQLFullTextSearchBackend,
+}
+
+_backend = None
+
+
+def get_search_backend():
+    """Return the configured backend, or the one matching the database vendor"""
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'MOTOPART_SEARCH_BACKEND', None)
+        if path:
+            backend_class = import_string(path)
+        else:
+            backend_class = _VENDOR_BACKENDS.get(connection.vendor, LikeSearchBackend)
+        _backend = backend_class()
+    return _backend
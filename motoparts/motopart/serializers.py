@@ -1,10 +1,12 @@
 from rest_framework import serializers
 from .models import Motopart
 from category.serializers import CategorySerializer
+from motoparts.serializers import DynamicFieldsMixin
 
-class MotopartSerializer(serializers.ModelSerializer):
+class MotopartSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    # Catalog responses carry category_id; the nested object needs ?expand=category
     category = CategorySerializer(read_only=True)
-    category_id = serializers.IntegerField(write_only=True)
+    category_id = serializers.IntegerField()
     discounted_price = serializers.ReadOnlyField()
     is_available = serializers.ReadOnlyField()
     
@@ -16,4 +18,30 @@ class MotopartSerializer(serializers.ModelSerializer):
             'category_id', 'manufacture_year', 'supplier','created_at', 
             'updated_at', 'discounted_price', 'is_available'
         ]
-        read_only_fields = ['created_at', 'updated_at']
\ No newline at end of file
+        read_only_fields = ['created_at', 'updated_at']
+    expandable_fields = ['category']
+
+
+class MotopartBulkRowSerializer(serializers.Serializer):
+    """One row of a bulk upsert, keyed by slug; other fields are optional on update"""
+    slug = serializers.SlugField()
+    name = serializers.CharField(max_length=255, required=False)
+    price = serializers.FloatField(min_value=0, required=False)
+    discount = serializers.FloatField(min_value=0, max_value=100, required=False)
+    stock = serializers.IntegerField(min_value=0, required=False)
+    status = serializers.ChoiceField(choices=Motopart.STATUS_CHOICES, required=False)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    image_url = serializers.URLField(required=False, allow_blank=True, allow_null=True)
+    category_id = serializers.IntegerField(required=False)
+    manufacture_year = serializers.IntegerField(required=False)
+    supplier = serializers.CharField(max_length=255, required=False)
+
+
+class MotopartBulkUpdateRowSerializer(serializers.Serializer):
+    """One row of an admin bulk update: id or slug plus the fields to change"""
+    id = serializers.IntegerField(required=False)
+    slug = serializers.SlugField(required=False)
+    price = serializers.FloatField(min_value=0, required=False)
+    discount = serializers.FloatField(min_value=0, max_value=100, required=False)
+    stock = serializers.IntegerField(min_value=0, required=False)
+    status = serializers.ChoiceField(choices=Motopart.STATUS_CHOICES, required=False)
@@ -0,0 +1,159 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.db import transaction
+from django.dispatch import receiver
+from category.models import Category, CategoryClosure
+from .models import Motopart, MotopartTombstone
+from .cache import bump_catalog_version
+from .search import get_search_backend
+from .snapshots import schedule_snapshot_refresh
+from .fuzzy import fuzzy_index
+from .suggest import suggest_index
+from .object_cache import motopart_cache
+from .bulk import after_bulk_write
+from motoparts.deletion import pre_chunk_delete
+
+
+@receiver(pre_save, sender=Motopart)
+def remember_counted_category(sender, instance, **kwargs):
+    """Load the stored status/category when the instance did not come with them"""
+    if hasattr(instance, '_counted_category_id'):
+        return
+    if instance._state.adding:
+        instance._counted_category_id = None
+        return
+    stored = Motopart.objects.filter(pk=instance.pk).values_list('category_id', 'status').first()
+    if stored is None:
+        instance._counted_category_id = None
+    else:
+        category_id, status = stored
+        instance._counted_category_id = category_id if status == 'active' else None
+
+
+@receiver(post_save, sender=Motopart)
+def update_category_counts(sender, instance, **kwargs):
+    """Move the part between category counters when its status or category changes"""
+    old_category_id = instance._counted_category_id
+    new_category_id = instance.counted_category_id
+    if old_category_id != new_category_id:
+        Category.adjust_active_count(old_category_id, -1)
+        Category.adjust_active_count(new_category_id, 1)
+    instance._counted_category_id = new_category_id
+
+
+@receiver(post_save, sender=Motopart)
+def index_motopart(sender, instance, **kwargs):
+    """Keep the search index in sync with the saved row"""
+    get_search_backend().index(instance)
+
+
+@receiver(post_delete, sender=Motopart)
+def release_category_count(sender, instance, **kwargs):
+    """Deleted parts no longer count towards their category"""
+    Category.adjust_active_count(
+        getattr(instance, '_counted_category_id', instance.counted_category_id), -1
+    )
+
+
+@receiver(post_delete, sender=Motopart)
+def unindex_motopart(sender, instance, **kwargs):
+    """Drop deleted rows from the search index"""
+    get_search_backend().remove(instance.pk)
+
+
+@receiver(post_save, sender=Motopart)
+@receiver(post_delete, sender=Motopart)
+def invalidate_object_cache(sender, instance, **kwargs):
+    motopart_cache.invalidate([instance.pk])
+
+
+@receiver(post_delete, sender=Motopart)
+def record_tombstone(sender, instance, **kwargs):
+    """Let change feed clients know the part is gone"""
+    MotopartTombstone.objects.create(
+        motopart_id=instance.pk, slug=instance.slug, category_id=instance.category_id
+    )
+
+
+@receiver(pre_delete, sender=Category)
+def remember_category_ancestors(sender, instance, **kwargs):
+    """Closure rows go in the same cascade, so look the ancestors up first"""
+    instance._ancestor_ids = list(CategoryClosure.ancestor_ids(instance.parent_id))
+
+
+@receiver(post_delete, sender=Category)
+def release_subtree_counts(sender, instance, **kwargs):
+    """Ancestors of a deleted subtree no longer count its parts"""
+    Category.rebuild_subtree_counts(getattr(instance, '_ancestor_ids', []))
+
+
+@receiver(post_save, sender=Motopart)
+@receiver(post_delete, sender=Motopart)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog_cache(sender, **kwargs):
+    """Any catalog write makes cached facets and listings stale"""
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Motopart)
+@receiver(post_delete, sender=Motopart)
+def refresh_motopart_snapshots(sender, instance, **kwargs):
+    """Re-render the listings of the part's current and previous category"""
+    previous = getattr(instance, '_loaded_category_id', None)
+    schedule_snapshot_refresh({instance.category_id, previous})
+    instance._loaded_category_id = instance.category_id
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def refresh_category_snapshots(sender, instance, **kwargs):
+    schedule_snapshot_refresh({instance.pk})
+
+
+@receiver(post_save, sender=Motopart)
+def update_memory_indexes(sender, instance, **kwargs):
+    # Patch the in-process indexes only once the save commits; a rolled back
+    # save must not leave a phantom entry behind
+    def update():
+        suggest_index.update(instance)
+        fuzzy_index.update(instance)
+    transaction.on_commit(update)
+
+
+@receiver(post_delete, sender=Motopart)
+def remove_from_memory_indexes(sender, instance, **kwargs):
+    pk = instance.pk
+
+    def remove():
+        suggest_index.remove(pk)
+        fuzzy_index.remove(pk)
+    transaction.on_commit(remove)
+
+
+@receiver(pre_chunk_delete, sender=Motopart)
+def release_deleted_motoparts(sender, pks, **kwargs):
+    """Chunked deletes skip the signals above: tombstone and unindex the batch, refresh the rest after commit"""
+    rows = list(Motopart.objects.filter(pk__in=pks).values_list('pk', 'slug', 'category_id'))
+    MotopartTombstone.objects.bulk_create([
+        MotopartTombstone(motopart_id=pk, slug=slug, category_id=category_id)
+        for pk, slug, category_id in rows
+    ])
+    get_search_backend().remove_many(pks)
+
+    def refresh():
+        after_bulk_write(pks, {category_id for _, _, category_id in rows}, reindex=False)
+        for pk in pks:
+            suggest_index.remove(pk)
+            fuzzy_index.remove(pk)
+    transaction.on_commit(refresh)
+
+
+@receiver(pre_chunk_delete, sender=Category)
+def release_deleted_categories(sender, pks, **kwargs):
+    """Closure rows of the batch are already gone, so recount every subtree once it commits"""
+    def refresh():
+        Category.rebuild_subtree_counts()
+        bump_catalog_version()
+        schedule_snapshot_refresh(pks)
+    transaction.on_commit(refresh)
+
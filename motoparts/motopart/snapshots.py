@@ -0,0 +1,248 @@
+"""
+Precompressed JSON snapshots of the public catalog listings, written under
+CATALOG_SNAPSHOT_ROOT for a web server to serve without Django (see
+CatalogSnapshotWriter and the build_catalog_snapshots command).
+"""
+import gzip
+import io
+import logging
+import os
+import re
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+_PAGE_RE = re.compile(r'^page-(\d+)\.json(\.gz)?$')
+_CATEGORY_DIR_RE = re.compile(r'^category-(\d+)$')
+
+_pending = threading.local()
+
+
+def snapshots_enabled():
+    """Incremental refresh on catalog writes is opt-in"""
+    return getattr(settings, 'CATALOG_SNAPSHOT_AUTO', False)
+
+
+def write_atomic(path, content):
+    """Replace path with content via a temporary file and rename; False when unchanged"""
+    try:
+        if path.read_bytes() == content:
+            return False
+    except OSError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(content)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return True
+
+
+class CatalogSnapshotWriter:
+    """
+    Render catalog listing pages to disk, each with a `.gz` sibling:
+    motoparts/page-N.json, motoparts/category-<id>/page-N.json and
+    categories/page-N.json. Files are swapped in with a rename and left
+    alone when unchanged, so their mtime (and ETag) stays stable.
+    """
+
+    def __init__(self, root=None, pages=None, base_url=None):
+        self.root = Path(root or getattr(settings, 'CATALOG_SNAPSHOT_ROOT', settings.BASE_DIR / 'snapshots'))
+        self.pages = pages or getattr(settings, 'CATALOG_SNAPSHOT_PAGES', 5)
+        self.url = urlsplit(base_url or getattr(settings, 'CATALOG_SNAPSHOT_BASE_URL', 'http://localhost:8000'))
+        self.written = 0
+
+    def request(self, path, params):
+        """An anonymous GET as the WSGI server would pass it in, so links use the public base URL"""
+        secure = self.url.scheme == 'https'
+        return WSGIRequest({
+            'REQUEST_METHOD': 'GET',
+            'SCRIPT_NAME': '',
+            'PATH_INFO': path,
+            'QUERY_STRING': urlencode(params),
+            'HTTP_HOST': self.url.netloc,
+            'SERVER_NAME': self.url.hostname,
+            'SERVER_PORT': str(self.url.port or (443 if secure else 80)),
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'wsgi.url_scheme': self.url.scheme,
+            'wsgi.input': io.BytesIO(),
+            'wsgi.errors': sys.stderr,
+        })
+
+    def render(self, view, path, params):
+        response = view(self.request(path, params))
+        response.render()
+        if response.status_code != 200:
+            raise RuntimeError(f'{path}?{urlencode(params)} returned {response.status_code}')
+        return response
+
+    def write_listing(self, view, path, directory, params=None):
+        """Write pages 1..N of one listing and drop pages beyond the last one"""
+        params = dict(params or {})
+        number = 0
+        for number in range(1, self.pages + 1):
+            if number > 1:
+                params['page'] = number
+            response = self.render(view, path, params)
+            content = response.content
+            target = directory / f'page-{number}.json'
+            # mtime=0 keeps the gzip bytes identical for identical content
+            compressed = gzip.compress(content, 9, mtime=0)
+            if write_atomic(target, content) | write_atomic(target.with_name(target.name + '.gz'), compressed):
+                self.written += 1
+            if not response.data['pagination']['next']:
+                break
+        if directory.is_dir():
+            for entry in directory.iterdir():
+                match = _PAGE_RE.match(entry.name)
+                if match and int(match.group(1)) > number:
+                    entry.unlink()
+
+    def write_catalog(self):
+        from .views import MotopartListView
+        self.write_listing(MotopartListView.as_view(), '/motoparts/', self.root / 'motoparts')
+
+    def write_categories(self):
+        from category.views import CategoryListView
+        self.write_listing(CategoryListView.as_view(), '/categories/', self.root / 'categories')
+
+    def write_category(self, category_id):
+        from .views import MotopartListView
+        self.write_listing(
+            MotopartListView.as_view(), '/motoparts/',
+            self.root / 'motoparts' / f'category-{category_id}', {'category': category_id},
+        )
+
+    def remove_category(self, category_id):
+        directory = self.root / 'motoparts' / f'category-{category_id}'
+        if directory.is_dir():
+            for entry in directory.iterdir():
+                entry.unlink()
+            directory.rmdir()
+
+    def refresh(self, category_ids):
+        """Rewrite the shared listings and the pages of the given categories"""
+        from category.models import Category
+        existing = set(Category.objects.filter(pk__in=category_ids).values_list('pk', flat=True))
+        self.write_catalog()
+        self.write_categories()
+        for category_id in sorted(category_ids):
+            if category_id in existing:
+                self.write_category(category_id)
+            else:
+                self.remove_category(category_id)
+
+    def build_all(self):
+        """Full rebuild, including removal of snapshots for deleted categories"""
+        from category.models import Category
+        category_ids = set(Category.objects.values_list('pk', flat=True))
+        category_root = self.root / 'motoparts'
+        if category_root.is_dir():
+            for entry in category_root.iterdir():
+                match = _CATEGORY_DIR_RE.match(entry.name)
+                if match and int(match.group(1)) not in category_ids:
+                    category_ids.add(int(match.group(1)))
+        self.refresh(category_ids)
+
+
+def schedule_snapshot_refresh(category_ids=(), motopart_ids=()):
+    """
+    Refresh the given categories once the current transaction commits.
+
+    Ids are queued per thread and the first commit callback drains the queue,
+    so many writes in one transaction cost a single refresh. Categories of
+    motopart_ids are looked up at commit time; use it for bulk writes that
+    only know which rows they touched.
+    """
+    if not snapshots_enabled():
+        return
+    if not getattr(_pending, 'scheduled', False):
+        _pending.scheduled = True
+        _pending.categories, _pending.motoparts = set(), set()
+    _pending.categories.update(pk for pk in category_ids if pk is not None)
+    _pending.motoparts.update(motopart_ids)
+    transaction.on_commit(_flush_pending)
+
+
+def _flush_pending():
+    if not getattr(_pending, 'scheduled', False):
+        return
+    _pending.scheduled = False
+    snapshot_refresher.add(_pending.categories, _pending.motoparts)
+
+
+class SnapshotRefresher:
+    """
+    Renders queued snapshot refreshes off the request, one pass at a time.
+
+    Ids added while a pass runs are merged and rendered by the next pass, so
+    a burst of writes costs a couple of passes rather than one each. A pass
+    that fails puts its ids back for the next one and logs the error. With
+    CATALOG_SNAPSHOT_IN_BACKGROUND = False it renders in the commit callback.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._categories, self._motoparts = set(), set()
+        self._running = False
+
+    def add(self, category_ids, motopart_ids):
+        background = getattr(settings, 'CATALOG_SNAPSHOT_IN_BACKGROUND', True)
+        with self._lock:
+            self._categories.update(category_ids)
+            self._motoparts.update(motopart_ids)
+            if self._running:
+                return
+            self._running = True
+        if background:
+            threading.Thread(target=self.run, args=(True,), name='catalog-snapshots', daemon=True).start()
+        else:
+            self.run()
+
+    def run(self, background=False):
+        try:
+            while True:
+                with self._lock:
+                    category_ids, motopart_ids = self._categories, list(self._motoparts)
+                    self._categories, self._motoparts = set(), set()
+                    if not category_ids and not motopart_ids:
+                        self._running = False
+                        return
+                try:
+                    self.render(set(category_ids), motopart_ids)
+                except Exception:
+                    logger.exception('Catalog snapshot refresh failed; retrying with the next write')
+                    with self._lock:
+                        self._categories.update(category_ids)
+                        self._motoparts.update(motopart_ids)
+                        self._running = False
+                    return
+        finally:
+            if background:
+                connections.close_all()
+
+    def render(self, category_ids, motopart_ids):
+        from .models import Motopart
+        for start in range(0, len(motopart_ids), 500):
+            category_ids.update(
+                Motopart.objects.filter(pk__in=motopart_ids[start:start + 500])
+                .values_list('category_id', flat=True).distinct()
+            )
+        CatalogSnapshotWriter().refresh(category_ids)
+
+
+snapshot_refresher = SnapshotRefresher()
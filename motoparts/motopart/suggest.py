@@ -0,0 +1,103 @@
+import heapq
+from bisect import bisect_left, insort
+
+from .cache import CatalogReplica
+from .search import fold_text, tokenize
+
+
+class PrefixIndex(CatalogReplica):
+    """
+    In-process typeahead index over motopart name and supplier tokens.
+
+    Entries are kept as a sorted list of (token, id) so a prefix lookup is a
+    bisect plus a short scan, and suggest() never touches the database. The
+    index follows the catalog as described in CatalogReplica; until the first
+    background build finishes, suggestions are empty.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._entries = []
+        self._tokens = {}
+        self._names = {}
+        self._folded_names = {}
+
+    @staticmethod
+    def tokens_for(name, supplier):
+        return sorted(set(tokenize(name)) | set(tokenize(supplier)))
+
+    def build(self, version):
+        from .models import Motopart
+        entries, tokens, names, folded = [], {}, {}, {}
+        rows = Motopart.objects.filter(status='active').values_list('id', 'name', 'supplier')
+        for pk, name, supplier in rows.iterator():
+            tokens[pk] = self.tokens_for(name, supplier)
+            names[pk] = name
+            folded[pk] = fold_text(name)
+            entries.extend((token, pk) for token in tokens[pk])
+        entries.sort()
+        with self._lock:
+            self._entries, self._tokens, self._names, self._folded_names = entries, tokens, names, folded
+            self.version = version
+
+    def _remove_locked(self, pk):
+        for token in self._tokens.pop(pk, ()):
+            position = bisect_left(self._entries, (token, pk))
+            if position < len(self._entries) and self._entries[position] == (token, pk):
+                del self._entries[position]
+        self._names.pop(pk, None)
+        self._folded_names.pop(pk, None)
+
+    def update(self, motopart):
+        """Re-index one committed part (inactive parts are dropped)"""
+        if self.version is None:
+            return
+        with self._lock:
+            self._remove_locked(motopart.pk)
+            if motopart.status == 'active':
+                tokens = self.tokens_for(motopart.name, motopart.supplier)
+                self._tokens[motopart.pk] = tokens
+                self._names[motopart.pk] = motopart.name
+                self._folded_names[motopart.pk] = fold_text(motopart.name)
+                for token in tokens:
+                    insort(self._entries, (token, motopart.pk))
+
+    def remove(self, pk):
+        if self.version is None:
+            return
+        with self._lock:
+            self._remove_locked(pk)
+
+    @staticmethod
+    def _ids_with_prefix(entries, prefix):
+        ids = set()
+        position = bisect_left(entries, (prefix,))
+        while position < len(entries) and entries[position][0].startswith(prefix):
+            ids.add(entries[position][1])
+            position += 1
+        return ids
+
+    def suggest(self, query, limit=10):
+        """Ids and names of parts whose tokens start with every query token"""
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return []
+        self.refresh()
+        folded_query = fold_text(query).strip()
+        # Narrow with the longest token first; it has the fewest matches
+        query_tokens.sort(key=len, reverse=True)
+        with self._lock:
+            candidates = self._ids_with_prefix(self._entries, query_tokens[0])
+            for token in query_tokens[1:]:
+                if not candidates:
+                    break
+                candidates &= self._ids_with_prefix(self._entries, token)
+            folded_names = self._folded_names
+            ranked = heapq.nsmallest(
+                limit, candidates,
+                key=lambda pk: (not folded_names[pk].startswith(folded_query), folded_names[pk], pk),
+            )
+            return [{'id': pk, 'name': self._names[pk]} for pk in ranked]
+
+
+suggest_index = PrefixIndex()
@@ -1,3 +1,1422 @@
-from django.test import TestCase
+import base64
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework.test import APIClient
+from category.models import Category
+from orderitem.models import OrderItem
+from orders.models import Order
+from motoparts.testing import QueryPlanTestMixin
+from .cache import CatalogReplica, bump_catalog_version, get_catalog_version
+from .changes import encode_change_cursor, prune_tombstones
+from .columnar import ColumnarCatalog, RankedMask, columnar_catalog
+from .object_cache import motopart_cache
+from .snapshots import CatalogSnapshotWriter, snapshot_refresher
+from .fuzzy import fuzzy_index
+from .models import (
+    CoPurchaseCount, Motopart, MotopartSalesWatermark, MotopartStats, MotopartTombstone, PopularityScale,
+    RelatedMotopart,
+)
+from .popularity import REBASE_HALF_LIVES, ViewCounter
+from .search import BaseSearchBackend
+from .suggest import suggest_index
+from .views import MotopartBatchView
+
+
+class MotopartQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        categories = [
+            Category.objects.create(name=f'Category {i}', slug=f'category-{i}')
+            for i in range(3)
+        ]
+        for i in range(30):
+            Motopart.objects.create(
+                name=f'Part {i}',
+                slug=f'part-{i}',
+                price=100000 + i,
+                stock=i,
+                category=categories[i % 3],
+                manufacture_year=2024,
+                supplier='Honda Official',
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_list_page_query_count_is_constant(self):
+        url = reverse('motopart-list-create')
+        for page_size in (1, 5, 25):
+            # 1 COUNT for the paginator + 1 page query joined with category
+            with self.assertNumQueries(2):
+                response = self.client.get(url, {'page_size': page_size})
+            self.assertEqual(len(response.json()['results']), page_size)
+
+    def test_expanded_list_query_count_is_constant(self):
+        url = reverse('motopart-list-create')
+        for page_size in (1, 25):
+            with self.assertNumQueries(2):
+                self.client.get(url, {'page_size': page_size, 'expand': 'category'})
+
+    def test_list_nests_category_with_active_count(self):
+        response = self.client.get(reverse('motopart-list-create'), {'page_size': 1, 'expand': 'category'})
+        category = response.json()['results'][0]['category']
+        self.assertEqual(category['motoparts_count'], 10)
+
+    def test_detail_is_a_single_query(self):
+        part = Motopart.objects.first()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('motopart-detail', args=[part.pk]), {'expand': 'category'})
+        self.assertEqual(response.status_code, 200)
+
+
+class MotopartSparseFieldsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Engine', slug='engine')
+        Motopart.objects.create(
+            name='Piston', slug='piston', price=100, description='Long text',
+            category=category, manufacture_year=2024, supplier='Honda Official',
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('motopart-list-create')
+
+    def test_category_defaults_to_id(self):
+        part = self.client.get(self.url).json()['results'][0]
+        self.assertNotIn('category', part)
+        self.assertEqual(part['category_id'], Category.objects.get().pk)
+
+    def test_expand_category(self):
+        part = self.client.get(self.url, {'expand': 'category'}).json()['results'][0]
+        self.assertEqual(part['category']['slug'], 'engine')
+
+    def test_fields_limits_output_and_columns(self):
+        with self.assertNumQueries(2) as queries:
+            response = self.client.get(self.url, {'fields': 'id,name,price'})
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'name', 'price'})
+        self.assertNotIn('description', queries.captured_queries[-1]['sql'])
+
+
+class MotopartQueryPlanTests(QueryPlanTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Engine', slug='engine')
+        for i, status in enumerate(['active', 'inactive', 'active']):
+            Motopart.objects.create(
+                name=f'Part {i}', slug=f'part-{i}', price=1000 + i, status=status,
+                category=cls.category, manufacture_year=2024, supplier='Honda Official',
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_catalog_listings_use_indexes(self):
+        url = reverse('motopart-list-create')
+        for params in ({}, {'category': self.category.pk}, {'category': self.category.pk, 'status': 'active'}):
+            with self.subTest(params=params):
+                response = self.assertNoFullScans(self.client.get, url, params)
+                self.assertEqual(response.status_code, 200)
+
+    def test_change_feed_uses_indexes(self):
+        self.assertNoFullScans(self.client.get, reverse('motopart-changes'))
+
+
+class MotopartPriceAndAvailabilityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Engine', slug='engine')
+        for slug, price, discount, stock in [
+            ('half-off', 200, 50, 3), ('plain', 150, 0, 0), ('cheap', 120, 0, 1), ('ten-off', 300, 10, 2),
+        ]:
+            Motopart.objects.create(
+                name=slug, slug=slug, price=price, discount=discount, stock=stock,
+                category=category, manufacture_year=2024, supplier='Honda Official',
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('motopart-list-create')
+
+    def slugs(self, **params):
+        response = self.client.get(self.url, {'fields': 'slug', **params})
+        self.assertEqual(response.status_code, 200)
+        return [part['slug'] for part in response.json()['results']]
+
+    def test_ordering_by_discounted_price(self):
+        self.assertEqual(self.slugs(ordering='discounted_price'), ['half-off', 'cheap', 'plain', 'ten-off'])
+        self.assertEqual(self.slugs(ordering='-discounted_price'), ['ten-off', 'plain', 'cheap', 'half-off'])
+
+    def test_price_bounds_apply_to_the_discounted_price(self):
+        # half-off lists at 200 but sells at 100; ten-off lists at 300 and sells at 270
+        self.assertEqual(self.slugs(min_price=110, max_price=200, ordering='discounted_price'), ['cheap', 'plain'])
+        self.assertEqual(self.slugs(max_price=100), ['half-off'])
+        self.assertEqual(self.slugs(min_price=250), ['ten-off'])
+
+    def test_available_follows_stock_and_status(self):
+        self.assertEqual(set(self.slugs(available='true')), {'half-off', 'cheap', 'ten-off'})
+        self.assertEqual(self.slugs(available='false'), ['plain'])
+        for slug, changes in [('plain', {'stock': 4}), ('cheap', {'stock': 0}), ('ten-off', {'status': 'inactive'})]:
+            part = Motopart.objects.get(slug=slug)
+            for field, value in changes.items():
+                setattr(part, field, value)
+            part.save()
+        self.assertEqual(set(self.slugs(available='true')), {'half-off', 'plain'})
+        self.assertEqual(set(self.slugs(available='false')), {'cheap', 'ten-off'})
+
+
+class MotopartSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Oil', slug='oil')
+        for slug, name, description in [
+            ('nhot-motul', 'Nhớt Motul 300V', 'Nhớt tổng hợp cho xe số'),
+            ('nhot-castrol', 'Nhớt Castrol Power1', 'Dầu nhớt'),
+            ('loc-gio', 'Lọc gió Honda', 'Lọc gió động cơ, thay cùng nhớt'),
+            ('bugi', 'Bugi NGK', 'Đánh lửa'),
+        ]:
+            Motopart.objects.create(
+                name=name, slug=slug, price=100000, description=description,
+                category=category, manufacture_year=2024, supplier='Honda Official',
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('motopart-list-create')
+
+    def search(self, query, **params):
+        response = self.client.get(self.url, {'search': query, 'fields': 'slug', **params})
+        self.assertEqual(response.status_code, 200)
+        return [part['slug'] for part in response.json()['results']]
+
+    def test_matches_every_term(self):
+        self.assertEqual(self.search('castrol nhot'), ['nhot-castrol'])
+
+    def test_folds_diacritics_both_ways(self):
+        self.assertCountEqual(self.search('loc gio'), ['loc-gio'])
+        self.assertCountEqual(self.search('Lọc GIÓ'), ['loc-gio'])
+        self.assertCountEqual(self.search('đanh lua'), ['bugi'])
+
+    def test_matches_prefixes(self):
+        self.assertEqual(self.search('mot'), ['nhot-motul'])
+
+    def test_ranks_by_relevance(self):
+        # The oils mention "nhot" in name and description, the filter only in passing
+        results = self.search('nhot')
+        self.assertCountEqual(results, ['nhot-motul', 'nhot-castrol', 'loc-gio'])
+        self.assertEqual(results[-1], 'loc-gio')
+
+    def test_explicit_ordering_wins_over_rank(self):
+        self.assertEqual(self.search('nhot', ordering='slug'), ['loc-gio', 'nhot-castrol', 'nhot-motul'])
+
+    def test_follows_writes(self):
+        part = Motopart.objects.get(slug='bugi')
+        part.name = 'Bugi Iridium'
+        part.save()
+        self.assertEqual(self.search('iridium'), ['bugi'])
+        part.delete()
+        self.assertEqual(self.search('iridium'), [])
+
+    def test_backend_without_search_fails_at_instantiation(self):
+        class Incomplete(BaseSearchBackend):
+            pass
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+
+class MotopartCursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Engine', slug='engine')
+        for i in range(7):
+            # Repeated prices make the id tie-breaker part of the key
+            Motopart.objects.create(
+                name=f'Part {i}', slug=f'part-{i}', price=1000 * (i // 2),
+                category=category, manufacture_year=2024, supplier='Honda Official',
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('motopart-list-create')
+
+    def get(self, **params):
+        response = self.client.get(self.url, {'pagination': 'cursor', 'page_size': 3, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def follow(self, link):
+        return self.get(cursor=parse_qs(urlparse(link).query)['cursor'][0])
+
+    def cursor(self, payload):
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+    def test_walks_forward_and_back(self):
+        expected = list(Motopart.objects.order_by('price', 'id').values_list('slug', flat=True))
+        pages = [self.get(ordering='price')]
+        while pages[-1]['pagination']['next']:
+            pages.append(self.follow(pages[-1]['pagination']['next']))
+        walked = [part['slug'] for page in pages for part in page['results']]
+        self.assertEqual(walked, expected)
+        self.assertIsNone(pages[0]['pagination']['previous'])
+
+        back = [pages[-1]]
+        while back[-1]['pagination']['previous']:
+            back.append(self.follow(back[-1]['pagination']['previous']))
+        self.assertEqual(
+            [[part['slug'] for part in page['results']] for page in back],
+            [[part['slug'] for part in page['results']] for page in reversed(pages)],
+        )
+
+    def test_default_ordering_is_newest_first(self):
+        first = self.get()
+        second = self.follow(first['pagination']['next'])
+        walked = [part['slug'] for part in first['results'] + second['results']]
+        self.assertEqual(walked, list(Motopart.objects.order_by('-created_at', '-id').values_list('slug', flat=True)[:6]))
+
+    def test_invalid_cursors_are_not_found(self):
+        for cursor in [
+            'not-base64!',
+            base64.urlsafe_b64encode(b'not json').decode(),
+            self.cursor([1, 2]),
+            self.cursor({'o': 'price', 'v': 1}),
+            self.cursor({'o': 'nonexistent', 'v': 1, 'id': 1, 'r': False}),
+            self.cursor({'o': 'stock', 'v': 1, 'id': 1, 'r': False}),
+            self.cursor({'o': None, 'v': 1, 'id': 1, 'r': False}),
+            self.cursor({'o': 'price', 'v': {}, 'id': 1, 'r': False}),
+            self.cursor({'o': 'price', 'v': 'cheap', 'id': 1, 'r': False}),
+            self.cursor({'o': 'name', 'v': 5, 'id': 1, 'r': False}),
+            self.cursor({'o': '-created_at', 'v': 'yesterday', 'id': 1, 'r': False}),
+            self.cursor({'o': 'price', 'v': 1, 'id': {}, 'r': False}),
+        ]:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(self.url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json()['detail'], 'Invalid cursor')
+
+
+@override_settings(MOTOPART_REPLICA_REBUILD_IN_BACKGROUND=False, MOTOPART_CATALOG_POLL_SECONDS=0)
+class MotopartSuggestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Oil', slug='oil')
+        for slug, name, status in [
+            ('nhot-motul', 'Nhớt Motul 300V', 'active'),
+            ('loc-nhot', 'Lọc nhớt Honda', 'active'),
+            ('nhot-castrol', 'Nhớt Castrol', 'inactive'),
+        ]:
+            cls.create(slug, name, status)
+
+    @classmethod
+    def create(cls, slug, name, status='active'):
+        return Motopart.objects.create(
+            name=name, slug=slug, price=100000, status=status,
+            category=cls.category, manufacture_year=2024, supplier='Honda Official',
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        suggest_index.rebuild()
+
+    def names(self, query, limit=10):
+        return [result['name'] for result in suggest_index.suggest(query, limit)]
+
+    def test_prefix_matches_rank_name_prefixes_first(self):
+        self.assertEqual(self.names('nho'), ['Nhớt Motul 300V', 'Lọc nhớt Honda'])
+        self.assertEqual(self.names('nho', limit=1), ['Nhớt Motul 300V'])
+        self.assertEqual(self.names('honda loc'), ['Lọc nhớt Honda'])
+        self.assertEqual(self.names('castrol'), [])
+
+    @override_settings(MOTOPART_CATALOG_POLL_SECONDS=60)
+    def test_endpoint_does_not_query_the_database(self):
+        suggest_index.suggest('warm')
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('motopart-suggest'), {'q': 'motul'})
+        self.assertEqual(response.json()['results'][0]['name'], 'Nhớt Motul 300V')
+
+    def test_committed_saves_are_patched_in(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            part = self.create('bugi', 'Bugi NGK')
+        self.assertEqual(self.names('bugi'), ['Bugi NGK'])
+        with self.captureOnCommitCallbacks(execute=True):
+            part.delete()
+        self.assertEqual(self.names('bugi'), [])
+
+    @override_settings(MOTOPART_CATALOG_POLL_SECONDS=60)
+    def test_rolled_back_save_leaves_no_entry(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    self.create('bugi', 'Bugi NGK')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.names('bugi'), [])
+
+    def test_write_from_another_process_is_picked_up(self):
+        # Another worker renames a part: a bump and a row change that never reach this process's signals
+        Motopart.objects.filter(slug='nhot-motul').update(name='Nhớt Motul 7100')
+        bump_catalog_version()
+        # A local save committing afterwards must not swallow that bump
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create('bugi', 'Bugi NGK')
+        self.assertEqual(self.names('motul'), ['Nhớt Motul 7100'])
+        self.assertEqual(self.names('bugi'), ['Bugi NGK'])
+
+
+@override_settings(MOTOPART_REPLICA_REBUILD_IN_BACKGROUND=False, MOTOPART_CATALOG_POLL_SECONDS=0)
+class MotopartFuzzySearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Oil', slug='oil')
+        cls.create('nhot-motul', 'Nhớt Motul 300V')
+        cls.create('bugi-ngk', 'Bugi NGK Iridium')
+
+    @classmethod
+    def create(cls, slug, name):
+        return Motopart.objects.create(
+            name=name, slug=slug, price=100000,
+            category=cls.category, manufacture_year=2024, supplier='Honda Official',
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        fuzzy_index.rebuild()
+
+    def search(self, query):
+        response = self.client.get(reverse('motopart-list-create'), {'search': query, 'fields': 'slug'})
+        return [part['slug'] for part in response.json()['results']]
+
+    def test_typos_fall_back_to_trigram_matches(self):
+        self.assertEqual(self.search('motol'), ['nhot-motul'])
+        self.assertEqual(self.search('iridum ngk'), ['bugi-ngk'])
+        # Numbers have no edit budget
+        self.assertEqual(self.search('301'), [])
+
+    def test_committed_saves_are_patched_in(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create('phanh', 'Má phanh Brembo')
+        self.assertEqual(fuzzy_index.search('brembp'), {Motopart.objects.get(slug='phanh').pk: 1})
+
+    @override_settings(MOTOPART_CATALOG_POLL_SECONDS=60)
+    def test_rolled_back_save_leaves_no_entry(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.create('phanh', 'Má phanh Brembo')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(fuzzy_index.search('brembp'), {})
+
+    def test_write_from_another_process_is_picked_up(self):
+        Motopart.objects.filter(slug='bugi-ngk').update(name='Bugi Denso')
+        bump_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create('phanh', 'Má phanh Brembo')
+        self.assertEqual(self.search('dneso'), ['bugi-ngk'])
+        self.assertEqual(self.search('iridum'), [])
+
+
+@override_settings(MOTOPART_VIEW_FLUSH_SECONDS=3600)
+class MotopartObjectCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Engine', slug='engine')
+        cls.part = Motopart.objects.create(
+            name='Piston', slug='piston', price=100,
+            category=cls.category, manufacture_year=2024, supplier='Honda Official',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def detail(self, key):
+        name = 'motopart-detail' if isinstance(key, int) else 'motopart-detail-slug'
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get(reverse(name, args=[key]))
+
+    def test_second_read_is_served_from_the_cache(self):
+        for key in (self.part.pk, 'piston'):
+            with self.subTest(key=key):
+                cache.clear()
+                self.assertEqual(self.detail(key).status_code, 200)
+                with self.assertNumQueries(0):
+                    response = self.detail(key)
+                self.assertEqual(response.json()['name'], 'Piston')
+                self.assertEqual(response.json()['category_id'], self.category.pk)
+
+    def test_writes_invalidate_pk_and_slug_keys(self):
+        self.detail(self.part.pk)
+        self.detail('piston')
+        part = Motopart.objects.get(pk=self.part.pk)
+        part.name, part.slug = 'Piston Racing', 'piston-racing'
+        with self.captureOnCommitCallbacks(execute=True):
+            part.save()
+        self.assertEqual(self.detail(self.part.pk).json()['name'], 'Piston Racing')
+        self.assertEqual(self.detail('piston').status_code, 404)
+        self.assertEqual(self.detail('piston-racing').json()['id'], self.part.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            part.delete()
+        self.assertEqual(self.detail(self.part.pk).status_code, 404)
+        self.assertEqual(self.detail('piston-racing').status_code, 404)
+
+    def test_rolled_back_write_leaves_nothing_cached(self):
+        with transaction.atomic():
+            Motopart.objects.filter(pk=self.part.pk).update(name='Uncommitted')
+            # A read inside the transaction sees the uncommitted row
+            self.assertEqual(motopart_cache.get(self.part.pk).name, 'Uncommitted')
+            transaction.set_rollback(True)
+        self.assertIsNone(cache.get(motopart_cache.pk_key(self.part.pk)))
+        self.assertIsNone(cache.get(motopart_cache.slug_key('piston')))
+        self.assertEqual(self.detail(self.part.pk).json()['name'], 'Piston')
+
+    def test_slugs_that_look_like_other_routes_resolve(self):
+        for slug in ('123', 'facets', 'batch', 'changes', 'suggest', 'bulk-update', 'bulk-upsert'):
+            with self.subTest(slug=slug):
+                part = Motopart.objects.create(
+                    name=slug, slug=slug, price=100,
+                    category=self.category, manufacture_year=2024, supplier='Honda Official',
+                )
+                response = self.detail(slug)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()['id'], part.pk)
+
+
+class MotopartBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        categories = [Category.objects.create(name=f'Category {i}', slug=f'category-{i}') for i in range(3)]
+        cls.parts = [
+            Motopart.objects.create(
+                name=f'Part {i}', slug=f'part-{i}', price=100,
+                category=categories[i % 3], manufacture_year=2024, supplier='Honda Official',
+            )
+            for i in range(6)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('motopart-batch')
+
+    def batch(self, ids, **params):
+        return self.client.get(self.url, {'ids': ','.join(str(pk) for pk in ids), **params})
+
+    def test_results_follow_the_requested_order(self):
+        a, b, c = self.parts[4].pk, self.parts[0].pk, self.parts[2].pk
+        response = self.batch([a, b, 999999, a, c, b])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([part['id'] for part in response.json()['results']], [a, b, c])
+        self.assertEqual(response.json()['missing'], [999999])
+
+    def test_invalid_ids_are_rejected(self):
+        for ids in ['1,abc', '', ',', ','.join(str(pk) for pk in range(1, MotopartBatchView.max_ids + 2))]:
+            with self.subTest(ids=ids[:20]):
+                response = self.client.get(self.url, {'ids': ids})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('message', response.json())
+
+    def test_expand_category_is_one_query(self):
+        for count in (2, 6):
+            with self.subTest(count=count):
+                with self.assertNumQueries(1):
+                    response = self.batch([part.pk for part in self.parts[:count]], expand='category')
+                self.assertEqual(
+                    [part['category']['id'] for part in response.json()['results']],
+                    [part.category_id for part in self.parts[:count]],
+                )
+
+
+class MotopartChangeFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Engine', slug='engine')
+        cls.parts = [
+            Motopart.objects.create(
+                name=f'Part {i}', slug=f'part-{i}', price=100,
+                category=category, manufacture_year=2024, supplier='Honda Official',
+            )
+            for i in range(5)
+        ]
+        # Older than the settle window, all at the same instant: ties go by id
+        Motopart.objects.update(updated_at=timezone.now() - timedelta(minutes=5))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('motopart-changes')
+
+    def changes(self, since=None, **params):
+        if since is not None:
+            params['since'] = since
+        return self.client.get(self.url, {'fields': 'id,slug', **params})
+
+    def sync(self, since=None, limit=2):
+        """Follow next_cursor until has_more is false; returns ([(op, id)], cursor)"""
+        seen = []
+        while True:
+            data = self.changes(since, limit=limit).json()
+            seen += [(change['op'], change['id']) for change in data['results']]
+            since = data['next_cursor']
+            if not data['has_more']:
+                return seen, since
+
+    def test_pages_follow_the_cursor(self):
+        first = self.changes(limit=2).json()
+        self.assertEqual([change['id'] for change in first['results']], [part.pk for part in self.parts[:2]])
+        self.assertEqual(first['results'][0]['data'], {'id': self.parts[0].pk, 'slug': 'part-0'})
+        self.assertTrue(first['has_more'])
+        seen, cursor = self.sync(first['next_cursor'])
+        self.assertEqual(seen, [('upsert', part.pk) for part in self.parts[2:]])
+        # Nothing new: an empty page that keeps the position
+        data = self.changes(cursor).json()
+        self.assertEqual((data['results'], data['has_more']), ([], False))
+        self.assertEqual(self.sync(data['next_cursor'])[0], [])
+
+    def test_deleted_part_comes_back_as_a_tombstone(self):
+        _, cursor = self.sync()
+        pk = self.parts[3].pk
+        self.parts[3].delete()
+        MotopartTombstone.objects.update(deleted_at=timezone.now() - timedelta(minutes=1))
+        data = self.changes(cursor).json()
+        self.assertEqual(len(data['results']), 1)
+        change = data['results'][0]
+        self.assertEqual((change['op'], change['id'], change['slug']), ('delete', pk, 'part-3'))
+        self.assertNotIn('data', change)
+
+    def test_changes_wait_for_the_settle_window(self):
+        _, cursor = self.sync()
+        part = self.parts[1]
+        part.name = 'Renamed'
+        part.save()
+        self.assertEqual(self.changes(cursor).json()['results'], [])
+        Motopart.objects.filter(pk=part.pk).update(updated_at=timezone.now() - timedelta(seconds=3))
+        self.assertEqual(self.sync(cursor)[0], [('upsert', part.pk)])
+
+    def test_expired_cursor_is_gone(self):
+        changed_at = timezone.now() - timedelta(days=40)
+        cursor = encode_change_cursor(changed_at, self.parts[0].pk, issued_at=changed_at)
+        with self.settings(MOTOPART_TOMBSTONE_RETENTION_DAYS=30):
+            response = self.changes(cursor)
+        self.assertEqual(response.status_code, 410)
+
+    def test_malformed_cursor_is_rejected(self):
+        for cursor in ['not-a-cursor', base64.urlsafe_b64encode(b'{"t": "2024-01-01T00:00:00"}').decode()]:
+            with self.subTest(cursor=cursor):
+                response = self.changes(cursor)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'message': 'Invalid cursor'})
+
+    @override_settings(MOTOPART_TOMBSTONE_RETENTION_DAYS=30)
+    def test_prune_removes_only_expired_tombstones(self):
+        pks = [part.pk for part in self.parts[:3]]
+        for part in self.parts[:3]:
+            part.delete()
+        MotopartTombstone.objects.filter(motopart_id__in=pks[:2]).update(deleted_at=timezone.now() - timedelta(days=31))
+        out = io.StringIO()
+        call_command('prune_motopart_tombstones', stdout=out)
+        self.assertIn('Deleted 2 tombstones older than 30 days', out.getvalue())
+        self.assertEqual(list(MotopartTombstone.objects.values_list('motopart_id', flat=True)), pks[2:])
+        self.assertEqual(prune_tombstones(), 0)
+
+
+class MotopartFacetsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.oil = Category.objects.create(name='Oil', slug='oil')
+        cls.engine = Category.objects.create(name='Engine', slug='engine')
+        for slug, name, category, supplier, price, discount, year, status in [
+            ('motul-10w40', 'Motul oil 10W40', cls.oil, 'Motul', 150000, 0, 2022, 'active'),
+            ('motul-5w30', 'Motul oil 5W30', cls.oil, 'Motul', 250000, 50, 2023, 'active'),
+            ('motul-lube', 'Motul chain lube', cls.engine, 'Motul', 600000, 0, 2023, 'active'),
+            ('castrol-oil', 'Castrol oil', cls.oil, 'Castrol', 90000, 0, 2022, 'active'),
+            ('motul-old', 'Motul oil 2T', cls.oil, 'Motul', 3000000, 0, 2022, 'inactive'),
+        ]:
+            Motopart.objects.create(
+                name=name, slug=slug, category=category, supplier=supplier, price=price,
+                discount=discount, manufacture_year=year, status=status,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse('motopart-facets')
+
+    def facets(self, query):
+        response = self.client.get(f'{self.url}?{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_counts_under_combined_filters_and_search(self):
+        data = self.facets('supplier=Motul&status=active&search=oil')
+        facets = data['facets']
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(facets['category'], [{'value': self.oil.pk, 'label': 'Oil', 'count': 2}])
+        self.assertEqual(facets['supplier'], [{'value': 'Motul', 'count': 2}])
+        self.assertEqual(facets['manufacture_year'], [{'value': 2022, 'count': 1}, {'value': 2023, 'count': 1}])
+        self.assertEqual(facets['status'], [{'value': 'active', 'count': 2}])
+        # Buckets use the discounted price: the 250000 part at 50% off lands under 200000
+        self.assertEqual(
+            [(bucket['min'], bucket['max'], bucket['count']) for bucket in facets['price']],
+            [(None, 100000, 0), (100000, 200000, 2), (200000, 500000, 0), (500000, 1000000, 0),
+             (1000000, 2000000, 0), (2000000, None, 0)],
+        )
+
+        facets = self.facets('min_price=100000')['facets']
+        self.assertEqual(facets['supplier'], [{'value': 'Motul', 'count': 4}])
+        self.assertEqual(facets['category'][0], {'value': self.oil.pk, 'label': 'Oil', 'count': 3})
+
+    def test_cache_key_ignores_parameter_order(self):
+        first = self.facets('supplier=Motul&status=active&page=2')
+        # Only the catalog version lookup: the facets come from the cache
+        with self.assertNumQueries(1):
+            second = self.facets('status=active&ordering=name&supplier=Motul')
+        self.assertEqual(first, second)
+
+    def test_catalog_write_invalidates_cached_facets(self):
+        version = get_catalog_version()
+        self.assertEqual(self.facets('supplier=Castrol')['count'], 1)
+        Motopart.objects.create(
+            name='Castrol oil 2', slug='castrol-oil-2', category=self.oil, supplier='Castrol',
+            price=95000, manufacture_year=2024,
+        )
+        self.assertGreater(get_catalog_version(), version)
+        data = self.facets('supplier=Castrol')
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(data['facets']['manufacture_year'], [{'value': 2022, 'count': 1}, {'value': 2024, 'count': 1}])
+
+
+class MotopartBulkUpsertTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_user(
+            email='admin@example.com', username='admin', password='x', role='admin'
+        )
+        cls.engine = Category.objects.create(name='Engine', slug='engine')
+        cls.oil = Category.objects.create(name='Oil', slug='oil')
+        Motopart.objects.create(
+            name='Piston', slug='piston', price=100, category=cls.engine,
+            manufacture_year=2024, supplier='Honda Official',
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.url = reverse('motopart-bulk-upsert')
+
+    def upsert(self, rows, **params):
+        body = '\n'.join(row if isinstance(row, str) else json.dumps(row) for row in rows)
+        url = self.url + ('?' + '&'.join(f'{key}={value}' for key, value in params.items()) if params else '')
+        response = self.client.generic('POST', url, body.encode(), content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def new_row(self, slug, **fields):
+        return {
+            'slug': slug, 'name': slug.title(), 'price': 1000, 'category_id': self.oil.pk,
+            'manufacture_year': 2024, 'supplier': 'Motul', **fields,
+        }
+
+    def test_creates_and_updates_by_slug(self):
+        summary = self.upsert([
+            self.new_row('motul-300v', name='Nhớt Motul 300V'),
+            {'slug': 'piston', 'price': 150, 'stock': 4},
+            # Later rows for the same slug in one batch win
+            {'slug': 'motul-300v', 'price': 1200},
+        ])
+        self.assertEqual((summary['created'], summary['updated'], summary['failed']), (1, 1, 0))
+        piston = Motopart.objects.get(slug='piston')
+        self.assertEqual((piston.price, piston.stock, piston.name), (150, 4, 'Piston'))
+        motul = Motopart.objects.get(slug='motul-300v')
+        self.assertEqual((motul.price, motul.discounted_price), (1200, 1200))
+
+    def test_reports_invalid_rows_and_applies_the_rest(self):
+        summary = self.upsert([
+            '{not json',
+            self.new_row('bad-price', price=-1),
+            self.new_row('no-category', category_id=999999),
+            {'slug': 'incomplete', 'price': 10},
+            {'name': 'No slug'},
+            self.new_row('good'),
+        ], batch_size=2)
+        self.assertEqual((summary['created'], summary['failed']), (1, 5))
+        errors = {error['line']: error for error in summary['errors']}
+        self.assertEqual(sorted(errors), [1, 2, 3, 4, 5])
+        self.assertIn('price', errors[2]['errors'])
+        self.assertEqual(errors[3]['errors'], {'category_id': ['Category not found']})
+        self.assertEqual(
+            set(errors[4]['errors']), {'name', 'category_id', 'manufacture_year', 'supplier'}
+        )
+        self.assertIn('slug', errors[5]['errors'])
+        self.assertEqual(list(Motopart.objects.filter(supplier='Motul').values_list('slug', flat=True)), ['good'])
+
+    def test_csv_rows(self):
+        body = (
+            'slug,name,price,category_id,manufacture_year,supplier,description\n'
+            f'motul-300v,Nhớt Motul,1000,{self.oil.pk},2024,Motul,\n'
+            'piston,,175,,,,\n'
+        )
+        response = self.client.generic('POST', self.url, body.encode(), content_type='text/csv')
+        self.assertEqual(response.json()['created'], 1)
+        self.assertEqual(Motopart.objects.get(slug='piston').price, 175)
+
+    def test_refreshes_counters_search_and_caches(self):
+        version = get_catalog_version()
+        self.client.get(reverse('motopart-detail-slug', args=['piston']))
+        self.upsert([
+            self.new_row('motul-300v', name='Nhớt Motul 300V'),
+            self.new_row('motul-7100', status='inactive'),
+            {'slug': 'piston', 'category_id': self.oil.pk, 'name': 'Piston Racing'},
+        ])
+        self.engine.refresh_from_db()
+        self.oil.refresh_from_db()
+        self.assertEqual((self.engine.active_motoparts_count, self.oil.active_motoparts_count), (0, 2))
+        self.assertGreater(get_catalog_version(), version)
+
+        search = self.client.get(reverse('motopart-list-create'), {'search': 'racing', 'fields': 'slug'})
+        self.assertEqual([part['slug'] for part in search.json()['results']], ['piston'])
+        search = self.client.get(reverse('motopart-list-create'), {'search': 'motul', 'fields': 'slug'})
+        self.assertEqual({part['slug'] for part in search.json()['results']}, {'motul-300v', 'motul-7100'})
+        # The detail read above cached the old row
+        detail = self.client.get(reverse('motopart-detail-slug', args=['piston']))
+        self.assertEqual(detail.json()['name'], 'Piston Racing')
+
+    def test_admin_only(self):
+        self.client.force_authenticate(None)
+        response = self.client.generic('POST', self.url, b'{}', content_type='application/x-ndjson')
+        self.assertIn(response.status_code, (401, 403))
+
+
+class SyncSupplierFeedCommandTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Oil', slug='oil')
+        for slug, supplier, price, status in [
+            ('honda-piston', 'Honda Official', 100, 'active'),
+            ('honda-ring', 'Honda Official', 50, 'active'),
+            ('honda-gasket', 'Honda Official', 20, 'active'),
+            ('honda-old', 'Honda Official', 10, 'inactive'),
+            ('nhot-motul', 'Motul', 200, 'active'),
+        ]:
+            Motopart.objects.create(
+                name=slug.title(), slug=slug, price=price, stock=5, status=status,
+                category=cls.category, manufacture_year=2024, supplier=supplier,
+            )
+
+    def feed(self, *rows):
+        handle, path = tempfile.mkstemp(suffix='.ndjson')
+        with os.fdopen(handle, 'w') as feed:
+            feed.write('\n'.join(row if isinstance(row, str) else json.dumps(row) for row in rows))
+        self.addCleanup(os.remove, path)
+        return path
+
+    def sync(self, path, *args):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('sync_supplier_feed', 'Honda Official', path, *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue().strip(), stderr.getvalue()
+
+    def default_feed(self):
+        return self.feed(
+            {'slug': 'honda-piston', 'price': 120},
+            {'slug': 'honda-ring', 'price': 50, 'stock': 5},
+            {'slug': 'honda-clutch', 'name': 'Clutch', 'price': 300, 'category_id': self.category.pk,
+             'manufacture_year': 2024},
+            {'slug': 'honda-chain', 'price': 80},
+            {'slug': 'nhot-motul', 'name': 'Taken over', 'price': 1, 'category_id': self.category.pk,
+             'manufacture_year': 2024},
+            '{broken',
+        )
+
+    def test_reports_the_diff_and_writes_only_changes(self):
+        ring_updated_at = Motopart.objects.get(slug='honda-ring').updated_at
+        stdout, stderr = self.sync(self.default_feed())
+        self.assertEqual(stdout, 'inserted=1 updated=1 unchanged=1 missing=2 failed=3')
+        self.assertEqual(Motopart.objects.get(slug='honda-piston').price, 120)
+        self.assertEqual(Motopart.objects.get(slug='honda-ring').updated_at, ring_updated_at)
+        self.assertEqual(Motopart.objects.get(slug='honda-clutch').supplier, 'Honda Official')
+        self.assertFalse(Motopart.objects.filter(slug='honda-chain').exists())
+        self.assertIn('line 4 (honda-chain)', stderr)
+        self.assertIn('line 6 (None)', stderr)
+
+    def test_never_takes_over_another_suppliers_slug(self):
+        stdout, stderr = self.sync(self.default_feed())
+        self.assertIn('line 5 (nhot-motul)', stderr)
+        motul = Motopart.objects.get(slug='nhot-motul')
+        self.assertEqual((motul.supplier, motul.name, motul.price), ('Motul', 'Nhot-Motul', 200))
+
+    def test_repeated_new_slug_is_counted_as_an_update(self):
+        row = {'slug': 'honda-clutch', 'name': 'Clutch', 'price': 300, 'category_id': self.category.pk,
+               'manufacture_year': 2024}
+        stdout, _ = self.sync(self.feed(row, {**row, 'price': 310}), '--batch-size', '1')
+        self.assertTrue(stdout.startswith('inserted=1 updated=1 '))
+        self.assertEqual(Motopart.objects.get(slug='honda-clutch').price, 310)
+
+    def test_missing_status(self):
+        old_updated_at = Motopart.objects.get(slug='honda-old').updated_at
+        stdout, _ = self.sync(self.feed({'slug': 'honda-piston'}, {'slug': 'honda-ring'}), '--missing-status', 'inactive')
+        self.assertEqual(stdout, 'inserted=0 updated=0 unchanged=2 missing=2 failed=0')
+        self.assertEqual(Motopart.objects.get(slug='honda-gasket').status, 'inactive')
+        # Already in the target status: not rewritten
+        self.assertEqual(Motopart.objects.get(slug='honda-old').updated_at, old_updated_at)
+        self.category.refresh_from_db()
+        # piston, ring and the Motul part stay active
+        self.assertEqual(self.category.active_motoparts_count, 3)
+
+    def test_dry_run_reports_what_a_real_run_does(self):
+        path = self.default_feed()
+        before = list(Motopart.objects.order_by('pk').values())
+        dry_stdout, dry_stderr = self.sync(path, '--dry-run', '--missing-status', 'inactive')
+        self.assertEqual(list(Motopart.objects.order_by('pk').values()), before)
+        stdout, stderr = self.sync(path, '--missing-status', 'inactive')
+        self.assertEqual(dry_stdout, f'[dry run] {stdout}')
+        self.assertEqual(dry_stderr, stderr)
+
+
+class CatalogSnapshotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.engine = Category.objects.create(name='Engine', slug='engine')
+        cls.oil = Category.objects.create(name='Oil', slug='oil')
+        for i in range(21):
+            Motopart.objects.create(
+                name=f'Part {i}', slug=f'part-{i}', price=1000 + i,
+                category=cls.engine if i % 2 else cls.oil, manufacture_year=2024, supplier='Honda Official',
+            )
+
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root)
+        settings = override_settings(
+            CATALOG_SNAPSHOT_ROOT=self.root, CATALOG_SNAPSHOT_PAGES=3,
+            CATALOG_SNAPSHOT_AUTO=True, CATALOG_SNAPSHOT_IN_BACKGROUND=False,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def files(self):
+        return sorted(str(path.relative_to(self.root)) for path in self.root.rglob('*') if path.is_file())
+
+    def test_build_writes_every_listing_with_gzip_siblings(self):
+        call_command('build_catalog_snapshots', stdout=io.StringIO())
+        pages = [name for name in self.files() if name.endswith('.json')]
+        self.assertEqual(pages, [
+            'categories/page-1.json',
+            f'motoparts/category-{self.engine.pk}/page-1.json',
+            f'motoparts/category-{self.oil.pk}/page-1.json',
+            'motoparts/page-1.json',
+            'motoparts/page-2.json',
+        ])
+        for name in pages:
+            path = self.root / name
+            self.assertEqual(gzip.decompress((self.root / f'{name}.gz').read_bytes()), path.read_bytes())
+        page = json.loads((self.root / 'motoparts/page-2.json').read_bytes())
+        self.assertEqual(page, APIClient().get(reverse('motopart-list-create'), {'page': 2}, HTTP_HOST='localhost:8000').json())
+
+    def test_rebuild_keeps_unchanged_files_and_drops_extra_pages(self):
+        call_command('build_catalog_snapshots', stdout=io.StringIO())
+        category_page = self.root / f'motoparts/category-{self.engine.pk}/page-1.json'
+        mtime = category_page.stat().st_mtime_ns
+        Motopart.objects.filter(category=self.oil).delete()
+        call_command('build_catalog_snapshots', stdout=io.StringIO())
+        self.assertFalse((self.root / 'motoparts/page-2.json').exists())
+        self.assertEqual(category_page.stat().st_mtime_ns, mtime)
+
+    def test_committed_writes_refresh_their_categories(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            brakes = Category.objects.create(name='Brakes', slug='brakes')
+            Motopart.objects.create(
+                name='Pad', slug='pad', price=10, category=brakes, manufacture_year=2024, supplier='Brembo',
+            )
+        page = json.loads((self.root / f'motoparts/category-{brakes.pk}/page-1.json').read_bytes())
+        self.assertEqual([part['slug'] for part in page['results']], ['pad'])
+        # Only the listings the write touched were rendered
+        self.assertNotIn(f'motoparts/category-{self.engine.pk}/page-1.json', self.files())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            brakes.delete()
+        self.assertFalse((self.root / f'motoparts/category-{brakes.pk}').exists())
+
+    def test_rolled_back_writes_render_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Motopart.objects.filter(slug='part-1').update(price=1)
+                    Motopart.objects.get(slug='part-1').save()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(self.files(), [])
+
+    def test_links_use_the_public_base_url(self):
+        with self.settings(CATALOG_SNAPSHOT_BASE_URL='https://shop.example.com'):
+            call_command('build_catalog_snapshots', stdout=io.StringIO())
+        page = json.loads((self.root / 'motoparts/page-1.json').read_bytes())
+        self.assertEqual(page['pagination']['next'], 'https://shop.example.com/motoparts/?page=2')
+
+    def test_failed_refresh_keeps_its_ids_for_the_next_pass(self):
+        self.addCleanup(setattr, snapshot_refresher, '_categories', set())
+        with mock.patch.object(CatalogSnapshotWriter, 'refresh', side_effect=OSError('disk full')):
+            with self.assertLogs('motopart.snapshots', 'ERROR'):
+                snapshot_refresher.add({self.engine.pk}, [])
+        self.assertEqual(snapshot_refresher._categories, {self.engine.pk})
+        self.assertFalse(snapshot_refresher._running)
+        # The next write renders the category that failed along with its own
+        snapshot_refresher.add({self.oil.pk}, [])
+        self.assertIn(f'motoparts/category-{self.engine.pk}/page-1.json', self.files())
+        self.assertIn(f'motoparts/category-{self.oil.pk}/page-1.json', self.files())
+        self.assertEqual(snapshot_refresher._categories, set())
+
+
+@override_settings(MOTOPART_REPLICA_REBUILD_IN_BACKGROUND=False)
+class ColumnarEngineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.engine = Category.objects.create(name='Engine', slug='engine')
+        cls.oil = Category.objects.create(name='Oil', slug='oil')
+        cls.empty = Category.objects.create(name='Empty', slug='empty')
+        for i in range(12):
+            # Every sortable key is unique: the ORM leaves the order of ties unspecified
+            Motopart.objects.create(
+                name=f'Part {(i * 7) % 12:02d}', slug=f'part-{i}', price=1000 + (i * 5) % 12,
+                stock=(i * 11) % 12, discount=10 if i % 4 == 0 else 0,
+                status='inactive' if i % 5 == 0 else 'active',
+                category=cls.engine if i % 3 else cls.oil, manufacture_year=2020 + i,
+                supplier='Motul' if i % 2 else 'Honda Official',
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('motopart-list-create')
+        columnar_catalog.rebuild()
+
+    def compare(self, params):
+        with override_settings(MOTOPART_COLUMNAR_ENGINE=False):
+            expected = self.client.get(self.url, params)
+        with override_settings(MOTOPART_COLUMNAR_ENGINE=True):
+            actual = self.client.get(self.url, params)
+        self.assertEqual(actual.status_code, expected.status_code)
+        self.assertEqual(actual.content, expected.content)
+        return actual
+
+    def test_matches_the_orm_byte_for_byte(self):
+        for params in [
+            {},
+            {'page': 2, 'page_size': 5},
+            {'category': self.engine.pk, 'ordering': 'price'},
+            {'category': self.oil.pk, 'status': 'active', 'ordering': '-discounted_price'},
+            {'supplier': 'Motul', 'available': 'true', 'ordering': 'name'},
+            {'manufacture_year': 2023},
+            {'ordering': '-stock', 'fields': 'id,name', 'page_size': 3},
+            {'ordering': 'created_at', 'expand': 'category'},
+            {'category': self.empty.pk},
+            {'category': 99999},
+            {'category': 'abc'},
+            {'status': 'bogus'},
+            {'available': 'maybe'},
+            {'page': 99},
+            {'ordering': 'manufacture_year,price'},
+            {'ordering': 'nonexistent'},
+        ]:
+            with self.subTest(params=params):
+                self.compare(params)
+
+    @override_settings(MOTOPART_COLUMNAR_ENGINE=True)
+    def test_serves_pages_without_sorting_in_sql(self):
+        # One version lookup and one primary-key lookup for the page's rows
+        with self.assertNumQueries(2) as queries:
+            self.client.get(self.url, {'category': self.engine.pk, 'ordering': '-price'})
+        self.assertIn('WHERE "motopart_motopart"."id" IN', queries.captured_queries[-1]['sql'])
+
+    @override_settings(MOTOPART_COLUMNAR_ENGINE=True)
+    def test_never_serves_a_stale_snapshot(self):
+        # A write from another process: no signals here, only the shared version moves
+        Motopart.objects.filter(slug='part-1').update(price=1)
+        bump_catalog_version()
+        response = self.compare({'ordering': 'price', 'page_size': 1})
+        self.assertEqual(response.json()['results'][0]['slug'], 'part-1')
+        self.assertEqual(columnar_catalog.snapshot.version, get_catalog_version())
+
+    @override_settings(MOTOPART_COLUMNAR_ENGINE=True)
+    def test_falls_back_to_the_orm_while_rebuilding(self):
+        bump_catalog_version()
+        # Stand-in for a background rebuild that has not finished yet
+        with mock.patch.object(columnar_catalog, 'refresh') as refresh:
+            # Version lookup, then the ORM's COUNT and page query
+            with self.assertNumQueries(3):
+                response = self.client.get(self.url, {'page_size': 1})
+        refresh.assert_called_once_with(get_catalog_version())
+        self.assertEqual(response.status_code, 200)
+
+    def test_replica_without_build_fails_at_instantiation(self):
+        class Incomplete(CatalogReplica):
+            pass
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+
+class ColumnarLargeCatalogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.categories = [Category.objects.create(name=f'Category {i}', slug=f'category-{i}') for i in range(3)]
+        Motopart.objects.bulk_create([
+            Motopart(
+                name=f'Part {i:05d}', slug=f'part-{i}', price=(i * 7919) % 5000 + 1, stock=i % 4,
+                category=cls.categories[i % 3], manufacture_year=2020 + i % 5, supplier='Motul',
+            )
+            for i in range(5000)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('motopart-list-create')
+        columnar_catalog.rebuild()
+
+    def test_ranked_mask_pages_match_a_row_walk(self):
+        snapshot = columnar_catalog.snapshot
+        filters = {'category': self.categories[1].pk, 'available': True}
+        mask = snapshot.match(filters)
+        order = snapshot.orders['price']
+        expected = [rank for rank, position in enumerate(order) if mask >> position & 1]
+        ranked = snapshot.ranked(filters, mask, 'price')
+        self.assertEqual(ranked.total, len(expected))
+        for start, stop in [(0, 20), (500, 520), (len(expected) - 7, len(expected) + 13)]:
+            with self.subTest(start=start):
+                self.assertEqual(ranked.ranks(start, stop), expected[start:stop])
+        self.assertIs(snapshot.ranked(filters, mask, 'price'), ranked)
+
+    def test_deep_filtered_page_is_served_by_the_engine(self):
+        params = {'category': self.categories[2].pk, 'available': 'true', 'ordering': '-price', 'page': 60}
+        with override_settings(MOTOPART_COLUMNAR_ENGINE=False):
+            expected = self.client.get(self.url, params)
+        with override_settings(MOTOPART_COLUMNAR_ENGINE=True):
+            with mock.patch('motopart.columnar.RankedMask', wraps=RankedMask) as ranked_mask:
+                # One version lookup and one primary-key lookup: no COUNT, no OFFSET
+                with self.assertNumQueries(2) as queries:
+                    actual = self.client.get(self.url, params)
+        self.assertEqual(ranked_mask.call_count, 1)
+        self.assertIn('WHERE "motopart_motopart"."id" IN', queries.captured_queries[-1]['sql'])
+        self.assertEqual(len(actual.json()['results']), 20)
+        self.assertEqual(actual.content, expected.content)
+
+    @override_settings(MOTOPART_COLUMNAR_CACHE='default')
+    def test_workers_share_built_snapshots(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        bump_catalog_version()
+        version = get_catalog_version()
+        columnar_catalog.rebuild()
+        # Another worker loads the snapshot instead of scanning the table
+        with self.assertNumQueries(0):
+            ColumnarCatalog().build(version)
+
+
+class MotopartBulkUpdateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_user(
+            email='admin@example.com', username='admin', password='x', role='admin'
+        )
+        cls.category = Category.objects.create(name='Engine', slug='engine')
+        cls.parts = [
+            Motopart.objects.create(
+                name=f'Part {i}', slug=f'part-{i}', price=1000, stock=5,
+                category=cls.category, manufacture_year=2024, supplier='Honda Official',
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.url = reverse('motopart-bulk-update')
+
+    def patch(self, rows):
+        return self.client.patch(self.url, rows, format='json')
+
+    def test_rejects_anything_but_a_list(self):
+        response = self.patch({'id': 1, 'price': 1})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'message': 'Expected a list of updates'})
+
+    def test_reports_each_invalid_row_by_index(self):
+        first = self.parts[0]
+        response = self.patch([
+            'not an object',
+            {'id': first.pk, 'slug': first.slug, 'price': 1},
+            {'price': 1},
+            {'id': first.pk},
+            {'id': first.pk, 'name': 'Renamed'},
+            {'id': first.pk, 'price': -5, 'status': 'bogus'},
+            {'id': 999999, 'price': 1},
+            {'slug': 'no-such-part', 'stock': 1},
+        ])
+        self.assertEqual(response.status_code, 200)
+        summary = response.json()
+        self.assertEqual((summary['updated'], summary['failed']), (0, 8))
+        results = summary['results']
+        self.assertEqual([result['index'] for result in results], list(range(8)))
+        self.assertEqual([result['result'] for result in results], ['invalid'] * 6 + ['not_found'] * 2)
+        self.assertEqual(set(results[5]['errors']), {'price', 'status'})
+        self.assertEqual(results[7]['slug'], 'no-such-part')
+        first.refresh_from_db()
+        self.assertEqual((first.name, first.price), ('Part 0', 1000))
+
+    def test_writes_only_real_changes(self):
+        first, second, third = self.parts
+        version = get_catalog_version()
+        third_updated_at = Motopart.objects.get(pk=third.pk).updated_at
+        self.client.get(reverse('motopart-detail', args=[first.pk]))
+        response = self.patch([
+            {'id': first.pk, 'price': 1500},
+            {'slug': second.slug, 'discount': 10},
+            {'id': third.pk, 'price': 1000, 'stock': 5},
+            # Later rows for the same part win
+            {'slug': first.slug, 'price': 2000, 'stock': 0},
+        ])
+        summary = response.json()
+        self.assertEqual((summary['updated'], summary['unchanged'], summary['failed']), (2, 1, 0))
+        self.assertEqual(
+            [(result['id'], result['result']) for result in summary['results']],
+            [(first.pk, 'updated'), (second.pk, 'updated'), (third.pk, 'unchanged'), (first.pk, 'updated')],
+        )
+        first = Motopart.objects.get(pk=first.pk)
+        self.assertEqual((first.price, first.stock, first.is_available), (2000, 0, False))
+        self.assertEqual(Motopart.objects.get(pk=second.pk).discounted_price, 900)
+        self.assertEqual(Motopart.objects.get(pk=third.pk).updated_at, third_updated_at)
+        self.assertGreater(get_catalog_version(), version)
+        # The object cache dropped the row read before the update
+        detail = self.client.get(reverse('motopart-detail', args=[first.pk]))
+        self.assertEqual(detail.json()['price'], 2000)
+
+    def test_status_changes_move_category_counters(self):
+        response = self.patch([
+            {'id': self.parts[0].pk, 'status': 'inactive'},
+            {'id': self.parts[1].pk, 'status': 'out_of_stock'},
+        ])
+        self.assertEqual(response.json()['updated'], 2)
+        self.category.refresh_from_db()
+        self.assertEqual((self.category.active_motoparts_count, self.category.subtree_motoparts_count), (1, 1))
+
+    def test_nothing_changed_writes_nothing(self):
+        version = get_catalog_version()
+        with self.assertNumQueries(3):
+            # Only the locking read of the targets, inside the transaction's savepoint
+            response = self.patch([{'id': self.parts[0].pk, 'price': 1000}])
+        self.assertEqual(response.json()['unchanged'], 1)
+        self.assertEqual(get_catalog_version(), version)
+
+    def test_admin_only(self):
+        self.client.force_authenticate(None)
+        self.assertIn(self.patch([]).status_code, (401, 403))
+
+
+class RelatedMotopartTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email='buyer@example.com', username='buyer', password='x')
+        category = Category.objects.create(name='Engine', slug='engine')
+        cls.parts = [
+            Motopart.objects.create(
+                name=f'Part {i}', slug=f'part-{i}', price=100,
+                category=category, manufacture_year=2024, supplier='Honda Official',
+            )
+            for i in range(6)
+        ]
+
+    def order(self, *indexes, order=None, age=timedelta(hours=1)):
+        """Order the given parts (added to `order` when given), placed `age` ago"""
+        if order is None:
+            order = Order.objects.create(user=self.user, total_amount=Decimal('100'), shipping_address='Hanoi')
+        items = [
+            OrderItem.objects.create(order=order, motopart=self.parts[i], quantity=1, unit_price=Decimal('100'))
+            for i in indexes
+        ]
+        OrderItem.objects.filter(pk__in=[item.pk for item in items]).update(created_at=timezone.now() - age)
+        return order
+
+    def build(self, *args):
+        call_command('build_related_motoparts', *args, stdout=io.StringIO())
+
+    def tables(self):
+        return (
+            sorted(CoPurchaseCount.objects.values_list('motopart_id', 'other_id', 'orders')),
+            sorted(RelatedMotopart.objects.values_list('motopart_id', 'rank', 'related_id', 'score')),
+        )
+
+    def test_incremental_runs_match_a_rebuild(self):
+        first = self.order(0, 1, 2)
+        self.order(0, 1)
+        self.order(3)
+        self.build('--top-k', '3')
+        # New orders, and new items in an order that was already counted
+        self.order(1, 2, 4)
+        self.order(3, 5, order=first)
+        self.order(0, 1, 5, 4)
+        self.build('--top-k', '3')
+        incremental = self.tables()
+        self.build('--rebuild', '--top-k', '3')
+        self.assertEqual(self.tables(), incremental)
+
+        counts = {(a, b): n for a, b, n in incremental[0]}
+        ids = [part.pk for part in self.parts]
+        self.assertEqual(counts[(ids[0], ids[1])], 3)
+        self.assertEqual(counts[(ids[5], ids[2])], 1)
+        self.assertEqual(counts[(ids[2], ids[5])], 1)
+        self.assertNotIn((ids[3], ids[3]), counts)
+        # Three neighbours at most, best first, ties by id
+        self.assertEqual(
+            list(RelatedMotopart.objects.filter(motopart_id=ids[1]).values_list('related_id', 'score')),
+            [(ids[0], 3), (ids[2], 2), (ids[4], 2)],
+        )
+
+    def test_unsettled_items_wait_for_the_next_run(self):
+        self.order(0, 1)
+        self.order(2, 3, age=timedelta(0))
+        self.order(0, 4)
+        self.build()
+        self.assertEqual(
+            {(a, b) for a, b, _ in self.tables()[0]},
+            {(self.parts[0].pk, self.parts[1].pk), (self.parts[1].pk, self.parts[0].pk)},
+        )
+        OrderItem.objects.update(created_at=timezone.now() - timedelta(hours=1))
+        self.build()
+        self.assertEqual(len(self.tables()[0]), 6)
+
+    def test_endpoint_lists_active_neighbours_in_rank_order(self):
+        self.order(0, 1, 2)
+        self.order(0, 1)
+        self.build()
+        Motopart.objects.filter(pk=self.parts[1].pk).update(status='inactive')
+        response = APIClient().get(reverse('motopart-related', args=[self.parts[0].pk]))
+        self.assertEqual(
+            [(part['id'], part['co_purchases']) for part in response.json()['results']],
+            [(self.parts[2].pk, 1)],
+        )
+
+
+class MotopartPopularityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email='fan@example.com', username='fan', password='x')
+        category = Category.objects.create(name='Engine', slug='engine')
+        cls.parts = [
+            Motopart.objects.create(
+                name=f'Part {i}', slug=f'part-{i}', price=100,
+                category=category, manufacture_year=2024, supplier='Honda Official',
+            )
+            for i in range(3)
+        ]
+
+    def popularity(self):
+        return dict(Motopart.objects.values_list('pk', 'popularity'))
+
+    def sell(self, part, quantity, age=timedelta(hours=1)):
+        order = Order.objects.create(user=self.user, total_amount=Decimal('100'), shipping_address='Hanoi')
+        item = OrderItem.objects.create(order=order, motopart=part, quantity=quantity, unit_price=Decimal('100'))
+        OrderItem.objects.filter(pk=item.pk).update(created_at=timezone.now() - age)
+        return item
+
+    def record_sales(self):
+        out = io.StringIO()
+        call_command('record_motopart_sales', stdout=out)
+        return out.getvalue()
+
+    def test_flush_writes_views_and_popularity(self):
+        counter = ViewCounter()
+        for part in (self.parts[0], self.parts[0], self.parts[1]):
+            counter.record(part.pk)
+        self.assertEqual(counter.flush(), 2)
+        self.assertEqual(MotopartStats.objects.get(motopart=self.parts[0]).views, 2)
+        self.assertEqual(MotopartStats.objects.get(motopart=self.parts[1]).views, 1)
+        scores = self.popularity()
+        self.assertAlmostEqual(scores[self.parts[0].pk], 2 * scores[self.parts[1].pk])
+        self.assertEqual(scores[self.parts[2].pk], 0)
+
+    def test_failed_flush_keeps_its_counts(self):
+        counter = ViewCounter()
+        counter.record(self.parts[0].pk)
+        with mock.patch('motopart.popularity.add_popularity', side_effect=OverflowError):
+            self.assertEqual(counter.flush(), 0)
+        self.assertEqual(counter.flush(), 1)
+        self.assertEqual(MotopartStats.objects.get(motopart=self.parts[0]).views, 1)
+
+    def test_short_half_life_does_not_overflow(self):
+        # Under a fixed epoch, a long-running scale would need 2 ** 1000+ here
+        PopularityScale.objects.update(epoch=timezone.now() - timedelta(days=3650))
+        with self.settings(MOTOPART_POPULARITY_HALF_LIFE_DAYS=0.5):
+            counter = ViewCounter()
+            counter.record(self.parts[0].pk)
+            self.assertEqual(counter.flush(), 1)
+        self.assertLess(self.popularity()[self.parts[0].pk], 2 ** REBASE_HALF_LIVES)
+
+    def test_rebase_moves_the_epoch_and_keeps_the_order(self):
+        start = timezone.now() - timedelta(days=7 * (REBASE_HALF_LIVES + 1))
+        PopularityScale.objects.update(epoch=start, half_life_days=7)
+        Motopart.objects.filter(pk=self.parts[0].pk).update(popularity=8.0)
+        Motopart.objects.filter(pk=self.parts[1].pk).update(popularity=4.0)
+        counter = ViewCounter()
+        counter.record(self.parts[2].pk)
+        counter.flush()
+        scale = PopularityScale.objects.get()
+        self.assertGreater(scale.epoch, start)
+        scores = self.popularity()
+        # Rescaled by 2 ** -(REBASE_HALF_LIVES + 1); the fresh view weighs about 1
+        self.assertAlmostEqual(scores[self.parts[0].pk] / scores[self.parts[1].pk], 2)
+        self.assertAlmostEqual(scores[self.parts[0].pk], 8.0 / 2 ** (REBASE_HALF_LIVES + 1), places=3)
+        self.assertAlmostEqual(scores[self.parts[2].pk], 1, places=3)
+
+    def test_changed_half_life_rescales_the_stored_scores(self):
+        PopularityScale.objects.update(epoch=timezone.now() - timedelta(days=14), half_life_days=7)
+        Motopart.objects.filter(pk=self.parts[0].pk).update(popularity=8.0)
+        with self.settings(MOTOPART_POPULARITY_HALF_LIFE_DAYS=1):
+            counter = ViewCounter()
+            counter.record(self.parts[1].pk)
+            counter.flush()
+        self.assertEqual(PopularityScale.objects.get().half_life_days, 1)
+        scores = self.popularity()
+        # Two old half-lives decayed 8 to 2, on the same scale as the new view
+        self.assertAlmostEqual(scores[self.parts[0].pk], 2, places=3)
+        self.assertAlmostEqual(scores[self.parts[1].pk], 1, places=3)
+
+    @override_settings(MOTOPART_POPULARITY_SALE_WEIGHT=20)
+    def test_record_sales_counts_settled_units_once(self):
+        self.sell(self.parts[0], 3)
+        second = self.sell(self.parts[1], 1)
+        fresh = self.sell(self.parts[2], 5, age=timedelta(0))
+        self.assertIn('units=4 parts=2', self.record_sales())
+        self.assertEqual(MotopartSalesWatermark.objects.get().last_order_item_id, second.pk)
+        self.assertEqual(MotopartStats.objects.get(motopart=self.parts[0]).sales, 3)
+        self.assertFalse(MotopartStats.objects.filter(motopart=self.parts[2]).exists())
+        # Nothing new: the counted items are not added again
+        self.assertIn('units=0 parts=0', self.record_sales())
+        self.assertEqual(MotopartStats.objects.get(motopart=self.parts[0]).sales, 3)
+
+        OrderItem.objects.filter(pk=fresh.pk).update(created_at=timezone.now() - timedelta(hours=1))
+        self.assertIn('units=5 parts=1', self.record_sales())
+        scores = self.popularity()
+        self.assertAlmostEqual(scores[self.parts[0].pk] / scores[self.parts[1].pk], 3, places=5)
+        response = APIClient().get(reverse('motopart-list-create'), {'ordering': '-popularity'})
+        self.assertEqual(
+            [part['id'] for part in response.json()['results']],
+            [self.parts[2].pk, self.parts[0].pk, self.parts[1].pk],
+        )
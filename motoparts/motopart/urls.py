@@ -3,5 +3,14 @@ from . import views
 
 urlpatterns = [
     path('', views.MotopartListView.as_view(), name='motopart-list-create'),
+    path('facets/', views.MotopartFacetsView.as_view(), name='motopart-facets'),
+    path('suggest/', views.suggest_motoparts, name='motopart-suggest'),
+    path('bulk-upsert/', views.MotopartBulkUpsertView.as_view(), name='motopart-bulk-upsert'),
+    path('bulk-update/', views.MotopartBulkUpdateView.as_view(), name='motopart-bulk-update'),
+    path('changes/', views.MotopartChangesView.as_view(), name='motopart-changes'),
+    path('batch/', views.MotopartBatchView.as_view(), name='motopart-batch'),
     path('<int:pk>/', views.MotopartDetailView.as_view(), name='motopart-detail'),
+    path('<int:pk>/related/', views.MotopartRelatedView.as_view(), name='motopart-related'),
+    # Prefixed: a bare <slug> would lose to <int:pk> and the fixed paths above
+    path('by-slug/<slug:slug>/', views.MotopartDetailView.as_view(), name='motopart-detail-slug'),
 ]
\ No newline at end of file
@@ -1,22 +1,64 @@
 from django.shortcuts import render
-from .models import Motopart
-from rest_framework import generics, filters
+from django.core.cache import cache
+from django.db.models import Count, Q
+from .models import Motopart, RelatedMotopart
+from django.http import Http404
+from rest_framework import generics, filters, permissions, status
+from rest_framework.views import APIView
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from .cache import catalog_cache_key
+from .columnar import columnar_catalog, columnar_enabled
+from .changes import ChangeFeed, CursorExpired, decode_change_cursor, encode_change_cursor
+from .suggest import suggest_index
+from .object_cache import motopart_cache
+from .popularity import view_counter
+from .bulk import MotopartBulkUpdater, MotopartUpserter, iter_csv_rows, iter_ndjson_rows
+from motoparts.serializers import requested_expansions, sparse_queryset
 from .serializers import MotopartSerializer
-from .pagination import MotopartPagination
+from .pagination import MotopartPagination, MotopartCursorPagination
+from .filters import MotopartFilter, MotopartSearchFilter, MotopartOrderingFilter
 from user.permissions import IsAdminUser
 from django_filters.rest_framework import DjangoFilterBackend
 
+def catalog_queryset(queryset, serializer_class, request):
+    """Join the category only when it is expanded and select only the requested columns"""
+    if 'category' in requested_expansions(request):
+        queryset = queryset.select_related('category')
+    return sparse_queryset(queryset, serializer_class, request)
+
 class MotopartListView(generics.ListCreateAPIView):
-    queryset = Motopart.objects.all()
+    queryset = Motopart.objects.defer('search_document')
     serializer_class = MotopartSerializer
     pagination_class = MotopartPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['category', 'status', 'manufacture_year', 'supplier']
+    filter_backends = [DjangoFilterBackend, MotopartSearchFilter, MotopartOrderingFilter]
+    filterset_class = MotopartFilter
     search_fields = ['name', 'description', 'supplier']
-    ordering_fields = ['name', 'price', 'discounted_price', 'stock', 'manufacture_year', 'created_at']
+    ordering_fields = ['name', 'price', 'discounted_price', 'stock', 'manufacture_year', 'created_at', 'popularity']
     ordering = ['-created_at']  # Default ordering
 
+    @property
+    def paginator(self):
+        """Switch to keyset pagination when the client asks for cursors"""
+        if not hasattr(self, '_paginator') and MotopartCursorPagination.is_requested(self.request):
+            self._paginator = MotopartCursorPagination()
+        return super().paginator
+
+    def get_queryset(self):
+        return catalog_queryset(super().get_queryset(), self.get_serializer_class(), self.request)
+
+    def list(self, request, *args, **kwargs):
+        """Serve plain filter/sort/page requests from the columnar engine when it is enabled"""
+        result = None
+        if columnar_enabled() and not MotopartCursorPagination.is_requested(request):
+            result = columnar_catalog.query(request.query_params, self.get_queryset(), self.ordering[0])
+        if result is None:
+            return super().list(request, *args, **kwargs)
+        page = self.paginate_queryset(result)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     def get_permissions(self):
         """
         GET: public (AllowAny)
@@ -29,9 +71,34 @@ class MotopartListView(generics.ListCreateAPIView):
         return [permission() for permission in permission_classes]
 
 class MotopartDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Motopart.objects.all()
+    queryset = Motopart.objects.defer('search_document')
     serializer_class = MotopartSerializer
-    lookup_field = 'pk'  # Can use 'slug' if you prefer slug-based lookups
+    lookup_field = 'pk'  # Routed as /motoparts/<pk>/ and /motoparts/by-slug/<slug>/
+
+    def get_queryset(self):
+        return catalog_queryset(super().get_queryset(), self.get_serializer_class(), self.request)
+
+    def get_object(self):
+        """Reads go through the object cache; writes load a fresh row"""
+        if 'slug' in self.kwargs:
+            self.lookup_field = 'slug'
+        if self.request.method not in permissions.SAFE_METHODS:
+            return super().get_object()
+        expand = 'category' in requested_expansions(self.request)
+        if 'slug' in self.kwargs:
+            obj = motopart_cache.get_by_slug(self.kwargs['slug'], select_related=expand)
+        else:
+            obj = motopart_cache.get(self.kwargs['pk'], select_related=expand)
+        if obj is None:
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    def retrieve(self, request, *args, **kwargs):
+        """Count the view in the process-local buffer; it reaches the database in batches"""
+        instance = self.get_object()
+        view_counter.record(instance.pk)
+        return Response(self.get_serializer(instance).data)
 
     def get_permissions(self):
         """
@@ -44,4 +111,255 @@ class MotopartDetailView(generics.RetrieveUpdateDestroyAPIView):
             permission_classes = [AllowAny]
         return [permission() for permission in permission_classes]
 
+class MotopartFacetsView(generics.GenericAPIView):
+    """
+    Facet counts for the catalog sidebar.
+
+    Accepts the same filter and `?search=` parameters as MotopartListView and
+    returns every facet from a handful of GROUP BY queries, cached per
+    normalized filter set until the next catalog write.
+    """
+    queryset = Motopart.objects.all()
+    permission_classes = [AllowAny]
+    filter_backends = [DjangoFilterBackend, MotopartSearchFilter]
+    filterset_class = MotopartFilter
+    facet_fields = ['supplier', 'manufacture_year', 'status']
+    # Upper bounds (VND) of the discounted price buckets; the last bucket is open
+    price_buckets = [100000, 200000, 500000, 1000000, 2000000]
+    ignored_params = ['page', 'page_size', 'ordering', 'cursor', 'pagination', 'count']
+    cache_timeout = 300
+
+    def get(self, request, *args, **kwargs):
+        key = catalog_cache_key('facets', request.query_params, self.ignored_params)
+        data = cache.get(key)
+        if data is None:
+            data = self.get_facets(self.filter_queryset(self.get_queryset()).order_by())
+            cache.set(key, data, self.cache_timeout)
+        return Response(data)
+
+    def get_facets(self, queryset):
+        facets = {
+            'category': [
+                {'value': row['category'], 'label': row['category__name'], 'count': row['count']}
+                for row in queryset.values('category', 'category__name')
+                .annotate(count=Count('pk')).order_by('-count', 'category__name')
+            ]
+        }
+        for field in self.facet_fields:
+            facets[field] = [
+                {'value': row[field], 'count': row['count']}
+                for row in queryset.values(field).annotate(count=Count('pk')).order_by('-count', field)
+            ]
+        facets['price'] = self.get_price_facet(queryset)
+        return {'count': sum(bucket['count'] for bucket in facets['price']), 'facets': facets}
+
+    def get_price_facet(self, queryset):
+        bounds = [None] + self.price_buckets + [None]
+        ranges = list(zip(bounds, bounds[1:]))
+        aggregates = {}
+        for index, (low, high) in enumerate(ranges):
+            condition = Q()
+            if low is not None:
+                condition &= Q(discounted_price__gte=low)
+            if high is not None:
+                condition &= Q(discounted_price__lt=high)
+            aggregates[f'bucket_{index}'] = Count('pk', filter=condition)
+        counts = queryset.aggregate(**aggregates)
+        return [
+            {'min': low, 'max': high, 'count': counts[f'bucket_{index}']}
+            for index, (low, high) in enumerate(ranges)
+        ]
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def suggest_motoparts(request):
+    """Typeahead for the search box, served from the in-process prefix index"""
+    query = request.query_params.get('q', '')
+    try:
+        limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+    except ValueError:
+        limit = 10
+    return Response({
+        'query': query,
+        'results': suggest_index.suggest(query, limit)
+    })
+
+class MotopartBulkUpsertView(APIView):
+    """
+    Admin bulk import keyed by slug.
+
+    The request body is streamed line by line (NDJSON by default, CSV with a
+    header row when Content-Type is text/csv), so memory stays bounded by the
+    batch size rather than the upload size. `?batch_size=` tunes the chunk
+    committed per transaction.
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request, *args, **kwargs):
+        try:
+            batch_size = int(request.query_params.get('batch_size', 0)) or None
+        except ValueError:
+            batch_size = None
+        # Iterate the raw WSGI input instead of request.data so the body is never buffered
+        lines = iter(request._request)
+        if request.content_type.startswith('text/csv'):
+            rows = iter_csv_rows(lines)
+        else:
+            rows = iter_ndjson_rows(lines)
+        summary = MotopartUpserter(batch_size=batch_size).process(rows)
+        return Response(summary, status=status.HTTP_200_OK)
+
+class MotopartBulkUpdateView(APIView):
+    """
+    Admin bulk price/stock/status update:
+    `PATCH /motoparts/bulk-update/` with a JSON list of
+    `{"id": 1, "price": 120000}` or `{"slug": "...", "stock": 0, "status": "out_of_stock"}`.
+
+    All rows are applied in one transaction with a handful of UPDATE
+    statements; the response lists the outcome of each row by its index.
+    """
+    permission_classes = [IsAdminUser]
+    max_rows = 10000
+
+    def patch(self, request, *args, **kwargs):
+        rows = request.data
+        if not isinstance(rows, list):
+            return Response({'message': 'Expected a list of updates'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > self.max_rows:
+            return Response({
+                'message': f'At most {self.max_rows} updates per request'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return Response(MotopartBulkUpdater().apply(rows), status=status.HTTP_200_OK)
+
+class MotopartBatchView(generics.GenericAPIView):
+    """
+    Fetch many parts by id in one call: `GET /motoparts/batch/?ids=3,1,2`.
+
+    One `id IN (...)` query, joined with category under `?expand=category`;
+    results keep the order of the requested ids and unknown ids are listed
+    under `missing`.
+    """
+    queryset = Motopart.objects.defer('search_document')
+    serializer_class = MotopartSerializer
+    permission_classes = [AllowAny]
+    max_ids = 200
+
+    def get_queryset(self):
+        return catalog_queryset(super().get_queryset(), self.get_serializer_class(), self.request)
+
+    def get(self, request, *args, **kwargs):
+        raw_ids = [value for value in request.query_params.get('ids', '').split(',') if value.strip()]
+        try:
+            ids = list(dict.fromkeys(int(value) for value in raw_ids))
+        except ValueError:
+            return Response({
+                'message': 'ids must be a comma-separated list of integers'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if not ids:
+            return Response({'message': 'ids is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > self.max_ids:
+            return Response({
+                'message': f'At most {self.max_ids} ids per request'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        found = self.get_queryset().in_bulk(ids)
+        parts = [found[pk] for pk in ids if pk in found]
+        return Response({
+            'results': self.get_serializer(parts, many=True).data,
+            'missing': [pk for pk in ids if pk not in found]
+        })
+
+class MotopartChangesView(generics.GenericAPIView):
+    """
+    Change feed for clients that mirror the catalog:
+    `GET /motoparts/changes/?since=<cursor>&limit=200`.
+
+    Returns parts created or updated and tombstones for parts deleted after
+    the cursor, in (changed_at, id) order. Start without `since` for a full
+    sync, then pass back `next_cursor`; keep polling while `has_more` is true.
+    A cursor issued longer ago than the tombstone retention window gets 410
+    and the client has to start over.
+    """
+    queryset = Motopart.objects.defer('search_document')
+    serializer_class = MotopartSerializer
+    permission_classes = [AllowAny]
+    default_limit = 200
+    max_limit = 1000
+
+    def get_queryset(self):
+        queryset = catalog_queryset(super().get_queryset(), self.get_serializer_class(), self.request)
+        loaded, deferring = queryset.query.deferred_loading
+        if loaded and not deferring:
+            # The feed orders and builds cursors on updated_at
+            queryset = queryset.only(*loaded, 'updated_at')
+        return queryset
+
+    def get(self, request, *args, **kwargs):
+        since = request.query_params.get('since')
+        try:
+            since = decode_change_cursor(since) if since else None
+        except ValueError:
+            return Response({'message': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', self.default_limit)), 1), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+
+        try:
+            entries, has_more = ChangeFeed(since, limit).fetch(self.get_queryset())
+        except CursorExpired:
+            return Response({
+                'message': 'Cursor is too old, sync again without since'
+            }, status=status.HTTP_410_GONE)
+
+        parts = [obj for _, _, op, obj in entries if op == 'upsert']
+        data = iter(self.get_serializer(parts, many=True).data)
+        results = []
+        for changed_at, pk, op, obj in entries:
+            change = {'op': op, 'id': pk, 'changed_at': changed_at}
+            if op == 'upsert':
+                change['data'] = next(data)
+            else:
+                change['slug'] = obj.slug
+            results.append(change)
+
+        next_cursor = None
+        if entries:
+            next_cursor = encode_change_cursor(entries[-1][0], entries[-1][1])
+        elif since is not None:
+            # Nothing new: same position, fresh issue time
+            next_cursor = encode_change_cursor(since[0], since[1])
+        return Response({
+            'results': results,
+            'next_cursor': next_cursor,
+            'has_more': has_more
+        })
+
 # Create your views here.
+
+class MotopartRelatedView(generics.GenericAPIView):
+    """
+    "Frequently bought together": `GET /motoparts/<id>/related/?limit=10`.
+
+    Reads the precomputed top-K table built by `manage.py
+    build_related_motoparts`, joined with the related parts; inactive parts
+    are skipped. `co_purchases` is the number of orders with both parts.
+    """
+    queryset = RelatedMotopart.objects.select_related('related')
+    serializer_class = MotopartSerializer
+    permission_classes = [AllowAny]
+
+    def get(self, request, pk, *args, **kwargs):
+        try:
+            limit = max(int(request.query_params.get('limit', 0)), 0) or None
+        except ValueError:
+            limit = None
+        links = self.get_queryset().filter(motopart_id=pk, related__status='active').order_by('rank')[:limit]
+        links = list(links)
+        data = self.get_serializer([link.related for link in links], many=True).data
+        return Response({
+            'results': [
+                {**part, 'co_purchases': link.score} for link, part in zip(links, data)
+            ]
+        })
@@ -0,0 +1,145 @@
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import CASCADE, DO_NOTHING, SET_NULL
+from django.db.models.deletion import get_candidate_relations_to_delete
+from django.dispatch import Signal
+from django.utils import timezone
+
+# Sent with sender=<model> and pks=[...] inside each batch's transaction,
+# right before its raw DELETE. Raw deletes skip model signals, so receivers
+# read what they need here and defer work that must see the rows gone to
+# transaction.on_commit.
+pre_chunk_delete = Signal()
+
+PROGRESS_TIMEOUT = 24 * 60 * 60
+
+
+def chunked_delete_batch_size():
+    return getattr(settings, 'CHUNKED_DELETE_BATCH_SIZE', 500)
+
+
+def chunked_delete_stale_seconds():
+    return getattr(settings, 'CHUNKED_DELETE_STALE_SECONDS', 300)
+
+
+class ChunkedDelete:
+    """
+    Delete rows and everything that cascades from them in fixed-size
+    batches of raw `DELETE ... WHERE id IN (...)`.
+
+    Related rows go first, one batch of parent ids at a time, so memory
+    holds a batch of ids per level of the relation tree instead of the
+    whole collected graph. Every batch commits on its own; an interrupted
+    run leaves the remaining rows untouched and can simply be run again.
+    `progress`, if given, is called with the running per-model totals
+    after each batch.
+    """
+
+    def __init__(self, batch_size=None, progress=None):
+        self.batch_size = batch_size or chunked_delete_batch_size()
+        self.progress = progress
+        self.deleted = Counter()
+
+    def delete(self, queryset):
+        """Delete queryset and its cascade; returns {model label: rows deleted}"""
+        model = queryset.model
+        pks = queryset.order_by().values_list('pk', flat=True)
+        while True:
+            batch = list(pks[:self.batch_size])
+            if not batch:
+                break
+            self.delete_batch(model, batch)
+        return dict(self.deleted)
+
+    def delete_batch(self, model, pks):
+        for related in get_candidate_relations_to_delete(model._meta):
+            field = related.field
+            on_delete = field.remote_field.on_delete
+            children = related.related_model._base_manager.filter(**{f'{field.name}__in': pks})
+            if on_delete is CASCADE:
+                self.delete(children)
+            elif on_delete is SET_NULL:
+                children.update(**{field.name: None})
+            elif on_delete is not DO_NOTHING:
+                raise ValueError(
+                    f'{related.related_model._meta.label}.{field.name} uses {on_delete.__name__}; '
+                    f'delete {model._meta.label} with Model.delete() instead'
+                )
+        db = connections[DEFAULT_DB_ALIAS]
+        quote = db.ops.quote_name
+        placeholders = ', '.join(['%s'] * len(pks))
+        with transaction.atomic():
+            pre_chunk_delete.send(sender=model, pks=pks)
+            with db.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {quote(model._meta.db_table)} '
+                    f'WHERE {quote(model._meta.pk.column)} IN ({placeholders})',
+                    pks,
+                )
+                self.deleted[model._meta.label] += cursor.rowcount
+        if self.progress:
+            self.progress(dict(self.deleted))
+
+
+def deletion_progress(key):
+    """
+    {'status': 'running'|'done'|'failed', 'deleted': {...}, 'heartbeat': ...}
+    of a background deletion, or None
+    """
+    return cache.get(f'deletion:{key}')
+
+
+def is_stale(progress):
+    """A 'running' entry whose worker has not reported for CHUNKED_DELETE_STALE_SECONDS died with it"""
+    heartbeat = progress.get('heartbeat')
+    return heartbeat is None or (timezone.now() - heartbeat).total_seconds() > chunked_delete_stale_seconds()
+
+
+def start_background_delete(key, queryset, batch_size=None):
+    """
+    Run ChunkedDelete(queryset) in a daemon thread once the current
+    transaction commits, recording progress under `key` (see
+    deletion_progress). Returns False when a deletion for key is already
+    running. With CHUNKED_DELETE_IN_BACKGROUND = False it runs inline.
+
+    Every progress report refreshes a heartbeat; a 'running' entry without
+    one for CHUNKED_DELETE_STALE_SECONDS belongs to a worker that died (or a
+    transaction that rolled back before the thread started), so it is
+    started again. The deletion is idempotent, so a slow worker that was
+    taken over only finds fewer rows.
+    """
+    progress_key = f'deletion:{key}'
+    background = getattr(settings, 'CHUNKED_DELETE_IN_BACKGROUND', True)
+    current = cache.get(progress_key)
+    if current is not None and current['status'] == 'running' and not is_stale(current):
+        return False
+
+    def report(deleted, status='running', **extra):
+        cache.set(
+            progress_key,
+            {'status': status, 'deleted': deleted, 'heartbeat': timezone.now(), **extra},
+            PROGRESS_TIMEOUT,
+        )
+
+    report({})
+
+    def run():
+        deleter = ChunkedDelete(batch_size, progress=report)
+        try:
+            report(deleter.delete(queryset), status='done')
+        except Exception as exc:
+            report(dict(deleter.deleted), status='failed', error=str(exc))
+            raise
+        finally:
+            if background:
+                connections.close_all()
+
+    if background:
+        transaction.on_commit(lambda: threading.Thread(target=run, name=f'delete-{key}', daemon=True).start())
+    else:
+        run()
+    return True
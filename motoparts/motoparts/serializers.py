@@ -0,0 +1,83 @@
+from rest_framework import permissions, serializers
+
+
+def requested_fields(request):
+    """Field names from `?fields=a,b`, or None when the client wants everything"""
+    if request is None or request.method not in permissions.SAFE_METHODS:
+        return None
+    raw = request.query_params.get('fields')
+    if not raw:
+        return None
+    return {name.strip() for name in raw.split(',') if name.strip()}
+
+
+def requested_expansions(request):
+    """Nested objects asked for with `?expand=a,b`"""
+    if request is None:
+        return set()
+    raw = request.query_params.get('expand', '')
+    return {name.strip() for name in raw.split(',') if name.strip()}
+
+
+class DynamicFieldsMixin:
+    """
+    Sparse fieldsets and opt-in expansion for top-level responses.
+
+    `?fields=` keeps only the listed fields. Fields named in
+    `expandable_fields` are dropped unless they appear in `?expand=`. The
+    filtering only applies to the serializer the view renders directly, on
+    safe methods; a serializer nested inside another one keeps its full
+    shape.
+    """
+    expandable_fields = []
+
+    def _is_root(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or request.method not in permissions.SAFE_METHODS or not self._is_root():
+            return fields
+
+        expand = requested_expansions(request)
+        for name in self.expandable_fields:
+            if name not in expand:
+                fields.pop(name, None)
+
+        wanted = requested_fields(request)
+        if wanted is not None:
+            for name in list(fields):
+                if name not in wanted and name not in expand:
+                    fields.pop(name)
+        return fields
+
+
+def sparse_queryset(queryset, serializer_class, request):
+    """
+    Restrict the SELECT to the model columns behind the requested fields.
+
+    Only applied when every requested field maps to a concrete column;
+    method fields, nested serializers and dotted sources leave the
+    queryset untouched.
+    """
+    wanted = requested_fields(request)
+    if wanted is None:
+        return queryset
+    model = queryset.model
+    concrete = {field.name: field for field in model._meta.concrete_fields}
+    concrete.update({field.attname: field for field in model._meta.concrete_fields})
+    declared = serializer_class().fields
+    columns = {model._meta.pk.name}
+    for name in wanted | requested_expansions(request):
+        field = declared.get(name)
+        if field is None:
+            continue
+        source = field.source or name
+        if source not in concrete:
+            return queryset
+        columns.add(concrete[source].name)
+    return queryset.only(*columns)
@@ -184,3 +184,54 @@ CORS_ALLOW_HEADERS = [
     'x-csrftoken',
     'x-requested-with',
 ]
+
+# Precompressed catalog snapshots (manage.py build_catalog_snapshots); serve the
+# files directly, e.g. with nginx gzip_static for the .gz siblings
+CATALOG_SNAPSHOT_ROOT = BASE_DIR / 'snapshots'
+CATALOG_SNAPSHOT_PAGES = 5
+CATALOG_SNAPSHOT_BASE_URL = 'http://localhost:8000'
+# Re-render affected snapshots after every committed catalog write; each write
+# costs up to CATALOG_SNAPSHOT_PAGES page renders per affected listing
+CATALOG_SNAPSHOT_AUTO = False
+# Render those refreshes on a background thread; False renders inside the
+# writing request's commit callback
+CATALOG_SNAPSHOT_IN_BACKGROUND = True
+
+# Deletions stay visible to the change feed (/motoparts/changes/) this long
+MOTOPART_TOMBSTONE_RETENTION_DAYS = 30
+
+# In-process catalog indexes (typeahead, fuzzy search, columnar engine) check
+# the shared catalog version this often and rebuild in a background thread;
+# False rebuilds inline on the request that notices the change
+MOTOPART_CATALOG_POLL_SECONDS = 2
+MOTOPART_REPLICA_REBUILD_IN_BACKGROUND = True
+
+# Answer simple catalog list requests from an in-process column snapshot
+MOTOPART_COLUMNAR_ENGINE = False
+# Cache alias workers share built snapshots through (a few MB per version, so
+# a backend without memcached's 1MB item limit); None builds one per process
+MOTOPART_COLUMNAR_CACHE = None
+
+# Cache alias for single Motopart rows (motopart.object_cache); Django's
+# default is per-process local memory, point it at a shared backend to share
+MOTOPART_OBJECT_CACHE = 'default'
+
+# "Frequently bought together" neighbours kept per part (manage.py build_related_motoparts)
+RELATED_MOTOPARTS_TOP_K = 10
+
+# ?ordering=popularity: detail views are buffered per process and flushed this often
+MOTOPART_VIEW_FLUSH_SECONDS = 30
+# Views and sales lose half their weight after this many days. Changing it
+# rescales the stored scores on the next flush; older events keep the decay
+# they had under the previous value
+MOTOPART_POPULARITY_HALF_LIFE_DAYS = 7
+# One unit sold weighs as much as this many views
+MOTOPART_POPULARITY_SALE_WEIGHT = 20
+
+# Category deletes (and manage.py delete_users) remove rows in batches of this size
+CHUNKED_DELETE_BATCH_SIZE = 500
+# Run DELETE /categories/<pk>/ in a background thread; False runs it inside the request
+CHUNKED_DELETE_IN_BACKGROUND = True
+# A running background delete that has not reported progress for this long is
+# taken to be dead, and the next DELETE starts it again
+CHUNKED_DELETE_STALE_SECONDS = 300
@@ -0,0 +1,45 @@
+import re
+import unittest
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+# EXPLAIN QUERY PLAN steps that visit every row of a table: a bare "SCAN t",
+# or "SCAN t USING INDEX i" walking a whole index. The latter is how an
+# unfiltered ORDER BY ... LIMIT or COUNT(*) should run, so it only counts
+# when the statement filters. Virtual tables ("SCAN t VIRTUAL TABLE") never match.
+_TABLE_SCAN_RE = re.compile(r'^SCAN \w+$')
+_INDEX_SCAN_RE = re.compile(r'^SCAN \w+ USING (COVERING )?INDEX \w+$')
+
+
+def full_scans(sql, plan):
+    """Plan steps that read a whole table or index"""
+    filtered = ' WHERE ' in sql
+    return [
+        step for step in plan
+        if _TABLE_SCAN_RE.match(step) or (filtered and _INDEX_SCAN_RE.match(step))
+    ]
+
+
+def explain_query_plan(sql):
+    """Detail column of SQLite's EXPLAIN QUERY PLAN for an already-interpolated statement"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'query plans are checked on SQLite')
+class QueryPlanTestMixin:
+    """Fail a test when a request's SELECTs fall back to full table scans"""
+
+    def assertNoFullScans(self, func, *args, **kwargs):
+        with CaptureQueriesContext(connection) as context:
+            result = func(*args, **kwargs)
+        selects = [query['sql'] for query in context.captured_queries if query['sql'].startswith('SELECT')]
+        self.assertTrue(selects, 'no SELECT was captured')
+        for sql in selects:
+            scans = full_scans(sql, explain_query_plan(sql))
+            if scans:
+                self.fail(f'{", ".join(scans)} in query plan of:\n{sql}')
+        return result
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('motopart', '0005_query_indexes'),
+        ('orderitem', '0001_initial'),
+        ('orders', '0002_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['order', '-created_at'], name='orderitem_o_order_i_19828e_idx'),
+        ),
+    ]
@@ -20,6 +20,9 @@ class OrderItem(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ['order', 'motopart']  # One motopart per order
+        indexes = [
+            models.Index(fields=['order', '-created_at']),
+        ]
         
     def __str__(self):
         return f"{self.quantity}x {self.motopart.name} in Order {self.order.id}"
@@ -12,7 +12,7 @@ from .serializers import (
     OrderItemListSerializer
 )
 from orders.models import Order
-from motopart.models import Motopart
+from motopart.object_cache import motopart_cache
 
 class OrderItemListView(generics.ListCreateAPIView):
     """Get all order items or create a new order item"""
@@ -78,9 +78,8 @@ def add_item_to_order(request, order_id):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
-            motopart = Motopart.objects.get(id=motopart_id)
-        except Motopart.DoesNotExist:
+        motopart = motopart_cache.get(motopart_id)
+        if motopart is None:
             return Response(
                 {'error': 'Motopart not found'}, 
                 status=status.HTTP_404_NOT_FOUND
@@ -24,6 +24,11 @@ class Order(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['-created_at']),
+        ]
         
     def __str__(self):
         return f"Order {self.id} - {self.user.email} - {self.total_amount}"
\ No newline at end of file
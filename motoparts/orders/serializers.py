@@ -2,6 +2,7 @@ from rest_framework import serializers
 from .models import Order
 from user.serializers import UserReadSerializer
 from motopart.serializers import MotopartSerializer
+from motoparts.serializers import DynamicFieldsMixin
 
 
 class OrderItemDetailSerializer(serializers.Serializer):
@@ -99,7 +100,7 @@ class OrderStatusUpdateSerializer(serializers.Serializer):
         return instance
 
 
-class OrderListSerializer(serializers.ModelSerializer):
+class OrderListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     user = UserReadSerializer(read_only=True)
     total_price = serializers.DecimalField(max_digits=10, decimal_places=2, source='total_amount', read_only=True)
     payment_method = serializers.SerializerMethodField()
@@ -1,3 +1,54 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from category.models import Category
+from motopart.models import Motopart
+from orderitem.models import OrderItem
+from motoparts.testing import QueryPlanTestMixin
+from .models import Order
+
+
+class OrderQueryPlanTests(QueryPlanTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create_user(email='buyer@example.com', username='buyer', password='x')
+        cls.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='x', role='admin'
+        )
+        category = Category.objects.create(name='Engine', slug='engine')
+        part = Motopart.objects.create(
+            name='Piston', slug='piston', price=100, stock=5,
+            category=category, manufacture_year=2024, supplier='Honda Official',
+        )
+        for status in ('pending', 'confirmed', 'delivered'):
+            cls.order = Order.objects.create(
+                user=cls.user, status=status, total_amount=Decimal('100.00'), shipping_address='Hanoi'
+            )
+            OrderItem.objects.create(order=cls.order, motopart=part, quantity=1, unit_price=Decimal('100.00'))
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_user_order_list_uses_indexes(self):
+        self.client.force_authenticate(self.user)
+        response = self.assertNoFullScans(self.client.get, reverse('order-list-create'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNoFullScans(self.client.get, reverse('order-user-list'))
+
+    def test_admin_order_list_uses_indexes(self):
+        self.client.force_authenticate(self.admin)
+        url = reverse('order-admin-list')
+        response = self.assertNoFullScans(self.client.get, url)
+        self.assertEqual(response.json()['pagination']['count'], 3)
+        response = self.assertNoFullScans(self.client.get, url, {'status': 'pending'})
+        self.assertEqual(response.json()['pagination']['count'], 1)
 
-# Create your tests here.
+    def test_order_items_use_indexes(self):
+        self.client.force_authenticate(self.user)
+        url = reverse('order-items-by-order', args=[self.order.pk])
+        response = self.assertNoFullScans(self.client.get, url)
+        self.assertEqual(response.status_code, 200)
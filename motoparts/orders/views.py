@@ -16,6 +16,7 @@ from .serializers import (
 )
 from .filters import OrderFilter
 from user.permissions import IsAdminUser
+from motoparts.serializers import sparse_queryset
 
 
 class OrderListCreateView(generics.ListCreateAPIView):
@@ -93,7 +94,7 @@ class OrderListAdminView(generics.ListAPIView):
         if status_list:
             queryset = queryset.filter(status__in=status_list)
 
-        return queryset
+        return sparse_queryset(queryset, self.get_serializer_class(), self.request)
 
 
 @api_view(['GET'])
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from motoparts.deletion import ChunkedDelete
+from user.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete users with their carts, orders and transactions in fixed-size batches '
+        'instead of loading the whole cascade into memory'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='+', type=int, help='CustomUser ids')
+        parser.add_argument('--batch-size', type=int)
+
+    def handle(self, *args, **options):
+        users = CustomUser.objects.filter(pk__in=options['ids'])
+        if not users.exists():
+            raise CommandError('No matching users')
+
+        def report(deleted):
+            self.stdout.write(' '.join(f'{label}={count}' for label, count in sorted(deleted.items())))
+
+        deleted = ChunkedDelete(options['batch_size'], progress=report).delete(users)
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted.get(CustomUser._meta.label, 0)} users ({sum(deleted.values())} rows)"
+        ))
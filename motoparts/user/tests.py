@@ -1,3 +1,57 @@
+import io
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import TestCase
+from carts.models import Cart
+from cartitem.models import CartItem
+from category.models import Category
+from motopart.models import Motopart
+from orderitem.models import OrderItem
+from orders.models import Order
+from transactions.models import Transaction
+from .models import CustomUser
+
+
+class DeleteUsersCommandTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Engine', slug='engine')
+        cls.parts = [
+            Motopart.objects.create(
+                name=f'Part {i}', slug=f'part-{i}', price=100,
+                category=category, manufacture_year=2024, supplier='Honda Official',
+            )
+            for i in range(2)
+        ]
+        cls.users = [
+            CustomUser.objects.create_user(email=f'user{i}@example.com', username=f'user{i}', password='x')
+            for i in range(2)
+        ]
+        for i, user in enumerate(cls.users):
+            cart = Cart.objects.create(user=user)
+            order = Order.objects.create(user=user, total_amount=Decimal('200'), shipping_address='Hanoi')
+            for part in cls.parts:
+                CartItem.objects.create(cart=cart, motopart=part, quantity=1)
+                OrderItem.objects.create(order=order, motopart=part, quantity=1, unit_price=Decimal('100'))
+            Transaction.objects.create(
+                user=user, order=order, transaction_id=f'tx-{i}',
+                amount=Decimal('200'), payment_method='cash_on_delivery',
+            )
+
+    def test_deletes_the_user_cascade_in_batches(self):
+        out = io.StringIO()
+        call_command('delete_users', str(self.users[0].pk), '--batch-size', '1', stdout=out)
+        self.assertIn('Deleted 1 users (8 rows)', out.getvalue())
+
+        self.assertEqual(list(CustomUser.objects.values_list('pk', flat=True)), [self.users[1].pk])
+        for model in (Cart, Order, Transaction):
+            self.assertEqual(list(model.objects.values_list('user_id', flat=True)), [self.users[1].pk])
+        self.assertEqual(set(CartItem.objects.values_list('cart__user_id', flat=True)), {self.users[1].pk})
+        self.assertEqual(set(OrderItem.objects.values_list('order__user_id', flat=True)), {self.users[1].pk})
+        self.assertEqual(Motopart.objects.count(), 2)
 
-# Create your tests here.
+    def test_unknown_users_are_an_error(self):
+        with self.assertRaisesMessage(CommandError, 'No matching users'):
+            call_command('delete_users', '999999', stdout=io.StringIO())